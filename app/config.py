@@ -4,6 +4,8 @@ import os
 # Use Playwright's default Chromium (works on Windows, Mac, Linux)
 # Set CHROMIUM_BIN env variable to override if needed
 CHROMIUM_BIN = os.getenv("CHROMIUM_BIN", None)  # None = use Playwright default
+# WebSocket endpoint of a shared Chromium (see app/workers/shared_browser.py); None = use the launcher's file
+CHROMIUM_CDP_ENDPOINT = os.getenv("CHROMIUM_CDP_ENDPOINT", None)
 
 # Page loading configuration
 PAGE_TIMEOUT = int(os.getenv("PAGE_TIMEOUT", "20000"))  # 20 seconds default
@@ -73,6 +73,13 @@ class OpportunityCard(SQLModel, table=True):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class DomainTraffic(SQLModel, table=True):
+    # 💻 SpyFu-based traffic per domain, kept so backfills don't re-fetch known domains
+    domain: str = Field(primary_key=True)
+    monthly_visits: Optional[int] = Field(default=None, sa_column=Column(BigInteger))  # None = SpyFu had no data
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class User(SQLModel, table=True):
     __tablename__ = "users"
     
@@ -1,7 +1,8 @@
 import os
 import hashlib
+import threading
 from sqlmodel import SQLModel, create_engine, Session, select
-from sqlalchemy import text  # ✅ NEW: Import for SQL query
+from sqlalchemy import event, text  # ✅ NEW: Import for SQL query
 from app.db.models import AdCreative, OpportunityCard
 
 # Load .env file if running locally (for connecting local scraper to Replit database)
@@ -23,6 +24,24 @@ engine = create_engine(
     pool_pre_ping=True  # Test connections before use
 )
 
+# ⚡ SQLite: WAL journal + synchronous=NORMAL so a commit no longer waits on a
+# full fsync (and readers don't block the writer), temp tables in memory,
+# up to 256MB page cache per connection (negative cache_size = KiB)
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144",
+]
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+
 def get_session():
     return Session(engine)
 
@@ -41,7 +60,13 @@ def normalize_media_url(url: str) -> str:
     return base
 
 def make_creative_hash(ad: dict) -> str:
-    """Generate a stable hash for a creative using its video/image/caption content."""
+    """Generate a stable hash for a creative using its video/image/caption content.
+    
+    Stored in AdCreative.creative_hash and looked up by the scrapers, so keep the
+    algorithm (MD5 hex) unchanged - a new one would stop matching existing rows.
+    run_test_scraper.creative_fingerprint computes the same digest and is also
+    matched against this column (backfill_advertiser_ads), so change both or neither.
+    """
     # Normalize URLs to remove tracking parameters
     video_url = normalize_media_url(ad.get("video_url") or "")
     image_url = normalize_media_url(ad.get("image_url") or "")
@@ -55,6 +80,27 @@ def make_creative_hash(ad: dict) -> str:
         return ""
     return hashlib.md5(key.encode("utf-8")).hexdigest()
 
+# ⚡ Process-wide set of stored creative hashes (None until first use).
+# Lets callers skip DB probes for brand-new creatives - most scraped ads are new.
+_known_creative_hashes: set[str] | None = None
+_known_hashes_lock = threading.Lock()
+
+def known_creative_hashes() -> set[str]:
+    """Return every creative_hash in the DB, loaded once per process.
+    
+    Kept current with this process's own save_ads() writes; rows written by
+    other processes since the load are not included, so treat it as a prefilter.
+    """
+    global _known_creative_hashes
+    with _known_hashes_lock:
+        if _known_creative_hashes is None:
+            with get_session() as s:
+                hashes = s.exec(
+                    select(AdCreative.creative_hash).where(AdCreative.creative_hash != None)  # noqa: E711
+                ).all()
+            _known_creative_hashes = set(hashes)
+        return _known_creative_hashes
+
 # ✅ save_ads with deduplication and lifetime tracking
 def save_ads(ad_list: list[dict]) -> int:
     """Save scraped Meta ads into AdCreative using existing columns.
@@ -78,8 +124,11 @@ def save_ads(ad_list: list[dict]) -> int:
             return [prepare_for_json(item) for item in obj]
         return obj
     
-    saved = 0
-    with get_session() as s:
+    rows = []
+    batch_keys = set()  # (landing_url, normalized video) already queued in this batch
+    with get_session() as s, s.no_autoflush:
+        # ⚡ no_autoflush: the duplicate SELECTs below would otherwise flush each new
+        # row as its own INSERT - instead all rows go out in one batched flush at commit
         for ad in ad_list:
             platform = "meta"
             landing_url = ad.get("landing_url")
@@ -98,6 +147,9 @@ def save_ads(ad_list: list[dict]) -> int:
             # Check if ad already exists (deduplication)
             # True duplicate = same platform + landing_url + normalized video
             if normalized_video_url:
+                if (landing_url, normalized_video_url) in batch_keys:
+                    continue
+                batch_keys.add((landing_url, normalized_video_url))
                 existing = s.exec(
                     select(AdCreative).where(
                         AdCreative.platform == platform,
@@ -165,15 +217,20 @@ def save_ads(ad_list: list[dict]) -> int:
                 total_score=ad.get("total_score"),
                 stars=ad.get("stars"),
             )
-            s.add(row)
-            saved += 1
+            rows.append(row)
+        new_hashes = [row.creative_hash for row in rows if row.creative_hash]  # read before commit expires rows
+        s.add_all(rows)
         s.commit()
 
         # ⚡ PERFORMANCE FIX: Removed full-table UPDATE and rescoring that caused deadlocks
         # creative_variant_count and scoring will be calculated in post-processing instead
         # Run after scraping: python update_variant_counts.py
 
-    return saved
+    if _known_creative_hashes is not None:
+        with _known_hashes_lock:
+            _known_creative_hashes.update(new_hashes)
+
+    return len(rows)
 
 # ✅ Helper functions for distributed scraper
 def db_get_ad_by_hash(ad_hash: str) -> AdCreative | None:
@@ -0,0 +1,52 @@
+"""
+API Response Cache
+
+Small TTL cache for third-party traffic APIs (SpyFu, SimilarWeb). Their data
+changes at most daily, so repeat lookups for a domain skip the HTTP call.
+
+With diskcache installed, entries are stored on disk and shared across runs
+and processes. Otherwise they are kept in memory for the current process only.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+
+API_CACHE_DIR = ".cache/api"
+API_CACHE_TTL = 24 * 3600  # seconds
+
+_disk = diskcache.Cache(API_CACHE_DIR) if diskcache is not None else None
+_memory: Dict[str, Tuple[float, Any]] = {}  # key -> (expires_at, value)
+_memory_lock = threading.Lock()
+
+
+def cache_get(key: str) -> Optional[Any]:
+    """Return the cached value for `key`, or None if missing/expired."""
+    if _disk is not None:
+        return _disk.get(key)
+
+    with _memory_lock:
+        entry = _memory.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del _memory[key]
+            return None
+        return value
+
+
+def cache_set(key: str, value: Any, ttl: int = API_CACHE_TTL) -> None:
+    """Store `value` under `key` for `ttl` seconds."""
+    if _disk is not None:
+        _disk.set(key, value, expire=ttl)
+        return
+
+    with _memory_lock:
+        _memory[key] = (time.time() + ttl, value)
@@ -15,23 +15,28 @@ from app.db.repo import get_session
 from app.db.models import AdCreative
 from sqlmodel import select
 
+# Advertiser URL formats, compiled once (run for every advertiser URL)
+PROFILE_ID_RE = re.compile(r'profile\.php\?id=(\d+)')
+PAGES_ID_RE = re.compile(r'/pages/[^/]+/(\d+)')
+USERNAME_RE = re.compile(r'facebook\.com/([^/\?]+)')
+
 def extract_page_id_from_url(url: str) -> str | None:
     """Extract page ID from Facebook advertiser URL."""
     if not url:
         return None
     
     # Format 1: /profile.php?id=PAGE_ID
-    profile_match = re.search(r'profile\.php\?id=(\d+)', url)
+    profile_match = PROFILE_ID_RE.search(url)
     if profile_match:
         return profile_match.group(1)
     
     # Format 2: /pages/PAGE_NAME/PAGE_ID
-    pages_match = re.search(r'/pages/[^/]+/(\d+)', url)
+    pages_match = PAGES_ID_RE.search(url)
     if pages_match:
         return pages_match.group(1)
     
     # Format 3: /PAGE_ID/ or /PAGE_USERNAME
-    username_match = re.search(r'facebook\.com/([^/\?]+)', url)
+    username_match = USERNAME_RE.search(url)
     if username_match and username_match.group(1) not in ['ads', 'pages', 'profile']:
         return username_match.group(1)
     
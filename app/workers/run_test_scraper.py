@@ -3,10 +3,14 @@ import json
 import random
 import re
 import hashlib
+import os
+import threading
+import time
 from datetime import datetime, date
-from typing import Dict, Any, List, Optional
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 from dateutil import parser as date_parser
-from urllib.parse import urlparse  # 🆕 for domain extraction
+from urllib.parse import urlparse  # 🆕 for Instagram username extraction
 from playwright.async_api import async_playwright, Page
 from app.db.repo import save_ads
 from app.scoring.ad_scoring import score_ad
@@ -14,12 +18,80 @@ from app.config import CHROMIUM_BIN, SEARCH_QUERIES, COUNTRIES
 from app.db import Session, engine
 from app.db.models import AdCreative
 from sqlmodel import select, func
-from app.workers.spyfu_api import get_seo_clicks  # SpyFu for traffic estimation
+from app.workers.spyfu_api import get_seo_clicks_async  # SpyFu for traffic estimation
 from app.workers.traffic_estimator import estimate_monthly_visits, get_tier_from_visits
 from app.workers.platform_detector import detect_platform_from_html_only
+from app.workers.spam_filter import product_spam_reason, spam_reason
 import requests
+import httpx
+
+# HTTP/2 multiplexing needs the optional h2 package (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Faster event loop when available (not supported on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+# ---------- shared HTTP client ----------
+# One keep-alive client per event loop (distributed workers each run their own loop)
+_http_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the keep-alive httpx client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.9"},
+            follow_redirects=True,
+            timeout=5.0,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+        _http_clients[loop] = client
+    return client
+
+async def close_http_client():
+    """Close the httpx client for the running event loop (call at end of a run)."""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client:
+        await client.aclose()
 
 # ---------- ADVERTISER PAGE SCRAPING ----------
+# Advertiser URL -> page_id (None if lookup failed). Same advertiser shows up across
+# many queries/countries, so this saves a full page navigation per repeat.
+_page_id_cache: Dict[str, Optional[str]] = {}
+
+# Try multiple regex patterns to find page_id (Facebook changes formats)
+PAGE_ID_PATTERNS = [
+    re.compile(r'"associated_page_id"\s*:\s*"(\d+)"'),  # "associated_page_id":"123456"
+    re.compile(r'"associated_page_id"\s*:\s*(\d+)'),     # "associated_page_id":123456 (no quotes)
+    re.compile(r'associated_page_id["\s:]+(\d+)'),       # Flexible spacing/quotes
+    re.compile(r'"pageID"\s*:\s*"(\d+)"'),               # Alternative: "pageID":"123456"
+    re.compile(r'"page_id"\s*:\s*"(\d+)"'),              # Alternative: "page_id":"123456"
+    re.compile(r'page_id=(\d+)'),                        # URL param: page_id=123456
+]
+
+def _search_page_id(html_content: str) -> tuple[Optional[str], Optional[str]]:
+    """Return (page_id, matching pattern) from page HTML, or (None, None)."""
+    for pattern in PAGE_ID_PATTERNS:
+        match = pattern.search(html_content)
+        if match:
+            return match.group(1), pattern.pattern
+    return None, None
+
 async def extract_page_id_from_html(page: Page, advertiser_url: str) -> str | None:
     """
     Extract NUMERIC page ID from Facebook page HTML source.
@@ -35,38 +107,58 @@ async def extract_page_id_from_html(page: Page, advertiser_url: str) -> str | No
     if not advertiser_url:
         return None
     
+    # ⚡ Check cache first (skip navigation for already-seen advertisers)
+    if advertiser_url in _page_id_cache:
+        return _page_id_cache[advertiser_url]
+    
     try:
-        # Navigate to the advertiser's Facebook page (fast timeout to avoid long pauses)
-        await page.goto(advertiser_url, wait_until='domcontentloaded', timeout=8000)
-        await page.wait_for_timeout(1000)  # Quick wait - page ID is in initial HTML
-        
-        # Get the HTML source
-        html_content = await page.content()
-        
-        # Try multiple regex patterns to find page_id (Facebook changes formats)
-        patterns = [
-            r'"associated_page_id"\s*:\s*"(\d+)"',  # "associated_page_id":"123456"
-            r'"associated_page_id"\s*:\s*(\d+)',     # "associated_page_id":123456 (no quotes)
-            r'associated_page_id["\s:]+(\d+)',       # Flexible spacing/quotes
-            r'"pageID"\s*:\s*"(\d+)"',               # Alternative: "pageID":"123456"
-            r'"page_id"\s*:\s*"(\d+)"',              # Alternative: "page_id":"123456"
-            r'page_id=(\d+)',                        # URL param: page_id=123456
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, html_content)
-            if match:
-                page_id = match.group(1)
-                print(f"  ✅ Found page_id: {page_id} (pattern: {pattern[:30]}...)")
-                return page_id
-        
-        print(f"  ⚠️ Could not find page_id in HTML for {advertiser_url}")
-        print(f"  💡 Tip: View source and search for 'page' or 'associated' to debug")
-        return None
-        
+        page_id = await _extract_page_id_uncached(page, advertiser_url)
     except Exception as e:
+        # Don't cache errors - a timeout now may succeed on the next query
         print(f"  ❌ Error extracting page_id from {advertiser_url}: {e}")
         return None
+    
+    _page_id_cache[advertiser_url] = page_id
+    return page_id
+
+async def _fetch_html_fast(url: str) -> str | None:
+    """Plain HTTP GET of a page (no browser). Returns None on any failure."""
+    try:
+        response = await get_http_client().get(url)
+        if response.status_code == 200:
+            return response.text
+    except Exception:
+        pass
+    return None
+
+async def _extract_page_id_uncached(page: Page, advertiser_url: str) -> str | None:
+    """Search the advertiser page HTML for a page ID.
+    
+    ⚡ Fast path: the ID is in the server-rendered HTML, so try a plain HTTP GET
+    first (~200ms) and only fall back to a Chromium navigation (~5-10s) on a miss.
+    """
+    html_content = await _fetch_html_fast(advertiser_url)
+    if html_content:
+        page_id, pattern = _search_page_id(html_content)
+        if page_id:
+            print(f"  ✅ Found page_id: {page_id} (HTTP, pattern: {pattern[:30]}...)")
+            return page_id
+    
+    # Navigate to the advertiser's Facebook page (fast timeout to avoid long pauses)
+    # No extra wait needed - page ID is in the initial HTML
+    await page.goto(advertiser_url, wait_until='domcontentloaded', timeout=8000)
+    
+    # Get the HTML source
+    html_content = await page.content()
+    
+    page_id, pattern = _search_page_id(html_content)
+    if page_id:
+        print(f"  ✅ Found page_id: {page_id} (pattern: {pattern[:30]}...)")
+        return page_id
+    
+    print(f"  ⚠️ Could not find page_id in HTML for {advertiser_url}")
+    print(f"  💡 Tip: View source and search for 'page' or 'associated' to debug")
+    return None
 
 async def scrape_advertiser_all_ads(page: Page, page_id: str, advertiser_name: str, original_ad: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
@@ -87,14 +179,13 @@ async def scrape_advertiser_all_ads(page: Page, page_id: str, advertiser_name: s
     
     try:
         # Navigate to advertiser's ad library page
+        await navigation_jitter()
         await page.goto(advertiser_url, wait_until='domcontentloaded', timeout=30000)
-        await page.wait_for_timeout(3000)  # Initial wait
+        await wait_for_network_idle(page, timeout=3000)  # Initial wait (capped at 3s)
         
         # Accept cookies if present (might block content)
         await accept_cookies_if_present(page)
         
-        await page.wait_for_timeout(2000)  # Wait after cookie acceptance
-        
         # Wait for ads to appear (look for Facebook CDN images)
         try:
             await page.wait_for_selector('img[src*="scontent"]', timeout=10000)
@@ -132,9 +223,10 @@ async def scrape_advertiser_all_ads(page: Page, page_id: str, advertiser_name: s
                 break
             
             # If we found ads, keep scrolling for more
-            # Scroll to load more
+            # Scroll to load more, then wait until new ad images appear (capped at 3s)
+            prev_images = await page.evaluate(AD_IMAGE_COUNT_JS)
             await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await page.wait_for_timeout(3000)  # Increased wait time after scroll
+            await wait_for_more_ad_images(page, prev_images, timeout=3000)
             scroll_attempts += 1
         
         print(f"  ✅ Scraped {len(advertiser_ads)} total ads from {advertiser_name}")
@@ -148,8 +240,121 @@ async def scrape_advertiser_all_ads(page: Page, page_id: str, advertiser_name: s
 MAX_TEST_ADS = 10000  # High limit - scrape until no more ads found
 SCRAPE_ADVERTISER_ADS = True  # 🆕 Automatically scrapes all ads from each advertiser (set to False to disable)
 MAX_ADVERTISER_ADS = 200  # 🆕 Maximum ads to collect per advertiser (prevents spending too much time on one advertiser)
+SAVE_BATCH_SIZE = 100  # ⚡ Ads buffered before a bulk save (one DB transaction per batch)
+NAV_JITTER_RANGE = (0.1, 0.3)  # Random pause (seconds) before in-session Facebook navigations
+
+async def navigation_jitter():
+    """Anti-bot pause - only before requests that actually hit Facebook, not per processed ad."""
+    await asyncio.sleep(random.uniform(*NAV_JITTER_RANGE))
+
+# ---------- browser pool ----------
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+
+async def block_heavy_resources(route):
+    """Route handler that aborts images, fonts, media and stylesheets."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+class BrowserPool:
+    """
+    One warm Chromium instance reused for the whole run.
+    
+    - `context`: main browsing context (Ad Library / advertiser pages)
+    """
+    
+    async def __aenter__(self):
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(
+            headless=True,
+            executable_path=CHROMIUM_BIN,
+            args=[
+                '--disable-blink-features=AutomationControlled',
+                '--disable-features=IsolateOrigins,site-per-process',
+                '--disable-site-isolation-trials'
+            ]
+        )
+        self.context = await self.browser.new_context(
+            viewport={"width": 1366, "height": 850},
+            user_agent=USER_AGENT
+        )
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.browser.close()
+        await self.playwright.stop()
+
+# ---------- batched saving ----------
+class AdSaveBuffer:
+    """
+    Buffers scored ads and saves them in bulk from a worker thread,
+    so DB writes overlap with Playwright scraping instead of blocking it.
+    
+    Only one save runs at a time, so save_ads' duplicate check always
+    sees the rows written by the previous batch.
+    """
+    
+    def __init__(self, batch_size: int = SAVE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.pending: List[Dict[str, Any]] = []
+        self.saved = 0
+        self._task: Optional[asyncio.Task] = None
+    
+    async def add(self, ads: List[Dict[str, Any]]):
+        """Queue ads for saving; starts a background save once a batch is full."""
+        self.pending.extend(ads)
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+    
+    async def flush(self):
+        """Wait for the in-flight save, then start saving everything pending."""
+        await self._wait()
+        if self.pending:
+            batch, self.pending = self.pending, []
+            self._task = asyncio.create_task(asyncio.to_thread(save_ads, batch))
+    
+    async def close(self):
+        """Save everything still pending and wait for it to finish."""
+        await self.flush()
+        await self._wait()
+    
+    async def _wait(self):
+        if self._task:
+            task, self._task = self._task, None
+            self.saved += await task
 
 # ---------- redirect resolver ----------
+REDIRECT_CACHE_TTL = 3600  # seconds to keep cached redirect responses
+
+# Keep-alive session shared by all redirect lookups; with requests-cache installed,
+# HEAD responses are also cached on disk so popular tracking redirects skip the network
+try:
+    import requests_cache
+    _redirect_session = requests_cache.CachedSession(
+        ".cache/redirects",
+        expire_after=REDIRECT_CACHE_TTL,
+        allowable_methods=("GET", "HEAD"),
+    )
+except ImportError:
+    _redirect_session = requests.Session()
+_redirect_session.headers["User-Agent"] = USER_AGENT
+
+def fast_domain(url: str) -> str:
+    """
+    Host of a URL without the 'www.' prefix.
+    Cheap replacement for urlparse(url).netloc.replace("www.", "") on hot paths.
+    """
+    start = url.find("://")
+    start = 0 if start == -1 else start + 3
+    end = len(url)
+    for sep in "/?#":
+        i = url.find(sep, start, end)
+        if i != -1:
+            end = i
+    host = url[start:end]
+    return host[4:] if host.startswith("www.") else host
+
 def resolve_final_domain(url: str, timeout: int = 5) -> str:
     """
     Follow redirects to get the final destination domain.
@@ -157,22 +362,179 @@ def resolve_final_domain(url: str, timeout: int = 5) -> str:
     Falls back to original domain if redirect fails.
     """
     try:
-        # Extract original domain as fallback
-        from urllib.parse import urlparse
-        original_domain = urlparse(url).netloc.replace("www.", "")
-        
         # Follow redirects with HEAD request (faster than GET)
-        response = requests.head(url, allow_redirects=True, timeout=timeout)
-        final_url = response.url
-        final_domain = urlparse(final_url).netloc.replace("www.", "")
+        response = _redirect_session.head(url, allow_redirects=True, timeout=timeout)
+        final_domain = fast_domain(response.url)
         
-        return final_domain if final_domain else original_domain
+        # Fall back to original domain
+        return final_domain if final_domain else fast_domain(url)
     except Exception as e:
         # If redirect fails, return original domain
-        from urllib.parse import urlparse
-        return urlparse(url).netloc.replace("www.", "")
+        return fast_domain(url)
+
+async def resolve_final_domain_async(url: str) -> Tuple[str, bool]:
+    """
+    Async resolve_final_domain() on the shared keep-alive httpx client.
+    Some servers reject HEAD (405), so those are retried with a streamed GET
+    (headers only - the body is never downloaded).
+    
+    Returns (final_domain, resolved) - `resolved` is False when no response came
+    back (timeout, DNS, connection error) and the original domain is a fallback.
+    """
+    client = get_http_client()
+    try:
+        response = await client.head(url)
+        if response.status_code == 405:
+            async with client.stream("GET", url) as response:
+                pass
+        final_domain = fast_domain(str(response.url))
+        return (final_domain if final_domain else fast_domain(url)), True
+    except Exception:
+        # If redirect fails, return original domain
+        return fast_domain(url), False
+
+# ---------- traffic enrichment ----------
+ENRICH_CONCURRENCY = 8  # Max concurrent redirect/SpyFu lookups
+
+# Link shorteners / trackers - always resolved, never treated as direct hosts
+KNOWN_REDIRECTORS = {
+    "l.facebook.com", "lm.facebook.com", "bit.ly", "linktr.ee", "t.co",
+    "tinyurl.com", "rebrand.ly", "app.adjust.com", "click.linksynergy.com",
+}
+
+async def enrich_traffic(ads: List[Dict[str, Any]], domain_cache: Dict[str, Optional[int]],
+                         url_domain_cache: Dict[str, Optional[str]], known_direct: set):
+    """
+    Set `domain` and `monthly_visits` on a batch of ads.
+    
+    Resolves redirects for each distinct landing URL, then looks up SpyFu data for
+    each distinct final domain - both concurrently on the shared httpx client
+    (bounded by ENRICH_CONCURRENCY) instead of one ad at a time. Results are stored in the two caches.
+    
+    Hosts seen to not redirect are added to `known_direct`; later URLs on those
+    hosts skip the redirect lookup entirely.
+    """
+    if not ads:
+        return
+    
+    semaphore = asyncio.Semaphore(ENRICH_CONCURRENCY)
+    client = get_http_client()
+    
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+    
+    # Step 1: Resolve redirects to get final destination domains (cached per landing URL;
+    # trackers are already stripped by the extractor, drop the #fragment too)
+    url_keys = [ad["landing_url"].split("#", 1)[0] for ad in ads]
+    new_urls = []
+    for u in dict.fromkeys(url_keys):
+        if u in url_domain_cache:
+            continue
+        host = fast_domain(u)
+        if host in known_direct:
+            url_domain_cache[u] = host  # ⚡ Host never redirects - no HTTP request needed
+        else:
+            new_urls.append(u)
+    resolved = await asyncio.gather(*(bounded(resolve_final_domain_async(u)) for u in new_urls))
+    for u, (final_domain, ok) in zip(new_urls, resolved):
+        url_domain_cache[u] = final_domain
+        host = fast_domain(u)
+        # Only a real non-redirecting response proves the host is direct - a failed
+        # lookup falls back to the host too, but says nothing about its redirects
+        if ok and final_domain == host and host not in KNOWN_REDIRECTORS:
+            known_direct.add(host)
+    
+    # Step 2: SpyFu lookup for each final domain not seen yet
+    final_domains = [url_domain_cache.get(u) for u in url_keys]
+    new_domains = list(dict.fromkeys(d for d in final_domains if d and d not in domain_cache))
+    spyfu_results = await asyncio.gather(
+        *(bounded(get_seo_clicks_async(client, d)) for d in new_domains), return_exceptions=True
+    )
+    for final_domain, spyfu_data in zip(new_domains, spyfu_results):
+        if isinstance(spyfu_data, Exception):
+            print(f"❌ SpyFu error for {final_domain}: {spyfu_data}")
+            continue
+        if spyfu_data.get("status") == "ok" and spyfu_data.get("seo_clicks"):
+            seo_clicks = spyfu_data["seo_clicks"]
+            tier = get_tier_from_visits(seo_clicks)
+            # Convert SEO clicks to estimated total visits
+            domain_cache[final_domain] = int(estimate_monthly_visits(seo_clicks, tier))
+            print(f"📊 SpyFu: {final_domain} → {seo_clicks:,} SEO clicks ({tier} tier) → {domain_cache[final_domain]:,} est. visits")
+        else:
+            domain_cache[final_domain] = None
+            print(f"⚠️ SpyFu: No SEO data for {final_domain}")
+    
+    # Step 3: Attach results to each ad
+    for ad, final_domain in zip(ads, final_domains):
+        if final_domain:
+            # Store the extracted root domain (e.g., mutha.com, healthcentral.com)
+            ad["domain"] = final_domain
+            ad["monthly_visits"] = domain_cache.get(final_domain)
+
+# ---------- persistent run cache ----------
+# SpyFu results, scraped advertisers and direct hosts barely change between runs,
+# so they are saved to disk and reloaded - later runs only look up new entities
+RUN_CACHE_PATH = ".cache/run_state.json"
+SPYFU_CACHE_TTL_DAYS = 30  # Re-fetch SpyFu data for a domain after this long
+ADVERTISER_RESCRAPE_DAYS = 1  # Re-scrape an advertiser's page after this long
+KNOWN_DIRECT_TTL_DAYS = 7  # Re-check a direct host for new redirects after this long
+
+def load_run_cache():
+    """
+    Load caches saved by earlier runs, dropping expired entries.
+    
+    Returns:
+        (domain_cache, scraped_advertisers, known_direct, stamps) - `stamps` holds
+        the first-seen time of each loaded entry and is passed back to save_run_cache
+    """
+    stamps = {"domains": {}, "advertisers": {}, "known_direct": {}}
+    try:
+        with open(RUN_CACHE_PATH) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}, set(), set(), stamps
+    
+    now = time.time()
+    domain_cache = {}
+    for domain, (visits, ts) in data.get("domains", {}).items():
+        if now - ts < SPYFU_CACHE_TTL_DAYS * 86400:
+            domain_cache[domain] = visits
+            stamps["domains"][domain] = ts
+    for page_id, ts in data.get("advertisers", {}).items():
+        if now - ts < ADVERTISER_RESCRAPE_DAYS * 86400:
+            stamps["advertisers"][page_id] = ts
+    known_direct = data.get("known_direct", {})
+    if isinstance(known_direct, dict):  # Older files saved a bare list with no stamps - drop it
+        for host, ts in known_direct.items():
+            if now - ts < KNOWN_DIRECT_TTL_DAYS * 86400:
+                stamps["known_direct"][host] = ts
+    
+    print(f"💾 Loaded run cache: {len(domain_cache)} domains, {len(stamps['advertisers'])} advertisers, "
+          f"{len(stamps['known_direct'])} direct hosts")
+    return domain_cache, set(stamps["advertisers"]), set(stamps["known_direct"]), stamps
+
+def save_run_cache(domain_cache: Dict[str, Optional[int]], scraped_advertisers: set,
+                   known_direct: set, stamps: Dict[str, Dict[str, float]]):
+    """Write the caches to RUN_CACHE_PATH (atomically - parallel workers may share the file)."""
+    now = time.time()
+    data = {
+        "domains": {d: [v, stamps["domains"].get(d, now)] for d, v in domain_cache.items()},
+        "advertisers": {p: stamps["advertisers"].get(p, now) for p in scraped_advertisers},
+        "known_direct": {h: stamps["known_direct"].get(h, now) for h in sorted(known_direct)},
+    }
+    tmp_path = f"{RUN_CACHE_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(RUN_CACHE_PATH), exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, RUN_CACHE_PATH)
+    except OSError as e:
+        print(f"⚠️ Could not save run cache: {e}")
 
 # ---------- creative hash ----------
+# MD5 hex, same as app.db.repo.make_creative_hash: backfill_advertiser_ads
+# matches this fingerprint against the stored AdCreative.creative_hash
 def normalize_media_url(url: str) -> str:
     """Normalize video/image URLs by removing tracking parameters."""
     if not url:
@@ -194,18 +556,52 @@ def creative_fingerprint(ad: Dict[str, Any]) -> Optional[str]:
     return hashlib.md5(key.encode("utf-8")).hexdigest()
 
 # ---------- date parsing ----------
+@lru_cache(maxsize=4096)
+def _parse_start_date(date_str: str) -> Optional[date]:
+    """Parse a start date string, cached (the same dates recur across an advertiser's ads)."""
+    # ⚡ Fast path: the extractor already returns "October 5, 2024" / "Oct 5, 2024"
+    for fmt in ("%B %d, %Y", "%b %d, %Y"):
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            pass
+    # Fallback: general-purpose parser for anything else
+    try:
+        return date_parser.parse(date_str).date()
+    except:
+        return None
+
 def parse_ad_start_date(date_str: str) -> tuple[Optional[date], int]:
     """Parse 'Started running on [date]' and return (date object, days_running)."""
     if not date_str:
         return None, 0
-    try:
-        start_date = date_parser.parse(date_str).date()
-        days_running = (date.today() - start_date).days
-        return start_date, days_running  # Return date object, not ISO string
-    except:
+    start_date = _parse_start_date(date_str.strip())
+    if not start_date:
         return None, 0
+    days_running = (date.today() - start_date).days
+    return start_date, days_running  # Return date object, not ISO string
 
 # ---------- helpers ----------
+AD_IMAGE_COUNT_JS = "() => document.querySelectorAll('img[src*=\"scontent\"]').length"
+
+async def wait_for_network_idle(page: Page, timeout: int):
+    """Wait for the network to go idle, but never longer than `timeout` ms."""
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+    except:
+        pass
+
+async def wait_for_more_ad_images(page: Page, prev_count: int, timeout: int):
+    """Wait until more ad images than `prev_count` are on the page (capped at `timeout` ms)."""
+    try:
+        await page.wait_for_function(
+            "prev => document.querySelectorAll('img[src*=\"scontent\"]').length > prev",
+            arg=prev_count,
+            timeout=timeout,
+        )
+    except:
+        pass
+
 async def click_if_visible(page: Page, selector: str) -> bool:
     """Click an element if it is visible."""
     try:
@@ -228,7 +624,11 @@ async def accept_cookies_if_present(page: Page):
             btn = page.get_by_role("button", name=re.compile(t, re.I))
             if await btn.is_visible(timeout=1000):
                 await btn.click()
-                await page.wait_for_timeout(1200)
+                # Wait for the banner to go away instead of a fixed sleep
+                try:
+                    await btn.wait_for(state="hidden", timeout=1200)
+                except:
+                    pass
                 break
         except:
             pass
@@ -239,7 +639,7 @@ async def ensure_all_ads_tab(page: Page):
         chip = page.get_by_role("button", name=re.compile(r"\bAll ads\b", re.I))
         if await chip.is_visible(timeout=2000):
             await chip.click()
-            await page.wait_for_timeout(1200)
+            await wait_for_network_idle(page, timeout=1200)
     except:
         pass
 
@@ -286,6 +686,29 @@ async def click_all_see_more(page: Page) -> int:
     return clicked
 
 # ---------- product name and price extraction ----------
+def classify_landing_html(html_content: str, url: str) -> str:
+    """
+    Return the page_type for a landing page's HTML.
+    CPU-bound (regex over the full HTML) - call via asyncio.to_thread.
+    """
+    from app.workers.product_name_extractor import ProductNameExtractor
+    if ProductNameExtractor.detect_survey_page(html_content, url):
+        return "survey_page"
+    # Everything else defaults to product_page (product-page signals don't change the result)
+    return "product_page"
+
+# Price regexes run against arbitrary vendor text - use RE2 (linear-time, no
+# backtracking blowups) when google-re2 is installed, otherwise stdlib re
+try:
+    import re2 as price_re
+except ImportError:
+    price_re = re
+
+PRICE_CENTS_RE = price_re.compile(r'^\d+$')
+# Matches: $59, $59.99, $1,099.00, €45, £23.50, 59,99€
+PRICE_WITH_SYMBOL_RE = price_re.compile(r'([$€£¥]\s*[\d,.]+|\d[\d,.]+\s*[$€£¥])')
+PRICE_NUMBER_RE = price_re.compile(r'(\d{1,3}(?:[,.\s]\d{3})*(?:[.,]\d{2})?)')
+
 async def extract_product_name_from_url(page: Page, url: str) -> tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
     """Extract product name, HTML, price, and page type from a given URL.
     
@@ -303,7 +726,6 @@ async def extract_product_name_from_url(page: Page, url: str) -> tuple[Optional[
 
     from app.config import PAGE_TIMEOUT
     import time
-    import re
     
     new_page = None
     max_attempts = 2
@@ -317,10 +739,7 @@ async def extract_product_name_from_url(page: Page, url: str) -> tuple[Optional[
             new_page = await page.context.new_page()
             
             # 🚀 Block heavy resources to speed up loading
-            await new_page.route("**/*", lambda route: (
-                route.abort() if route.request.resource_type in ["image", "font", "media", "stylesheet"]
-                else route.continue_()
-            ))
+            await new_page.route("**/*", block_heavy_resources)
             
             # Navigate with DOMContentLoaded (faster than 'load')
             await new_page.goto(url, wait_until="domcontentloaded", timeout=PAGE_TIMEOUT)
@@ -406,39 +825,27 @@ async def extract_product_name_from_url(page: Page, url: str) -> tuple[Optional[
                             if "data-price" in sel:
                                 price_data = await el.get_attribute("data-price")
                                 # Assume cents for integer values (Shopify standard)
-                                if price_data and re.match(r'^\d+$', price_data):
+                                if price_data and PRICE_CENTS_RE.match(price_data):
                                     price_cents = int(price_data)
                                     product_price = f"{currency_symbol}{price_cents / 100:.2f}"
                                     break
                             else:
                                 text = (await el.text_content() or "").strip()
                                 # Look for price with currency symbol (leading or trailing)
-                                # Matches: $59, $59.99, $1,099.00, €45, £23.50, 59,99€
-                                price_match = re.search(r'([$€£¥]\s*[\d,.]+|\d[\d,.]+\s*[$€£¥])', text)
+                                price_match = PRICE_WITH_SYMBOL_RE.search(text)
                                 if price_match:
                                     product_price = price_match.group(1).strip()
                                     break
                                 # Try without currency symbol (fallback with detected currency)
-                                price_match = re.search(r'(\d{1,3}(?:[,.\s]\d{3})*(?:[.,]\d{2})?)', text)
+                                price_match = PRICE_NUMBER_RE.search(text)
                                 if price_match and len(text) < 50:
                                     product_price = f"{currency_symbol}{price_match.group(1)}"
                                     break
                     except:
                         continue
 
-            # Step 2: Detect survey/quiz pages AFTER product extraction (doesn't interfere with extraction)
-            from app.workers.product_name_extractor import ProductNameExtractor
-            is_survey = ProductNameExtractor.detect_survey_page(html_content, url)
-            page_type = "survey_page" if is_survey else None
-            
-            # Step 3: If NOT a survey page, check if it's a product page
-            if page_type != "survey_page":
-                is_product_page = ProductNameExtractor.detect_product_page(html_content)
-                if is_product_page:
-                    page_type = "product_page"
-                else:
-                    # Default to product_page if no strong signals (backward compatible)
-                    page_type = "product_page"
+            # Step 2: Classify page AFTER product extraction (off the event loop - HTML can be MBs)
+            page_type = await asyncio.to_thread(classify_landing_html, html_content, url)
             
             await new_page.close()
             return product_name, html_content, product_price, page_type
@@ -447,7 +854,10 @@ async def extract_product_name_from_url(page: Page, url: str) -> tuple[Optional[
             elapsed = time.time() - start_time
             
             if new_page:
-                await new_page.close()
+                try:
+                    await new_page.close()
+                except:
+                    pass
                 new_page = None
             
             # Retry on first failure
@@ -463,13 +873,29 @@ async def extract_product_name_from_url(page: Page, url: str) -> tuple[Optional[
     return None, None, None, None
 
 # ---------- extraction ----------
-async def extract_ads_from_page(page: Page) -> List[Dict[str, Any]]:
-    """Extract ad data from the current page."""
-    extract_js = """
+# Ad extractor, run in the page. Returns only ads not returned by a previous call on
+# the same document (tracked in the page itself, reset on navigation).
+EXTRACT_ADS_JS = """
     () => {
         const images = Array.from(document.querySelectorAll('img[src*="scontent"]'));
         const ads = [];
         const seenAds = new Set();
+        window.__returnedAdCards = window.__returnedAdCards || new WeakSet();  // persists across calls
+        const returnedAdCards = window.__returnedAdCards;
+        const CTA_RE = /shop|learn|get|buy|download|sign|subscribe|watch|apply|book/i;  // compiled once per call
+        // Profile pics (60x60 / _s.) and explicitly marked favicon/logo/profile/icon images
+        const EXCLUDE_IMG_RE = /s60x60|_s\\.|favicon|logo|profile|icon/;
+        const CREATIVE_EXT_RE = /\\.(jpg|png|webp)/;
+        const TRACKER_RE = /(\\?|&)(?:fbclid|utm_[^=&]+)=[^&]+/g;  // fallback for hrefs URL() can't parse
+        // Run-date patterns (only run once indexOf finds the marker in a container)
+        const STARTED_MARKER = 'Started running on';
+        const STARTED_RE = /Started running on\\s+([A-Za-z]+\\s+\\d{1,2},\\s+\\d{4})/i;
+        const RUNTIME_RE = /Started running on[^\\n·]+(·[^\\n]+)?/i;
+        const STOPPED_RE = /(Stopped|Ended)\\s+running\\s+on\\s+([A-Za-z]+\\s+\\d{1,2},\\s+\\d{4})/i;
+        const ACTIVE_RE = /\\bActive\\b|\\bCurrently\\s+running\\b/i;
+        // Outbound CTA links: Facebook l.php?u= redirects, or any non-Facebook http(s) link
+        const CTA_LINK_SELECTOR = 'a[href^="http"][href*=".facebook.com/"][href*=".php?u="], ' +
+                                  'a[href^="http"]:not([href*="facebook.com/"])';
 
         images.forEach(img => {
             let current = img;
@@ -486,7 +912,7 @@ async def extract_ads_from_page(page: Page) -> List[Dict[str, Any]]:
                 depth++;
             }
 
-            if (adCard && !seenAds.has(adCard)) {
+            if (adCard && !seenAds.has(adCard) && !returnedAdCards.has(adCard)) {
                 seenAds.add(adCard);
                 
                 // Skip ads where media failed to load
@@ -566,68 +992,53 @@ async def extract_ads_from_page(page: Page) -> List[Dict[str, Any]]:
 
                 // STEP 2: If NO video, extract IMAGE
                 if (!data.video_url) {
-                    const allImages = Array.from(adCard.querySelectorAll('img[src]'));
+                    // Images in advertiser header (profile pictures), collected once per card
+                    const headerImgs = new Set(
+                        advertiserHeaderContainer ? advertiserHeaderContainer.querySelectorAll('img') : []
+                    );
                     
-                    // Filter to find ad creative images (not profile pics, icons, etc.)
-                    const adCreativeImages = allImages.filter(img => {
+                    // Single pass: stop at the first ad creative image (not profile pics, icons, etc.)
+                    const creativeImg = Array.from(adCard.querySelectorAll('img[src]')).find(img => {
                         const src = img.getAttribute('src') || '';
                         
-                        // EXCLUDE: Images in advertiser header (profile pictures)
-                        if (advertiserHeaderContainer && advertiserHeaderContainer.contains(img)) {
-                            return false;
-                        }
-                        
-                        // EXCLUDE: Small profile pics (60x60 or s60x60 in URL)
-                        if (src.includes('s60x60') || src.includes('_s.')) {
+                        // Cheap string checks first: Facebook CDN image with a proper extension
+                        if (!src.includes('fbcdn.net') || !CREATIVE_EXT_RE.test(src) || EXCLUDE_IMG_RE.test(src)) {
                             return false;
                         }
-                        
-                        // EXCLUDE: Explicitly marked as favicon/logo/profile/icon
-                        if (src.includes('favicon') || src.includes('logo') || src.includes('profile') || src.includes('icon')) {
+                        if (headerImgs.has(img)) {
                             return false;
                         }
                         
-                        // EXCLUDE: Tiny images under 100x100
+                        // EXCLUDE: Tiny images under 100x100 (intrinsic size - no layout needed)
                         const width = img.naturalWidth || parseInt(img.getAttribute('width')) || 999;
                         const height = img.naturalHeight || parseInt(img.getAttribute('height')) || 999;
-                        if (width < 100 || height < 100) {
-                            return false;
-                        }
-                        
-                        // INCLUDE: Facebook CDN images with proper extensions
-                        if (src.includes('fbcdn.net') && (src.includes('.jpg') || src.includes('.png') || src.includes('.webp'))) {
-                            return true;
-                        }
-                        
-                        return false;
+                        return width >= 100 && height >= 100;
                     });
                     
-                    if (adCreativeImages.length > 0) {
-                        data.image_url = adCreativeImages[0].getAttribute('src');
+                    if (creativeImg) {
+                        data.image_url = creativeImg.getAttribute('src');
                     }
                 }
 
-                const fullText = adCard.textContent || '';
-                const lines = fullText.split('\\n').map(l => l.trim()).filter(l => l);
-
                 let containerToSearch = adCard.parentElement;
                 let searchDepth = 0;
                 while (containerToSearch && searchDepth < 5) {
                     const containerText = containerToSearch.textContent || '';
-                    const startedMatch = containerText.match(/Started running on\\s+([A-Za-z]+\\s+\\d{1,2},\\s+\\d{4})/i);
+                    // ⚡ Cheap substring check first - most containers have no run date
+                    const startedMatch = containerText.indexOf(STARTED_MARKER) >= 0 && STARTED_RE.exec(containerText);
                     if (startedMatch) {
                         data.started_running_on = startedMatch[1].trim();
-                        const fullMatch = containerText.match(/Started running on[^\\n·]+(·[^\\n]+)?/i);
+                        const fullMatch = RUNTIME_RE.exec(containerText);
                         if (fullMatch) {
                             data.raw_runtime_text = fullMatch[0].trim();
                         }
                         
                         // 🔄 Two-Layer Detection: Extract Facebook's delivery status
-                        const stoppedMatch = containerText.match(/(Stopped|Ended)\\s+running\\s+on\\s+([A-Za-z]+\\s+\\d{1,2},\\s+\\d{4})/i);
+                        const stoppedMatch = STOPPED_RE.exec(containerText);
                         if (stoppedMatch) {
                             data.fb_delivery_stop_time = stoppedMatch[2].trim();
                             data.fb_delivery_status = 'INACTIVE';
-                        } else if (containerText.match(/\\bActive\\b|\\bCurrently\\s+running\\b/i)) {
+                        } else if (ACTIVE_RE.test(containerText)) {
                             data.fb_delivery_status = 'ACTIVE';
                         }
                         
@@ -637,54 +1048,87 @@ async def extract_ads_from_page(page: Page) -> List[Dict[str, Any]]:
                     searchDepth++;
                 }
 
-                const caption = lines.filter(l => 
-                    l !== 'Sponsored' && l !== data.advertiser_name && l.length > 10 && !l.startsWith('Started running on')
-                ).join(' ').substring(0, 500);
-                if (caption) data.caption = caption;
+                // Walk text nodes in order and stop once 500 chars are collected
+                // (no full-card textContent serialization / split per ad)
+                const walker = document.createTreeWalker(adCard, NodeFilter.SHOW_TEXT);
+                let caption = '';
+                while (caption.length < 500) {
+                    const node = walker.nextNode();
+                    if (!node) break;
+                    const t = node.data.trim();
+                    if (!t || t === 'Sponsored' || t === data.advertiser_name || t.length <= 10 || t.startsWith('Started running on')) {
+                        continue;
+                    }
+                    caption += (caption ? ' ' : '') + t;
+                }
+                if (caption) data.caption = caption.substring(0, 500);
 
                 let ctaElement = adCard.querySelector('div[role="button"], a[role="button"], button');
                 if (ctaElement) {
                     const ctaText = ctaElement.textContent?.trim() || "";
-                    if (ctaText && ctaText.length < 50 && /shop|learn|get|buy|download|sign|subscribe|watch|apply|book/i.test(ctaText)) {
+                    if (ctaText && ctaText.length < 50 && CTA_RE.test(ctaText)) {
                         data.cta_text = ctaText;
                     }
                 }
 
-                const ctaLinks = Array.from(adCard.querySelectorAll('a[href^="http"]')).filter(a => {
-                    const href = a.getAttribute('href') || '';
-                    if (href.includes('.facebook.com/') && href.includes('.php?u=')) {
-                        return true;
-                    }
-                    return !href.includes('facebook.com/ads/library') &&
-                           !href.includes('facebook.com/profile') &&
-                           !href.includes('facebook.com/pages/') &&
-                           !href.includes('facebook.com/');
-                });
-                if (ctaLinks.length > 0) {
-                    let rawUrl = ctaLinks[0].getAttribute('href') || '';
-                    if (rawUrl.includes('.facebook.com/') && rawUrl.includes('.php?u=')) {
-                        const match = rawUrl.match(/u=([^&]+)/);
-                        if (match && match[1]) {
-                            rawUrl = decodeURIComponent(match[1]);
+                // First matching link in document order (selector engine does the href filtering)
+                const ctaLink = adCard.querySelector(CTA_LINK_SELECTOR);
+                if (ctaLink) {
+                    let rawUrl = ctaLink.getAttribute('href') || '';
+                    try {
+                        let u = new URL(rawUrl);
+                        // Unwrap l.facebook.com/l.php?u=<target> redirects (searchParams already decodes)
+                        if (u.hostname.endsWith('facebook.com') && u.pathname.endsWith('.php') && u.searchParams.get('u')) {
+                            u = new URL(u.searchParams.get('u'));
+                        }
+                        // Drop fbclid + utm_* tracking params
+                        u.searchParams.delete('fbclid');
+                        for (const key of [...u.searchParams.keys()]) {
+                            if (key.startsWith('utm_')) u.searchParams.delete(key);
                         }
+                        rawUrl = u.toString();
+                    } catch (e) {
+                        rawUrl = rawUrl.replace(TRACKER_RE, '');
                     }
-                    rawUrl = rawUrl.replace(/(\?|&)fbclid=[^&]+/g, '').replace(/(\?|&)utm_[^&]+/g, '');
                     data.landing_url = rawUrl;
-                    if (!data.cta_text && ctaLinks[0].textContent) {
-                        const linkText = ctaLinks[0].textContent.trim();
+                    if (!data.cta_text && ctaLink.textContent) {
+                        const linkText = ctaLink.textContent.trim();
                         if (linkText && linkText.length < 50) data.cta_text = linkText;
                     }
                 }
 
+                // Cards with no usable data yet aren't marked, so they're retried after the next scroll
                 if (data.caption || data.image_url || data.video_url || data.landing_url) {
+                    returnedAdCards.add(adCard);
                     ads.push(data);
                 }
             }
         });
         return ads;
     }
+"""
+
+async def install_ad_extractor(page: Page):
+    """
+    Register the extractor as window.__extractAds on every document the page loads.
+    
+    ⚡ The source is sent and compiled once per document instead of on every scroll;
+    call right after creating the page, before its first navigation.
     """
-    ads = await page.evaluate(extract_js)
+    await page.add_init_script(f"window.__extractAds = {EXTRACT_ADS_JS};")
+
+async def extract_ads_from_page(page: Page) -> List[Dict[str, Any]]:
+    """
+    Extract ad data from the current page.
+    
+    Only returns ads not returned by a previous call on the same document
+    (tracked in the page itself, reset on navigation), so each scroll only
+    processes and transfers the newly loaded ads.
+    """
+    ads = await page.evaluate("() => window.__extractAds ? window.__extractAds() : null")
+    if ads is None:
+        # Page without the init script (see install_ad_extractor) - send the full source
+        ads = await page.evaluate(EXTRACT_ADS_JS)
     return ads
 
 # ---------- main test runner ----------
@@ -700,437 +1144,330 @@ async def run_test_scrape(keyword: Optional[str] = None, limit: Optional[int] =
     Returns:
         List of scraped ads
     """
+    return [ad async for ad in iter_test_scrape(keyword=keyword, limit=limit, country=country)]
+
+async def iter_test_scrape(keyword: Optional[str] = None, limit: Optional[int] = None,
+                           country: str = "US") -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the test scrape, yielding each ad as soon as it has been scored.
+    
+    Same arguments as run_test_scrape; lets consumers start work on ads while
+    the scrape is still running instead of waiting for the full list.
+    """
     # Determine queries and max ads
     queries = [keyword] if keyword else SEARCH_QUERIES
     countries = [country] if keyword else COUNTRIES
     max_ads = limit if limit is not None else MAX_TEST_ADS
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            executable_path=CHROMIUM_BIN,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-features=IsolateOrigins,site-per-process',
-                '--disable-site-isolation-trials'
-            ]
-        )
-        context = await browser.new_context(
-            viewport={"width": 1366, "height": 850},
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            )
-        )
-        page = await context.new_page()
+    async with BrowserPool() as pool:
+        page = await pool.context.new_page()
+        await install_ad_extractor(page)
 
         total_ads = 0
-        domain_cache = {}  # Cache for SpyFu API calls
-        scraped_advertisers = set()  # Track already-scraped advertiser page_ids
-        all_results = []  # Collect all ads to return
+        # 💾 Warm from disk: SpyFu results (domain_cache), hosts that resolved to themselves
+        # (known_direct, no redirect lookup needed) and already-scraped advertiser page_ids
+        domain_cache, scraped_advertisers, known_direct, cache_stamps = load_run_cache()
+        url_domain_cache = {}  # Landing URL -> resolved final domain (skips repeat redirect lookups)
+        seen_creatives = set()  # Creative hashes already processed this run (feed is re-extracted every scroll)
+        save_buffer = AdSaveBuffer()  # ⚡ Bulk saves instead of one transaction per ad
         print(f"🚀 Running TEST scrape (max {max_ads} ads)")
 
-        for query in queries:
-            for ctry in countries:
-                if total_ads >= max_ads:
-                    break
+        try:
+            for query in queries:
+                for ctry in countries:
+                    if total_ads >= max_ads:
+                        break
 
-                url = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country={ctry}&q={query}"
-                print(f"\n🌍 Scraping {query!r} in {ctry} → {url}")
-                await page.goto(url, wait_until="domcontentloaded")
-                await page.wait_for_timeout(2500)
+                    url = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country={ctry}&q={query}"
+                    print(f"\n🌍 Scraping {query!r} in {ctry} → {url}")
+                    await page.goto(url, wait_until="domcontentloaded")
 
-                await accept_cookies_if_present(page)
-                await ensure_all_ads_tab(page)
+                    # Wait for the first ad images instead of a fixed sleep (page is usable from here)
+                    try:
+                        await page.wait_for_selector('img[src*="scontent"]', timeout=15000)
+                        print("✅ Images loaded, ads should be visible")
+                    except:
+                        print("⚠️ No images found, continuing...")
 
-                try:
-                    await page.wait_for_selector('img[src*="scontent"]', timeout=15000)
-                    print("✅ Images loaded, ads should be visible")
-                except:
-                    print("⚠️ No images found, continuing...")
+                    await accept_cookies_if_present(page)
+                    await ensure_all_ads_tab(page)
 
-                results: List[Dict[str, Any]] = []
-                scroll_attempts = 0
-                max_scrolls = 500  # Increased to allow more scrolling
-                new_count = 0
-                consecutive_filtered = 0  # Track consecutive spam-filtered ads
-                MAX_CONSECUTIVE_FILTERED = 100  # Skip keyword after 100 consecutive filtered ads
+                    scroll_attempts = 0
+                    max_scrolls = 500  # Increased to allow more scrolling
+                    new_count = 0
+                    consecutive_filtered = 0  # Track consecutive spam-filtered ads
+                    MAX_CONSECUTIVE_FILTERED = 100  # Skip keyword after 100 consecutive filtered ads
+                    empty_scrolls = 0  # Consecutive scrolls that loaded no new ads
+                    MAX_EMPTY_SCROLLS = 3  # Give slow feeds a few scrolls before moving on
 
-                while total_ads < max_ads and scroll_attempts < max_scrolls:
-                    batch = await extract_ads_from_page(page)
+                    while total_ads < max_ads and scroll_attempts < max_scrolls:
+                        batch = await extract_ads_from_page(page)  # Only ads not seen on earlier scrolls
 
-                    if scroll_attempts > 0 and len(batch) == 0:
-                        print(f"⏭️ No new ads found, moving to next query")
-                        break
+                        if scroll_attempts > 0 and len(batch) == 0:
+                            empty_scrolls += 1
+                            if empty_scrolls >= MAX_EMPTY_SCROLLS:
+                                print(f"⏭️ No new ads found, moving to next query")
+                                break
+                        else:
+                            empty_scrolls = 0
                     
-                    # Check if too many consecutive ads have been filtered
-                    if consecutive_filtered >= MAX_CONSECUTIVE_FILTERED:
-                        print(f"⏭️ Skipping keyword '{query}' - {MAX_CONSECUTIVE_FILTERED} consecutive spam ads detected")
-                        break
-
-                    for ad in batch:
-                        if total_ads >= max_ads:
+                        # Check if too many consecutive ads have been filtered
+                        if consecutive_filtered >= MAX_CONSECUTIVE_FILTERED:
+                            print(f"⏭️ Skipping keyword '{query}' - {MAX_CONSECUTIVE_FILTERED} consecutive spam ads detected")
                             break
 
-                        ad["search_query"] = query
-                        ad["country"] = ctry
+                        # Pass 1: cheap per-ad work and spam filtering (no network)
+                        kept: List[Dict[str, Any]] = []
+                        for ad in batch:
+                            if total_ads + len(kept) >= max_ads:
+                                break
 
-                        if ad.get("started_running_on"):
-                            start_date, days_running = parse_ad_start_date(ad["started_running_on"])
-                            ad["started_running_on"] = start_date
-                            ad["days_running"] = days_running
-
-                        ad["creative_hash"] = creative_fingerprint(ad)
+                            # ⚡ Skip creatives already processed this run before doing any work
+                            ad["creative_hash"] = creative_fingerprint(ad)
+                            if ad["creative_hash"]:
+                                if ad["creative_hash"] in seen_creatives:
+                                    continue
+                                seen_creatives.add(ad["creative_hash"])
 
-                        # Initialize defaults
-                        ad["product_name"] = None
-                        ad["product_price"] = None
-                        ad["platform_type"] = None
-                        ad["page_type"] = "product_page"
-                        ad["is_spark_ad"] = False
-                        landing_html = None
+                            landing_url = ad.get("landing_url")
+                            if not landing_url:
+                                print(f"⏭️ Skipping ad - no landing URL")
+                                consecutive_filtered += 1
+                                continue
+                            landing_url_lower = landing_url.lower()  # Computed once, shared below
                         
-                        if not ad.get("landing_url"):
-                            print(f"⏭️ Skipping ad - no landing URL")
-                            consecutive_filtered += 1
-                            continue
-                        
-                        landing_url = ad["landing_url"]
-                        landing_url_lower = landing_url.lower()
+                            # ⚡ Spam filter on cheap fields BEFORE any parsing/extraction/enrichment
+                            reason = spam_reason(
+                                (ad.get("advertiser_name") or "").lower(),
+                                (ad.get("caption") or "").lower(),
+                                landing_url_lower,
+                            )
+                            if reason:
+                                print(f"🚫 {reason} (advertiser: {ad.get('advertiser_name')}) - skipping")
+                                consecutive_filtered += 1
+                                continue
+
+                            ad["search_query"] = query
+                            ad["country"] = ctry
+
+                            if ad.get("started_running_on"):
+                                start_date, days_running = parse_ad_start_date(ad["started_running_on"])
+                                ad["started_running_on"] = start_date
+                                ad["days_running"] = days_running
+
+                            # Initialize defaults
+                            ad["product_name"] = None
+                            ad["product_price"] = None
+                            ad["platform_type"] = None
+                            ad["page_type"] = "product_page"
+                            ad["is_spark_ad"] = False
+                            landing_html = None
                         
-                        # STEP 1: Detect Instagram Spark Ads FIRST (before product extraction)
-                        if "instagram.com" in landing_url_lower:
-                            ad["is_spark_ad"] = True
-                            ad["platform_type"] = "instagram"
+                            # STEP 1: Detect Instagram Spark Ads FIRST (before product extraction)
+                            if "instagram.com" in landing_url_lower:
+                                ad["is_spark_ad"] = True
+                                ad["platform_type"] = "instagram"
                             
-                            # Extract Instagram username from URL
-                            try:
-                                parsed = urlparse(landing_url)
-                                path_parts = [p for p in parsed.path.split('/') if p]
-                                if path_parts:
-                                    # Get first path segment (username)
-                                    instagram_username = path_parts[0]
-                                    # Remove trailing underscore if present
-                                    instagram_username = instagram_username.rstrip('_')
-                                    ad["product_name"] = instagram_username
-                                    print(f"📸 Instagram Spark Ad - Username: @{instagram_username}")
-                                else:
+                                # Extract Instagram username from URL
+                                try:
+                                    parsed = urlparse(landing_url)
+                                    path_parts = [p for p in parsed.path.split('/') if p]
+                                    if path_parts:
+                                        # Get first path segment (username)
+                                        instagram_username = path_parts[0]
+                                        # Remove trailing underscore if present
+                                        instagram_username = instagram_username.rstrip('_')
+                                        ad["product_name"] = instagram_username
+                                        print(f"📸 Instagram Spark Ad - Username: @{instagram_username}")
+                                    else:
+                                        ad["product_name"] = "Instagram Profile"
+                                        print(f"📸 Instagram Spark Ad - Could not extract username")
+                                except Exception as e:
+                                    print(f"⚠️ Instagram username extraction failed: {e}")
                                     ad["product_name"] = "Instagram Profile"
-                                    print(f"📸 Instagram Spark Ad - Could not extract username")
-                            except Exception as e:
-                                print(f"⚠️ Instagram username extraction failed: {e}")
-                                ad["product_name"] = "Instagram Profile"
                         
-                        # STEP 2: For non-Spark Ads, extract product info normally
-                        else:
-                            # ⚡ FAST MODE: Extract from URL only (no page loading)
-                            from app.workers.url_product_extractor import extract_product_name_from_url_path
-                            url_extracted_name = extract_product_name_from_url_path(landing_url)
-                            ad["product_name"] = url_extracted_name
-                            print(f"⚡ Product (URL-only): {url_extracted_name}")
+                            # STEP 2: For non-Spark Ads, extract product info normally
+                            else:
+                                # ⚡ FAST MODE: Extract from URL only (no page loading)
+                                from app.workers.url_product_extractor import extract_product_name_from_url_path
+                                url_extracted_name = extract_product_name_from_url_path(landing_url)
+                                ad["product_name"] = url_extracted_name
+                                print(f"⚡ Product (URL-only): {url_extracted_name}")
                             
-                            # Skip price, platform, and survey detection (requires page load)
-                            ad["product_price"] = None
-                            ad["page_type"] = "product_page"  # Default assumption
-                            ad["platform_type"] = None
+                                # Skip price, platform, and survey detection (requires page load)
+                                ad["product_price"] = None
+                                ad["page_type"] = "product_page"  # Default assumption
+                                ad["platform_type"] = None
 
-                        # ========== SPAM FILTER: Skip low-quality/irrelevant ads ==========
-                        
-                        # FILTER 1: Skip ads with Facebook landing pages (e.g., fitness classes, local services)
-                        landing_url_lower = ad.get("landing_url", "").lower()
-                        if "facebook.com" in landing_url_lower or "fb.me" in landing_url_lower:
-                            print(f"🚫 Facebook landing page detected (advertiser: {ad.get('advertiser_name')}) - skipping")
-                            consecutive_filtered += 1
-                            continue
-                        
-                        # FILTER 2: Skip romance/fantasy novel ads
-                        spam_advertisers = [
-                            # Major novel platforms
-                            "dreame", "worth reading", "novels lover", "romance stories", 
-                            "happyday", "myno", "novelread", "webnovel", "goodnovel",
-                            "readink", "ficfun", "anystories", "moboreader", "bravonovel",
-                            "inkitt", "wattpad", "sofanovel", "novelstar", "star novel",
-                            "novelmania", "royalnovel", "webfiction", "novelday", "forfun-100",
-                            # Generic story apps
-                            "dreamy stories", "my passion", "fiction lover", "storydreams",
-                            "storylover", "storyjoy", "readstories", "storyheart",
-                            "novelsweet", "dreamnovel", "fantasy lover", "romanceworld",
-                            "storytale", "lovenovel",
-                            # Alpha/werewolf themed
-                            "alpha romance", "luna tales", "wolfmate stories", "alpha's mate",
-                            "werewolf queen", "mate of the alpha", "the alpha's secret",
-                            "dark alpha series", "eternal alpha", "fated mates", "twin alphas",
-                            "alpha protector", "alpha's obsession", "alpha's claim",
-                            "soulbound alpha", "queen's alpha", "the alpha prophecy",
-                            "alpha's gambit", "alpha dynasty", "alpha's favor", "alpha's heir",
-                            "alpha's bond", "alpha's curse", "alpha's revenge", "alpha's betrayal",
-                            # Royal/billionaire themed
-                            "forbidden romance", "billionaire romance", "mafia romance",
-                            "dark romance realm", "royal romance tales", "broken royals",
-                            "secret heir romance", "forbidden king", "hidden identity stories",
-                            "royal blood romance", "enchanted kingdom", "cursed bloodlines",
-                            "mystic romance", "twisted love", "witches & royals", "dark royals",
-                            "lost heirs", "heir to the throne", "shattered promises",
-                            "forbidden heirs", "hidden legacy", "shadow romance", "phantom love",
-                            "royal seduction", "immortal royals", "vampire royals",
-                            "royals & wolves", "fated royals", "phantom heir",
-                            "forbidden royalty", "royal curse", "eclipse romance",
-                            "dynasty romance", "empress of love", "dark prince romance",
-                            "crown & alpha", "royal guardian",
-                            # Vampire/paranormal themed
-                            "vampire romance", "shifter romance", "paranormal royals",
-                            "immortal love", "stepmother diaries", "revenge fantasy",
-                            # Dating/video chat spam
-                            "tp 1014 17"  # Video chat spam app
-                        ]
-                        spam_keywords = [
-                            "alpha", "luna", "werewolf", "daddy", "breed", "betrayal", 
-                            "revenge", "stepmother", "heartbreak", "prescription",
-                            "fighter", "survivor", "stolen", "forbidden", "mate",
-                            "pack", "omega", "shifter", "billionaire romance", "mafia",
-                            "vampire", "alpha male", "stepdad", "stepson", "billionaire",
-                            "ceo romance", "bodyguard", "rejected", "romance novel",
-                            "story", "chapter", "book one", "episode", "novel app",
-                            "wolf", "fantasy", "novel", "dreame", "goodnovel", "webnovel",
-                            "royals", "heir", "crown", "throne", "prophecy", "curse",
-                            "immortal", "fated", "soulbound", "dark romance", "paranormal",
-                            "love stories",  # Romance story ads
-                            "reader"  # Novel reader apps (LeReader, MoboReader, etc.)
-                        ]
-                        spam_domains = [
-                            "dreame.com", "goodnovel.com", "webnovel.com", "ficfun.com",
-                            "moboreader.com", "bravonovel.com", "anystories.com",
-                            "play.google.com", "apps.apple.com", "app.google.com",
-                            "itunes.apple.com",  # Apple App Store (legacy URLs)
-                            "walmart.com", "temu.com",  # Large marketplace filters
-                            "app.adjust.com",  # Tracking/spam redirect URLs
-                            "apple.com/us/app/",  # Apple App Store URL patterns
-                            "/id15",  # Apple app store IDs (e.g., /id1564066347)
-                            "/id16",  # Apple app store IDs
-                            "mt=8",   # Apple App Store parameter
-                        ]
-                        
-                        # Check advertiser name - check both advertiser list AND keywords
-                        advertiser_lower = ad.get("advertiser_name", "").lower()
-                        if any(spam in advertiser_lower for spam in spam_advertisers):
-                            print(f"🚫 Spam detected (advertiser: {ad.get('advertiser_name')}) - skipping")
-                            consecutive_filtered += 1
-                            continue
-                        # Also check if advertiser name contains spam keywords
-                        if any(keyword in advertiser_lower for keyword in spam_keywords):
-                            print(f"🚫 Spam keyword in advertiser name: {ad.get('advertiser_name')} - skipping")
-                            consecutive_filtered += 1
-                            continue
-                        
-                        # Check product name
-                        product_lower = ad.get("product_name", "").lower()
-                        if any(keyword in product_lower for keyword in spam_keywords):
-                            print(f"🚫 Spam detected (product: {ad.get('product_name')}) - skipping")
-                            consecutive_filtered += 1
-                            continue
-                        
-                        # Check caption content - now checks for ANY spam keyword or advertiser name
-                        caption_lower = ad.get("caption", "").lower()
-                        
-                        # Check for spam keywords in caption
-                        caption_spam_keywords = [kw for kw in spam_keywords if kw in caption_lower]
-                        if caption_spam_keywords:
-                            print(f"🚫 Spam detected in caption (found: {', '.join(caption_spam_keywords[:3])}) - skipping")
-                            consecutive_filtered += 1
-                            continue
-                        
-                        # Also check if caption contains any spam advertiser names
-                        caption_spam_advertisers = [adv for adv in spam_advertisers if adv in caption_lower]
-                        if caption_spam_advertisers:
-                            print(f"🚫 Spam detected in caption (advertiser name: {caption_spam_advertisers[0]}) - skipping")
-                            consecutive_filtered += 1
-                            continue
-                        
-                        # Check landing URL domain for spam domains
-                        landing_url_lower = ad.get("landing_url", "").lower()
-                        if any(domain in landing_url_lower for domain in spam_domains):
-                            # More descriptive message based on domain type
-                            if "apple.com" in landing_url_lower or "google.com" in landing_url_lower:
-                                print(f"🚫 App Store link detected - skipping")
-                            elif "walmart.com" in landing_url_lower or "temu.com" in landing_url_lower:
-                                print(f"🚫 Large marketplace detected (Walmart/Temu) - skipping")
-                            else:
-                                print(f"🚫 Spam detected (domain: novel/story platform) - skipping")
-                            consecutive_filtered += 1
-                            continue
+                            # Product name spam check (the rest of the spam filter already ran above)
+                            reason = product_spam_reason((ad.get("product_name") or "").lower())
+                            if reason:
+                                print(f"🚫 {reason} (product: {ad.get('product_name')}) - skipping")
+                                consecutive_filtered += 1
+                                continue
+
+                            # Initialize monthly_visits
+                            ad["monthly_visits"] = None
                         
-                        # Check full landing URL for spam keywords (chapter, novel, love stories, etc.)
-                        url_spam_keywords = [kw for kw in spam_keywords if kw in landing_url_lower]
-                        if url_spam_keywords:
-                            print(f"🚫 Spam detected in URL (found: {', '.join(url_spam_keywords[:3])}) - skipping")
-                            consecutive_filtered += 1
-                            continue
-                        # ========== END SPAM FILTER ==========
-
-                        # Initialize monthly_visits
-                        ad["monthly_visits"] = None
+                            # Detect platform type (skip for Instagram Spark Ads - already set earlier)
+                            if not ad.get("is_spark_ad") and landing_html:
+                                try:
+                                    platform = detect_platform_from_html_only(landing_html)
+                                    ad["platform_type"] = platform
+                                    if platform and platform != "custom":
+                                        print(f"🛒 Platform: {platform.title()}")
+                                except Exception as e:
+                                    print(f"⚠️ Platform detection failed: {e}")
                         
-                        # Detect platform type (skip for Instagram Spark Ads - already set earlier)
-                        if not ad.get("is_spark_ad") and landing_html:
-                            try:
-                                platform = detect_platform_from_html_only(landing_html)
-                                ad["platform_type"] = platform
-                                if platform and platform != "custom":
-                                    print(f"🛒 Platform: {platform.title()}")
-                            except Exception as e:
-                                print(f"⚠️ Platform detection failed: {e}")
+                            if ad["is_spark_ad"]:
+                                print(f"✨ Spark Ad detected (Instagram) - skipping traffic lookup")
                         
-                        if ad["is_spark_ad"]:
-                            print(f"✨ Spark Ad detected (Instagram) - skipping traffic lookup")
-                        elif ad.get("landing_url"):
-                            try:
-                                # Resolve redirects to get final destination domain
-                                final_domain = await asyncio.to_thread(resolve_final_domain, ad["landing_url"])
-                                
-                                if final_domain:
-                                    # Store the extracted root domain (e.g., mutha.com, healthcentral.com)
-                                    ad["domain"] = final_domain
-                                    
-                                    if final_domain in domain_cache:
-                                        ad["monthly_visits"] = domain_cache[final_domain]
-                                    else:
-                                        # Run SpyFu API in thread pool to avoid blocking
-                                        spyfu_data = await asyncio.to_thread(get_seo_clicks, final_domain)
-                                        if spyfu_data.get("status") == "ok" and spyfu_data.get("seo_clicks"):
-                                            seo_clicks = spyfu_data["seo_clicks"]
-                                            tier = get_tier_from_visits(seo_clicks)
-                                            # Convert SEO clicks to estimated total visits
-                                            estimated_visits = estimate_monthly_visits(seo_clicks, tier)
-                                            ad["monthly_visits"] = int(estimated_visits)
-                                            domain_cache[final_domain] = ad["monthly_visits"]
-                                            original_domain = urlparse(ad["landing_url"]).netloc.replace("www.", "")
-                                            redirect_info = f" (redirect: {original_domain} → {final_domain})" if original_domain != final_domain else ""
-                                            print(f"📊 SpyFu: {final_domain}{redirect_info} → {seo_clicks:,} SEO clicks ({tier} tier) → {ad['monthly_visits']:,} est. visits")
-                                        else:
-                                            domain_cache[final_domain] = None
-                                            print(f"⚠️ SpyFu: No SEO data for {final_domain}")
-                            except Exception as e:
-                                print(f"❌ SpyFu error for {ad.get('landing_url')}: {e}")
-
-                        # 🆕 Extract and set page_id for main ad BEFORE scoring
-                        if ad.get("advertiser_url"):
-                            main_page_id = await extract_page_id_from_html(page, ad["advertiser_url"])
-                            if main_page_id:
-                                ad["page_id"] = main_page_id
+                            kept.append(ad)
+                            consecutive_filtered = 0  # Reset counter on successful ad acceptance
+
+                        # ⚡ Pass 2: redirect + SpyFu lookups for the whole batch, concurrently
+                        await enrich_traffic(
+                            [ad for ad in kept if not ad["is_spark_ad"]], domain_cache, url_domain_cache, known_direct
+                        )
+
+                        # Pass 3: page_id, scoring, saving and advertiser scraping (in feed order)
+                        for ad in kept:
+                            if total_ads >= max_ads:
+                                break
+
+                            # 🆕 Extract and set page_id for main ad BEFORE scoring
+                            if ad.get("advertiser_url"):
+                                main_page_id = await extract_page_id_from_html(page, ad["advertiser_url"])
+                                if main_page_id:
+                                    ad["page_id"] = main_page_id
                         
-                        ad_scored = score_ad(ad)
-                        save_ads([ad_scored])
-                        results.append(ad_scored)
-                        all_results.append(ad_scored)  # Collect for return
-                        total_ads += 1
-                        new_count += 1
-                        consecutive_filtered = 0  # Reset counter on successful ad acceptance
+                            ad_scored = score_ad(ad)
+                            await save_buffer.add([ad_scored])
+                            yield ad_scored
+                            total_ads += 1
+                            new_count += 1
                         
-                        # 🆕 ADVERTISER SCRAPING: Scrape all ads from this advertiser's page
-                        if SCRAPE_ADVERTISER_ADS and ad_scored.get("advertiser_url"):
-                            advertiser_name = ad_scored.get("advertiser_name", "Unknown")
-                            print(f"\n🔍 Extracting page_id from {advertiser_name}...")
-                            page_id = await extract_page_id_from_html(page, ad_scored["advertiser_url"])
-                            if page_id:
-                                # ✅ Check if we've already scraped this advertiser
-                                if page_id in scraped_advertisers:
-                                    print(f"  ⏭️ Already scraped {advertiser_name} (page_id: {page_id}), skipping...")
-                                    continue
+                            # 🆕 ADVERTISER SCRAPING: Scrape all ads from this advertiser's page
+                            if SCRAPE_ADVERTISER_ADS and ad_scored.get("advertiser_url"):
+                                advertiser_name = ad_scored.get("advertiser_name", "Unknown")
+                                page_id = ad_scored.get("page_id")  # ⚡ Already looked up before scoring
+                                if page_id:
+                                    # ✅ Check if we've already scraped this advertiser
+                                    if page_id in scraped_advertisers:
+                                        print(f"  ⏭️ Already scraped {advertiser_name} (page_id: {page_id}), skipping...")
+                                        continue
                                 
-                                # Scrape all ads from this advertiser
-                                advertiser_ads = await scrape_advertiser_all_ads(page, page_id, advertiser_name, ad_scored)
+                                    # Scrape all ads from this advertiser
+                                    advertiser_ads = await scrape_advertiser_all_ads(page, page_id, advertiser_name, ad_scored)
                                 
-                                if advertiser_ads:
-                                    # Process and save advertiser's ads
-                                    for adv_ad in advertiser_ads:
-                                        # Add date parsing and hash
-                                        if adv_ad.get("started_running_on"):
-                                            start_date, days_running = parse_ad_start_date(adv_ad["started_running_on"])
-                                            adv_ad["started_running_on"] = start_date
-                                            adv_ad["days_running"] = days_running
+                                    if advertiser_ads:
+                                        # Process advertiser's ads (saved together in one batch below)
+                                        advertiser_scored = []
+                                        for adv_ad in advertiser_ads:
+                                            # Hash first so already-seen creatives are skipped
+                                            adv_ad["creative_hash"] = creative_fingerprint(adv_ad)
+                                            if adv_ad["creative_hash"]:
+                                                if adv_ad["creative_hash"] in seen_creatives:
+                                                    continue
+                                                seen_creatives.add(adv_ad["creative_hash"])
                                         
-                                        adv_ad["creative_hash"] = creative_fingerprint(adv_ad)
+                                            # Add date parsing
+                                            if adv_ad.get("started_running_on"):
+                                                start_date, days_running = parse_ad_start_date(adv_ad["started_running_on"])
+                                                adv_ad["started_running_on"] = start_date
+                                                adv_ad["days_running"] = days_running
                                         
-                                        # Set page_id for advertiser ads
-                                        adv_ad["page_id"] = page_id
+                                            # Set page_id for advertiser ads
+                                            adv_ad["page_id"] = page_id
                                         
-                                        # 🆕 Extract product name and price (same as main ads)
-                                        if adv_ad.get("landing_url"):
-                                            landing_url = adv_ad["landing_url"]
+                                            # 🆕 Extract product name and price (same as main ads)
+                                            if adv_ad.get("landing_url"):
+                                                landing_url = adv_ad["landing_url"]
                                             
-                                            # Check for Instagram Spark Ads
-                                            if "instagram.com" in landing_url.lower():
-                                                adv_ad["is_spark_ad"] = True
-                                                adv_ad["platform_type"] = "instagram"
-                                                adv_ad["page_type"] = "product_page"
-                                                try:
-                                                    parsed = urlparse(landing_url)
-                                                    path_parts = [p for p in parsed.path.split('/') if p]
-                                                    if path_parts:
-                                                        instagram_username = path_parts[0].rstrip('_')
-                                                        adv_ad["product_name"] = instagram_username
-                                                    else:
+                                                # Check for Instagram Spark Ads
+                                                if "instagram.com" in landing_url.lower():
+                                                    adv_ad["is_spark_ad"] = True
+                                                    adv_ad["platform_type"] = "instagram"
+                                                    adv_ad["page_type"] = "product_page"
+                                                    try:
+                                                        parsed = urlparse(landing_url)
+                                                        path_parts = [p for p in parsed.path.split('/') if p]
+                                                        if path_parts:
+                                                            instagram_username = path_parts[0].rstrip('_')
+                                                            adv_ad["product_name"] = instagram_username
+                                                        else:
+                                                            adv_ad["product_name"] = "Instagram Profile"
+                                                    except Exception as e:
                                                         adv_ad["product_name"] = "Instagram Profile"
-                                                except Exception as e:
-                                                    adv_ad["product_name"] = "Instagram Profile"
-                                            else:
-                                                # ⚡ FAST MODE: Extract from URL only (no page loading)
-                                                from app.workers.url_product_extractor import extract_product_name_from_url_path
-                                                adv_ad["product_name"] = extract_product_name_from_url_path(landing_url)
-                                                adv_ad["product_price"] = None
-                                                adv_ad["page_type"] = "product_page"
-                                                adv_ad["platform_type"] = None
+                                                else:
+                                                    # ⚡ FAST MODE: Extract from URL only (no page loading)
+                                                    from app.workers.url_product_extractor import extract_product_name_from_url_path
+                                                    adv_ad["product_name"] = extract_product_name_from_url_path(landing_url)
+                                                    adv_ad["product_price"] = None
+                                                    adv_ad["page_type"] = "product_page"
+                                                    adv_ad["platform_type"] = None
                                             
-                                            # Extract domain
-                                            try:
-                                                adv_ad["domain"] = urlparse(landing_url).netloc.replace("www.", "")
-                                            except:
-                                                pass
+                                                # Extract domain
+                                                try:
+                                                    adv_ad["domain"] = fast_domain(landing_url)
+                                                except:
+                                                    pass
                                         
-                                        # Score and save
-                                        adv_ad_scored = score_ad(adv_ad)
-                                        save_ads([adv_ad_scored])
-                                        results.append(adv_ad_scored)
-                                        all_results.append(adv_ad_scored)
-                                        total_ads += 1
-                                        new_count += 1
+                                            # Score
+                                            adv_ad_scored = score_ad(adv_ad)
+                                            advertiser_scored.append(adv_ad_scored)
+                                            await save_buffer.add([adv_ad_scored])  # Queued before the consumer sees it
+                                            yield adv_ad_scored
+                                            total_ads += 1
+                                            new_count += 1
                                     
-                                    print(f"  💾 Saved {len(advertiser_ads)} ads from {advertiser_name}")
+                                        print(f"  💾 Queued {len(advertiser_scored)} new ads from {advertiser_name} for saving")
                                 
-                                # Mark this advertiser as scraped to prevent re-scraping
-                                scraped_advertisers.add(page_id)
-                                print(f"  ✅ Marked {advertiser_name} as scraped (page_id: {page_id})")
+                                    # Mark this advertiser as scraped to prevent re-scraping
+                                    scraped_advertisers.add(page_id)
+                                    print(f"  ✅ Marked {advertiser_name} as scraped (page_id: {page_id})")
                                 
-                                # Navigate back to original search page (re-navigate instead of go_back to avoid timeout)
-                                print(f"\n🔙 Returning to search results...")
-                                try:
-                                    await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                                    await page.wait_for_timeout(2000)
-                                except Exception as e:
-                                    print(f"  ⚠️ Error returning to search: {e}")
-                            else:
-                                print(f"  ⏭️ Skipping {advertiser_name} - couldn't extract page_id, continuing...")
-
-                        await asyncio.sleep(random.uniform(0.1, 0.3))
+                                    # Navigate back to original search page (re-navigate instead of go_back to avoid timeout)
+                                    print(f"\n🔙 Returning to search results...")
+                                    try:
+                                        await navigation_jitter()
+                                        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                                        await page.wait_for_selector('img[src*="scontent"]', timeout=10000)
+                                    except Exception as e:
+                                        print(f"  ⚠️ Error returning to search: {e}")
+                                else:
+                                    print(f"  ⏭️ Skipping {advertiser_name} - couldn't extract page_id, continuing...")
 
-                    if total_ads < max_ads:
-                        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                        await page.wait_for_timeout(2000)
-                        scroll_attempts += 1
-                        if scroll_attempts % 5 == 0:
-                            print(f"📜 Scrolled {scroll_attempts} times (total ads: {total_ads})")
+                        if total_ads < max_ads:
+                            # Scroll, then wait until new ad images appear (capped at 3s)
+                            prev_images = await page.evaluate(AD_IMAGE_COUNT_JS)
+                            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                            await wait_for_more_ad_images(page, prev_images, timeout=3000)
+                            scroll_attempts += 1
+                            if scroll_attempts % 5 == 0:
+                                print(f"📜 Scrolled {scroll_attempts} times (total ads: {total_ads})")
+                                await save_buffer.flush()  # Keep rows landing in the DB during long queries
 
-                print(f"📥 Scraping complete for this query — saved {new_count} ads (total {total_ads})")
+                    await save_buffer.flush()
+                    save_run_cache(domain_cache, scraped_advertisers, known_direct, cache_stamps)
+                    print(f"📥 Scraping complete for this query — saved {new_count} ads (total {total_ads})")
+        finally:
+            # Save what's pending even if a query crashes or the consumer stops early
+            await save_buffer.close()
 
-        await browser.close()
-        print(f"\n🎯 TEST complete — scraped {total_ads} ads total!")
+        await close_http_client()
+        print(f"\n🎯 TEST complete — scraped {total_ads} ads total ({save_buffer.saved} new in DB)!")
 
         with Session(engine) as session:
             count = session.exec(select(func.count()).select_from(AdCreative)).one()
             print(f"📊 Ads now stored in DB: {count}")
-        
-        return all_results
+
+async def _scrape_and_close(**kwargs) -> List[Dict[str, Any]]:
+    """Run a scrape and always close this loop's HTTP client, even on errors."""
+    try:
+        return await run_test_scrape(**kwargs)
+    finally:
+        await close_http_client()
 
 # Synchronous wrapper for distributed scraper
 def main(keyword: Optional[str] = None, limit: Optional[int] = None, country: str = "US") -> List[Dict[str, Any]]:
@@ -1146,7 +1483,7 @@ def main(keyword: Optional[str] = None, limit: Optional[int] = None, country: st
     Returns:
         List of scraped ads
     """
-    return asyncio.run(run_test_scrape(keyword=keyword, limit=limit, country=country))
+    return (uvloop.run if uvloop else asyncio.run)(_scrape_and_close(keyword=keyword, limit=limit, country=country))
 
 if __name__ == "__main__":
-    asyncio.run(run_test_scrape())
\ No newline at end of file
+    (uvloop.run if uvloop else asyncio.run)(_scrape_and_close())
\ No newline at end of file
@@ -1,64 +1,158 @@
 import asyncio
 import json
+import os
 import random
 import re
-import hashlib
+import threading
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, Any, List, Tuple, Optional
 from playwright.async_api import async_playwright, Page, Locator
-from sqlmodel import select
-from app.db.repo import save_ads, get_session
+from sqlmodel import select, func
+from app.db.repo import save_ads, get_session, make_creative_hash, known_creative_hashes  # stored hash - must match save_ads
 from app.db.models import AdCreative
 from app.scoring.ad_scoring import score_ad
 from app.config import CHROMIUM_BIN, SEARCH_QUERIES, COUNTRIES, MAX_ADS_PER_QUERY
+from app.workers.shared_browser import BROWSER_ARGS, get_browser
+
+# Optional uvloop event loop (Linux/macOS) - cheaper awaits for CDP traffic
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # ---------- helpers ----------
 
-def compute_run_time(ad: Dict[str, Any]) -> None:
+# Compiled once at import (these run on every page load)
+COOKIE_BUTTON_PATTERNS = [
+    re.compile(t, re.I) for t in (
+        "Allow all cookies", "Accept all", "Accept All",
+        "Only Allow Essential", "Allow essential and optional cookies",
+    )
+]
+ALL_ADS_TAB_PATTERN = re.compile(r"\bAll ads\b", re.I)
+CLICK_SETTLE_TIMEOUT_MS = 3000  # Max wait for the page to settle after a click
+SCROLL_PAUSE_MIN_MS = 300   # Pause between scrolls while new ads keep loading
+SCROLL_PAUSE_MAX_MS = 2000  # Backoff ceiling after empty batches
+
+# Concurrent searches save from worker threads; one batch at a time, so save_ads'
+# duplicate check (and the variant counts) always see the previous batch's rows
+SAVE_LOCK = threading.Lock()
+
+SHORT_MONTH_FMT = "%b %d, %Y"  # "Jan 5, 2024"
+LONG_MONTH_FMT = "%B %d, %Y"   # "January 5, 2024"
+
+# Month word (lowercase, short or full) -> number; English names regardless of locale
+_MONTH_NAMES = ("january", "february", "march", "april", "may", "june", "july",
+                "august", "september", "october", "november", "december")
+MONTHS = {name: i for i, name in enumerate(_MONTH_NAMES, 1)}
+MONTHS.update({name[:3]: i for i, name in enumerate(_MONTH_NAMES, 1)})
+MONTHS["sept"] = 9
+
+
+@lru_cache(maxsize=4096)
+def _parse_run_date(date_str: str) -> Optional[datetime]:
+    """
+    Parse an Ad Library date ("Nov 15, 2024" / "November 15, 2024").
+    ⚡ Month lookup + int() instead of strptime; strptime only for odd formats.
+    """
+    try:
+        month, rest = date_str.split(" ", 1)
+        day, year = rest.split(",", 1)
+        return datetime(int(year), MONTHS[month.rstrip(".").lower()], int(day))
+    except (ValueError, KeyError):
+        pass
+    for fmt in (SHORT_MONTH_FMT, LONG_MONTH_FMT):
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def compute_run_time(ad: Dict[str, Any], now: Optional[datetime] = None) -> None:
     """
     Parse started_running_on date and calculate days_running.
     Updates the ad dictionary in-place with:
     - started_running_on (as ISO string)
     - days_running (as integer)
+    
+    Pass `now` when processing a batch so the clock is read once per batch.
     """
     date_str = ad.get("started_running_on")
     if not date_str:
         return
 
-    try:
-        # Try both short and long month formats
-        parsed_date = None
-        for fmt in ["%b %d, %Y", "%B %d, %Y"]:
-            try:
-                parsed_date = datetime.strptime(date_str, fmt)
-                break
-            except ValueError:
-                continue
-
-        if parsed_date:
-            # Calculate days running
-            days_running = (datetime.utcnow() - parsed_date).days
-            # Store as ISO string and days
-            ad["started_running_on"] = parsed_date.date().isoformat()
-            ad["days_running"] = days_running
-    except Exception as e:
-        # If parsing fails, just skip
-        pass
+    parsed_date = _parse_run_date(date_str)
+    if parsed_date:
+        # Calculate days running
+        days_running = ((now or datetime.utcnow()) - parsed_date).days
+        # Store as ISO string and days
+        ad["started_running_on"] = parsed_date.date().isoformat()
+        ad["days_running"] = days_running
 
 
-def make_creative_hash(ad: Dict[str, Any]) -> str:
+def count_creative_variants(hashes: List[str]) -> Dict[str, int]:
+    """
+    Count stored ads per creative hash with one grouped query
+    (instead of one SELECT + session per ad).
+    
+    Hashes not in the in-memory known_creative_hashes() set are new creatives
+    and count as 0 without touching the DB.
+    """
+    known = known_creative_hashes()
+    hashes = list({h for h in hashes if h and h in known})
+    if not hashes:
+        return {}
+    with get_session() as s:
+        rows = s.exec(
+            select(AdCreative.creative_hash, func.count())
+            .where(AdCreative.creative_hash.in_(hashes))  # type: ignore
+            .group_by(AdCreative.creative_hash)
+        ).all()
+    return dict(rows)
+
+
+def score_and_save_batch(
+    batch: List[Dict[str, Any]], query: str, country: str, seen: Optional[set] = None
+) -> List[Dict[str, Any]]:
     """
-    Generate a stable hash for a creative using its video/image/caption content.
-    Used to detect duplicate ads (variants).
+    Annotate, score and save one extracted batch (one variant query, one save).
+    
+    `seen` holds (creative_hash, landing_url) keys already handled for this search;
+    cards Facebook re-renders while scrolling are dropped before any DB or scoring work.
     """
-    key = (
-        (ad.get("video_url") or "") +
-        (ad.get("image_url") or "") +
-        (ad.get("caption") or "")
-    ).strip()
-    if not key:
-        return ""
-    return hashlib.md5(key.encode("utf-8")).hexdigest()
+    now = datetime.utcnow()
+    fresh = []
+    for ad in batch:
+        ad["creative_hash"] = make_creative_hash(ad)
+        if seen is not None and ad["creative_hash"]:
+            key = (ad["creative_hash"], ad.get("landing_url"))
+            if key in seen:
+                continue
+            seen.add(key)
+        ad["search_query"] = query
+        ad["country"] = country
+        compute_run_time(ad, now)
+        fresh.append(ad)
+    batch = fresh
+
+    with SAVE_LOCK:
+        # 🧠 Creative hash + variant count
+        counts = count_creative_variants([ad["creative_hash"] for ad in batch])
+        scored = []
+        for ad in batch:
+            if ad["creative_hash"]:
+                # Earlier ads in this batch count too (they used to be saved one by one)
+                counts[ad["creative_hash"]] = counts.get(ad["creative_hash"], 0) + 1
+                ad["creative_variant_count"] = counts[ad["creative_hash"]]
+            else:
+                ad["creative_variant_count"] = 1
+            scored.append(score_ad(ad))
+
+        if scored:
+            save_ads(scored)
+    return scored
 
 
 async def click_if_visible(page: Page, selector: str) -> bool:
@@ -72,17 +166,24 @@ async def click_if_visible(page: Page, selector: str) -> bool:
     return False
 
 
+async def settle_after_click(page: Page, timeout: int = CLICK_SETTLE_TIMEOUT_MS):
+    """Wait for the requests a click kicked off, capped at `timeout` ms."""
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+    except:
+        pass  # Long-polling can keep the network busy - the cap is the old fixed wait
+
+
 async def accept_cookies_if_present(page: Page):
-    texts = [
-        "Allow all cookies", "Accept all", "Accept All",
-        "Only Allow Essential", "Allow essential and optional cookies"
-    ]
-    for t in texts:
+    for pattern in COOKIE_BUTTON_PATTERNS:
         try:
-            btn = page.get_by_role("button", name=re.compile(t, re.I))
+            btn = page.get_by_role("button", name=pattern)
             if await btn.is_visible(timeout=1000):
                 await btn.click()
-                await page.wait_for_timeout(1200)
+                try:
+                    await btn.wait_for(state="hidden", timeout=CLICK_SETTLE_TIMEOUT_MS)
+                except:
+                    pass
                 break
         except:
             pass
@@ -90,10 +191,10 @@ async def accept_cookies_if_present(page: Page):
 
 async def ensure_all_ads_tab(page: Page):
     try:
-        chip = page.get_by_role("button", name=re.compile(r"\bAll ads\b", re.I))
+        chip = page.get_by_role("button", name=ALL_ADS_TAB_PATTERN)
         if await chip.is_visible(timeout=2000):
             await chip.click()
-            await page.wait_for_timeout(1200)
+            await settle_after_click(page)
     except:
         pass
 
@@ -120,7 +221,6 @@ async def click_all_see_more(page: Page) -> int:
                 if await btn.is_visible():
                     await btn.click()
                     clicked += 1
-                    await page.wait_for_timeout(1200)
             except:
                 pass
 
@@ -132,284 +232,361 @@ async def click_all_see_more(page: Page) -> int:
                 if await btn.is_visible():
                     await btn.click()
                     clicked += 1
-                    await page.wait_for_timeout(1200)
             except:
                 pass
     except:
         pass
+    if clicked:
+        await settle_after_click(page)  # One wait for the whole batch of expansions
     return clicked
 
 # ---------- extraction ----------
 
-async def extract_ads_from_page(page: Page) -> List[Dict[str, Any]]:
-    ads: List[Dict[str, Any]] = []
-
-    # NEW APPROACH: Use JavaScript to extract ad data directly
-    extract_js = """
-    () => {
-        const images = Array.from(document.querySelectorAll('img[src*="scontent"]'));
-        const ads = [];
-        const seenAds = new Set();
-
-        images.forEach(img => {
-            // Walk up to find ad card container
-            let current = img;
-            let depth = 0;
-            let adCard = null;
-
-            while (current && depth < 15) {
-                const text = current.textContent?.trim() || '';
-                // Look for container with "Sponsored" text and reasonable content
-                if (text.includes('Sponsored') && text.length > 50) {
-                    adCard = current;
-                    break;
+# ⚡ Streaming extractor: a MutationObserver (installed once per document) queues newly
+# added/loaded ad images; each poll only processes those, so earlier cards are never
+# re-walked. Processed cards are marked with data-scraped="1".
+STREAM_EXTRACTOR_JS = r"""
+() => {
+    if (window.__adExtractor) return;
+    const IMG_SELECTOR = 'img[src*="scontent"]';
+    // Run-date patterns, compiled once (only run once indexOf finds the marker)
+    const STARTED_MARKER = 'Started running on';
+    const STARTED_RE = /Started running on\s+([A-Za-z]+\s+\d{1,2},\s+\d{4})/i;
+    const RUNTIME_RE = /Started running on[^\n·]+(·[^\n]+)?/i;
+    const pending = new Set();
+
+    const queueImages = node => {
+        if (node.matches && node.matches(IMG_SELECTOR)) pending.add(node);
+        if (node.querySelectorAll) node.querySelectorAll(IMG_SELECTOR).forEach(img => pending.add(img));
+    };
+    queueImages(document);
+    new MutationObserver(mutations => {
+        for (const m of mutations) {
+            if (m.type === 'attributes') {
+                queueImages(m.target);  // lazy-loaded src
+            } else {
+                m.addedNodes.forEach(n => { if (n.nodeType === 1) queueImages(n); });
+            }
+        }
+    }).observe(document.body, {childList: true, subtree: true, attributes: true, attributeFilter: ['src']});
+
+    const findAdCard = img => {
+        // Walk up to find ad card container
+        let current = img;
+        let depth = 0;
+        while (current && depth < 15) {
+            const text = current.textContent?.trim() || '';
+            // Look for container with "Sponsored" text and reasonable content
+            if (text.includes('Sponsored') && text.length > 50) return current;
+            current = current.parentElement;
+            depth++;
+        }
+        return null;
+    };
+
+    const extractCard = adCard => {
+        const data = {};
+
+        // Advertiser name and URL
+        const advertiserLink = adCard.querySelector('a[href*="facebook.com/"]');
+        if (advertiserLink) {
+            data.advertiser_name = advertiserLink.textContent?.trim();
+            data.advertiser_url = advertiserLink.getAttribute('href');
+        }
+
+        // Get all images (excluding small avatars)
+        const adImage = Array.from(adCard.querySelectorAll(IMG_SELECTOR)).find(img => {
+            const width = img.naturalWidth || parseInt(img.getAttribute('width')) || 0;
+            return width > 100; // Filter out small avatar images
+        });
+        if (adImage) {
+            data.image_url = adImage.getAttribute('src');
+        }
+
+        // Video
+        const video = adCard.querySelector('video');
+        if (video) {
+            data.video_url = video.getAttribute('src') || video.querySelector('source')?.getAttribute('src');
+            data.poster_url = video.getAttribute('poster');
+        }
+
+        // Caption - get the main text content
+        const fullText = adCard.textContent || '';
+        const lines = fullText.split('\n').map(l => l.trim()).filter(l => l);
+
+        // Extract "Started running on" date - search in parent container
+        let containerToSearch = adCard.parentElement;
+        let searchDepth = 0;
+        while (containerToSearch && searchDepth < 5) {
+            const containerText = containerToSearch.textContent || '';
+            // ⚡ Cheap substring check first - most containers have no run date
+            const startedMatch = containerText.indexOf(STARTED_MARKER) >= 0 && STARTED_RE.exec(containerText);
+            if (startedMatch) {
+                data.started_running_on = startedMatch[1].trim();
+                const fullMatch = RUNTIME_RE.exec(containerText);
+                if (fullMatch) {
+                    data.raw_runtime_text = fullMatch[0].trim();
+                }
+                break;
+            }
+            containerToSearch = containerToSearch.parentElement;
+            searchDepth++;
+        }
+
+        // Filter out "Sponsored", advertiser name, and runtime text from caption
+        const caption = lines.filter(l =>
+            l !== 'Sponsored' &&
+            l !== data.advertiser_name &&
+            !l.includes('Started running on') &&
+            l.length > 10
+        ).join(' ').substring(0, 500);
+        if (caption) {
+            data.caption = caption;
+        }
+
+        // Landing URL and CTA
+        const ctaLinks = Array.from(adCard.querySelectorAll('a[href^="http"]')).filter(a => {
+            const href = a.getAttribute('href') || '';
+            // Include Facebook redirect links but exclude Facebook pages/profiles
+            if (href.includes('.facebook.com/') && href.includes('.php?u=')) {
+                return true; // Keep redirect links like l.facebook.com/l.php?u=... or 1.facebook.com/1.php?u=...
+            }
+            return !href.includes('facebook.com/');
+        });
+        if (ctaLinks.length > 0) {
+            let rawUrl = ctaLinks[0].getAttribute('href') || '';
+
+            // 🧠 Handle redirect links (l.facebook.com/l.php?u=... or 1.facebook.com/1.php?u=...)
+            if (rawUrl.includes('.facebook.com/') && rawUrl.includes('.php?u=')) {
+                const match = rawUrl.match(/u=([^&]+)/);
+                if (match && match[1]) {
+                    rawUrl = decodeURIComponent(match[1]);
                 }
-                current = current.parentElement;
-                depth++;
             }
 
-            if (adCard && !seenAds.has(adCard)) {
-                seenAds.add(adCard);
-
-                const data = {};
+            // 🧹 Clean tracking params
+            rawUrl = rawUrl.replace(/(\?|&)fbclid=[^&]+/g, '').replace(/(\?|&)utm_[^&]+/g, '');
+
+            data.landing_url = rawUrl;
+            data.cta_text = ctaLinks[0].textContent?.trim() || null;
+        } else {
+            // Fallback: Extract URLs from plain text
+            const lowerText = fullText.toLowerCase();
+            const httpIndex = lowerText.indexOf('http');
+            const wwwIndex = lowerText.indexOf('www.');
+            let startIndex = -1;
+
+            if (httpIndex >= 0 && (wwwIndex < 0 || httpIndex < wwwIndex)) {
+                startIndex = httpIndex;
+            } else if (wwwIndex >= 0) {
+                startIndex = wwwIndex;
+            }
 
-                // Advertiser name and URL
-                const advertiserLink = adCard.querySelector('a[href*="facebook.com/"]');
-                if (advertiserLink) {
-                    data.advertiser_name = advertiserLink.textContent?.trim();
-                    data.advertiser_url = advertiserLink.getAttribute('href');
-                }
+            if (startIndex >= 0) {
+                let endIndex = fullText.indexOf(' ', startIndex);
+                if (endIndex < 0) endIndex = fullText.indexOf('\n', startIndex);
+                if (endIndex < 0) endIndex = fullText.length;
 
-                // Get all images (excluding small avatars)
-                const allImages = Array.from(adCard.querySelectorAll('img[src*="scontent"]'));
-                const adImages = allImages.filter(img => {
-                    const width = img.naturalWidth || parseInt(img.getAttribute('width')) || 0;
-                    return width > 100; // Filter out small avatar images
-                });
-                if (adImages.length > 0) {
-                    data.image_url = adImages[0].getAttribute('src');
+                let extractedUrl = fullText.substring(startIndex, endIndex).trim().toLowerCase();
+                if (!extractedUrl.startsWith('http')) {
+                    extractedUrl = 'https://' + extractedUrl;
                 }
+                data.landing_url = extractedUrl;
+            }
+        }
+        return data;
+    };
 
-                // Video
-                const video = adCard.querySelector('video');
-                if (video) {
-                    data.video_url = video.getAttribute('src') || video.querySelector('source')?.getAttribute('src');
-                    data.poster_url = video.getAttribute('poster');
-                }
+    const poll = () => {
+        const images = Array.from(pending);
+        pending.clear();
+        const ads = [];
+        const seenAds = new Set();
+        for (const img of images) {
+            if (!img.isConnected) continue;
+            const adCard = findAdCard(img);
+            if (!adCard || adCard.dataset.scraped || seenAds.has(adCard)) continue;
+            seenAds.add(adCard);
+
+            const data = extractCard(adCard);
+            // Only add if we have some useful data - otherwise retry on the next poll
+            if (data.caption || data.image_url || data.video_url || data.landing_url) {
+                adCard.dataset.scraped = '1';
+                ads.push(data);
+            } else {
+                pending.add(img);
+            }
+        }
+        return ads;
+    };
 
-                // Caption - get the main text content
-                const fullText = adCard.textContent || '';
-                const lines = fullText.split('\\n').map(l => l.trim()).filter(l => l);
-
-                // Extract "Started running on" date - search in parent container
-                let containerToSearch = adCard.parentElement;
-                let searchDepth = 0;
-                while (containerToSearch && searchDepth < 5) {
-                    const containerText = containerToSearch.textContent || '';
-                    const startedMatch = containerText.match(/Started running on\\s+([A-Za-z]+\\s+\\d{1,2},\\s+\\d{4})/i);
-                    if (startedMatch) {
-                        data.started_running_on = startedMatch[1].trim();
-                        const fullMatch = containerText.match(/Started running on[^\\n·]+(·[^\\n]+)?/i);
-                        if (fullMatch) {
-                            data.raw_runtime_text = fullMatch[0].trim();
-                        }
-                        break;
-                    }
-                    containerToSearch = containerToSearch.parentElement;
-                    searchDepth++;
-                }
+    window.__adExtractor = { poll };
+}
+"""
 
-                // Filter out "Sponsored", advertiser name, and runtime text from caption
-                const caption = lines.filter(l => 
-                    l !== 'Sponsored' && 
-                    l !== data.advertiser_name &&
-                    !l.includes('Started running on') &&
-                    l.length > 10
-                ).join(' ').substring(0, 500);
-                if (caption) {
-                    data.caption = caption;
-                }
+POLL_ADS_JS = "() => window.__adExtractor ? window.__adExtractor.poll() : null"
 
-                // Landing URL and CTA
-                const ctaLinks = Array.from(adCard.querySelectorAll('a[href^="http"]')).filter(a => {
-                    const href = a.getAttribute('href') || '';
-                    // Include Facebook redirect links but exclude Facebook pages/profiles
-                    if (href.includes('.facebook.com/') && href.includes('.php?u=')) {
-                        return true; // Keep redirect links like l.facebook.com/l.php?u=... or 1.facebook.com/1.php?u=...
-                    }
-                    return !href.includes('facebook.com/ads/library') &&
-                           !href.includes('facebook.com/profile') &&
-                           !href.includes('facebook.com/pages/') &&
-                           !href.includes('facebook.com/');
-                });
-                if (ctaLinks.length > 0) {
-                    let rawUrl = ctaLinks[0].getAttribute('href') || '';
-
-                    // 🧠 Handle redirect links (l.facebook.com/l.php?u=... or 1.facebook.com/1.php?u=...)
-                    if (rawUrl.includes('.facebook.com/') && rawUrl.includes('.php?u=')) {
-                        const match = rawUrl.match(/u=([^&]+)/);
-                        if (match && match[1]) {
-                            rawUrl = decodeURIComponent(match[1]);
-                        }
-                    }
-
-                    // 🧹 Clean tracking params
-                    rawUrl = rawUrl.replace(/(\?|&)fbclid=[^&]+/g, '').replace(/(\?|&)utm_[^&]+/g, '');
-
-                    data.landing_url = rawUrl;
-                    data.cta_text = ctaLinks[0].textContent?.trim() || null;
-                } else {
-                    // Fallback: Extract URLs from plain text  
-                    const httpIndex = fullText.toLowerCase().indexOf('http');
-                    const wwwIndex = fullText.toLowerCase().indexOf('www.');
-                    let startIndex = -1;
-
-                    if (httpIndex >= 0 and (wwwIndex < 0 or httpIndex < wwwIndex)):
-                        startIndex = httpIndex
-                    elif wwwIndex >= 0:
-                        startIndex = wwwIndex
-
-                    if startIndex >= 0:
-                        let endIndex = fullText.indexOf(' ', startIndex)
-                        if endIndex < 0: endIndex = fullText.indexOf('\\n', startIndex)
-                        if endIndex < 0: endIndex = fullText.length
-
-                        let extractedUrl = fullText.substring(startIndex, endIndex).trim().toLowerCase()
-                        if not extractedUrl.startswith('http'):
-                            extractedUrl = 'https://' + extractedUrl
-                        data.landing_url = extractedUrl
-                }
+# Init-script form: installs the extractor on every document the page loads
+# (init scripts run before <body> exists, so wait for it when needed)
+EXTRACTOR_INIT_SCRIPT = f"""
+(() => {{
+    const install = {STREAM_EXTRACTOR_JS};
+    if (document.body) install();
+    else document.addEventListener('DOMContentLoaded', install, {{ once: true }});
+}})();
+"""
 
-                // Only add if we have some useful data
-                if (data.caption or data.image_url or data.video_url or data.landing_url):
-                    ads.append(data)
-            }
-        })
 
-        return ads
-    }
+async def install_ad_extractor(page: Page):
+    """
+    ⚡ Register the streaming extractor once per page: each navigation installs it
+    in-page, so polls don't resend and recompile the extractor source.
+    Call before the page's first navigation.
     """
+    await page.add_init_script(EXTRACTOR_INIT_SCRIPT)
 
-    ads = await page.evaluate(extract_js)
+
+async def extract_ads_from_page(page: Page) -> List[Dict[str, Any]]:
+    """Return ads that appeared since the previous call on this page's current document."""
+    ads = await page.evaluate(POLL_ADS_JS)
+    if ads is None:
+        # No init script (see install_ad_extractor) or <body> not parsed yet - install now
+        await page.evaluate(STREAM_EXTRACTOR_JS)
+        ads = await page.evaluate(POLL_ADS_JS)
     return ads
 
 # ---------- main ----------
 
+SCRAPE_CONCURRENCY = 5  # (query, country) pages scraped at once, each in its own browser context
+DEBUG_SCRAPE = os.getenv("DEBUG_SCRAPE") == "1"  # Save a screenshot + DOM inspection per search
+
+CONTEXT_OPTIONS = {
+    "viewport": {"width": 1366, "height": 850},
+    "user_agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+}
+
+# Video bytes and fonts aren't needed - the extractor only reads <video src>/poster.
+# Images still load: the extractor tells creatives from avatars by decoded width.
+BLOCKED_RESOURCE_TYPES = {"media", "font"}
+
+
+async def block_heavy_resources(route):
+    """Route handler that aborts BLOCKED_RESOURCE_TYPES requests."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def save_debug_snapshot(page: Page, query: str, country: str):
+    """DEBUG_SCRAPE only: full-page screenshot + DOM inspection (one file per search)."""
+    debug_suffix = re.sub(r"\W+", "_", f"{query}_{country}")
+    # 📸 Take a debug screenshot of the current page
+    await page.screenshot(path=f"debug_{debug_suffix}.png", full_page=True)
+    print(f"📸 Saved screenshot of current page to debug_{debug_suffix}.png")
+
+    # 🔍 Inspect DOM (unchanged)
+    inspect_js = """ ... """  # kept as-is
+
+    try:
+        dom_info = await page.evaluate(inspect_js)
+
+        def write_inspection():
+            with open(f"dom_inspection_{debug_suffix}.json", "w") as f:
+                json.dump(dom_info, f, indent=2)
+
+        await asyncio.to_thread(write_inspection)  # Don't block the other searches
+    except Exception as e:
+        print(f"⚠️ DOM inspection failed: {e}")  # Debug output only - keep scraping
+
+
+async def scrape_one(browser, query: str, country: str, sem: asyncio.Semaphore) -> int:
+    """Scrape one (query, country) search in an isolated context. Returns ads saved."""
+    async with sem:
+        context = await browser.new_context(**CONTEXT_OPTIONS)
+        await context.route("**/*", block_heavy_resources)
+        results: List[Dict[str, Any]] = []
+        try:
+            page = await context.new_page()
+            await install_ad_extractor(page)
+            url = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country={country}&q={query}"
+            print(f"\n🌍 Scraping {query!r} in {country} → {url}")
+            await page.goto(url, wait_until="domcontentloaded")
+
+            await accept_cookies_if_present(page)
+            await ensure_all_ads_tab(page)
+
+            # Wait for images to load (indicating ads have rendered)
+            try:
+                await page.wait_for_selector('img[src*="scontent"]', timeout=15000)
+                print("✅ Images loaded, ads should be visible")
+            except:
+                print("⚠️ No images found, but continuing...")
+
+            if DEBUG_SCRAPE:
+                await save_debug_snapshot(page, query, country)
+
+            seen: set = set()  # (creative_hash, landing_url) already handled for this search
+
+            # ✅ NEW: grab first batch immediately
+            first_batch = await extract_ads_from_page(page)
+            results.extend(await asyncio.to_thread(score_and_save_batch, first_batch, query, country, seen))
+            print(f"📥 Initial load captured {len(first_batch)} ads for {query}/{country}")
+
+            stalled = 0
+            new = len(results)
+            while len(results) < MAX_ADS_PER_QUERY and stalled < 3:
+                await smart_scroll(page)
+                # ⚡ Short pause while ads keep coming, backing off on empty batches
+                sleep_ms = SCROLL_PAUSE_MIN_MS if new else min(SCROLL_PAUSE_MIN_MS * 2 ** stalled, SCROLL_PAUSE_MAX_MS)
+                await page.wait_for_timeout(sleep_ms + random.randint(0, 150))
+                clicked = await click_all_see_more(page)
+                if clicked:
+                    print(f"👉 Clicked {clicked} 'See more ads' button(s)")
+
+                batch = await extract_ads_from_page(page)
+                # DB work in a thread so the other searches keep scrolling meanwhile
+                scored = await asyncio.to_thread(score_and_save_batch, batch, query, country, seen)
+                results.extend(scored)
+                new = len(scored)
+
+                print(f"📊 Collected {len(results)} ads so far for {query}/{country} (+{new} new)")
+                stalled = stalled + 1 if new == 0 else 0
+
+            print(f"✅ Done {query}/{country}: saved {len(results)}")
+            return len(results)
+        except Exception as e:
+            print(f"❌ {query}/{country} failed: {e}")
+            return len(results)  # Batches before the failure are already saved
+        finally:
+            await context.close()
+
+
 async def scrape_meta():
     async with async_playwright() as p:
-        browser = await p.chromium.launch(
+        # Shared Chromium over CDP when one is running, otherwise our own
+        browser = await get_browser(
+            p,
             headless=True,
             executable_path=CHROMIUM_BIN,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-features=IsolateOrigins,site-per-process',
-                '--disable-site-isolation-trials'
-            ]
+            args=BROWSER_ARGS,
         )
-        context = await browser.new_context(
-            viewport={"width": 1366, "height": 850},
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            )
-        )
-        page = await context.new_page()
-
-        grand_total = 0
 
-        for query in SEARCH_QUERIES:
-            for country in COUNTRIES:
-                url = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country={country}&q={query}"
-                print(f"\n🌍 Scraping {query!r} in {country} → {url}")
-                await page.goto(url, wait_until="domcontentloaded")
-                await page.wait_for_timeout(2500)
-
-                await accept_cookies_if_present(page)
-                await ensure_all_ads_tab(page)
-
-                # Wait for images to load (indicating ads have rendered)
-                try:
-                    await page.wait_for_selector('img[src*="scontent"]', timeout=15000)
-                    print("✅ Images loaded, ads should be visible")
-                except:
-                    print("⚠️ No images found, but continuing...")
-
-                # 📸 Take a debug screenshot of the current page
-                await page.screenshot(path="debug.png", full_page=True)
-                print("📸 Saved screenshot of current page to debug.png")
-
-                # 🔍 Inspect DOM (unchanged)
-                inspect_js = """ ... """  # kept as-is
-
-                dom_info = await page.evaluate(inspect_js)
-                with open("dom_inspection.json", "w") as f:
-                    json.dump(dom_info, f, indent=2)
-
-                results: List[Dict[str, Any]] = []
-
-                # ✅ NEW: grab first batch immediately
-                first_batch = await extract_ads_from_page(page)
-                for ad in first_batch:
-                    ad["search_query"] = query
-                    ad["country"] = country
-                    compute_run_time(ad)
-
-                    # 🧠 Creative hash + variant count
-                    ad["creative_hash"] = make_creative_hash(ad)
-                    if ad["creative_hash"]:
-                        with get_session() as s:
-                            existing = s.exec(
-                                select(AdCreative).where(AdCreative.creative_hash == ad["creative_hash"])
-                            ).all()
-                            ad["creative_variant_count"] = len(existing) + 1
-                    else:
-                        ad["creative_variant_count"] = 1
-
-                    ad_scored = score_ad(ad)
-                    save_ads([ad_scored])
-                    results.append(ad_scored)
-                print(f"📥 Initial load captured {len(first_batch)} ads for {query}/{country}")
-
-                stalled = 0
-                while len(results) < MAX_ADS_PER_QUERY and stalled < 3:
-                    await smart_scroll(page)
-                    await page.wait_for_timeout(random.randint(1200, 2200))
-                    clicked = await click_all_see_more(page)
-                    if clicked:
-                        print(f"👉 Clicked {clicked} 'See more ads' button(s)")
-
-                    batch = await extract_ads_from_page(page)
-                    new = 0
-                    for ad in batch:
-                        ad["search_query"] = query
-                        ad["country"] = country
-                        compute_run_time(ad)
-
-                        # 🧠 Creative hash + variant count
-                        ad["creative_hash"] = make_creative_hash(ad)
-                        if ad["creative_hash"]:
-                            with get_session() as s:
-                                existing = s.exec(
-                                    select(AdCreative).where(AdCreative.creative_hash == ad["creative_hash"])
-                                ).all()
-                                ad["creative_variant_count"] = len(existing) + 1
-                        else:
-                            ad["creative_variant_count"] = 1
-
-                        ad_scored = score_ad(ad)
-                        save_ads([ad_scored])
-                        results.append(ad_scored)
-                        new += 1
-
-                    print(f"📊 Collected {len(results)} ads so far for {query}/{country} (+{new} new)")
-                    stalled = stalled + 1 if new == 0 else 0
-
-                print(f"✅ Done {query}/{country}: saved {len(results)}")
-                grand_total += len(results)
+        # ⚡ Searches are mostly network waits - run several at once, one context each
+        sem = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+        counts = await asyncio.gather(*(
+            scrape_one(browser, query, country, sem)
+            for query in SEARCH_QUERIES
+            for country in COUNTRIES
+        ))
+        grand_total = sum(counts)
 
         print(f"\n🎉 GRAND TOTAL scraped: {grand_total}")
         await browser.close()
 
 if __name__ == "__main__":
-    asyncio.run(scrape_meta())
+    (uvloop.run if uvloop else asyncio.run)(scrape_meta())
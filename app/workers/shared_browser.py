@@ -0,0 +1,134 @@
+"""
+Shared Chromium Module
+
+Lets several scrapers (scrape_meta, scrape_tiktok) drive ONE Chromium process
+over CDP instead of each cold-starting its own browser.
+
+Usage:
+    python -m app.workers.shared_browser    # start Chromium once, keep it running
+
+Scrapers call get_browser(p): it connects to the running browser (endpoint from
+CHROMIUM_CDP_ENDPOINT or the file written by the launcher) and falls back to a
+private launch when none is running. Either way, browser.close() is correct for
+the caller - on a CDP connection it only disconnects and drops its own contexts.
+"""
+
+import json
+import os
+import subprocess
+import time
+import urllib.request
+from typing import Optional
+
+from app.config import CHROMIUM_BIN, CHROMIUM_CDP_ENDPOINT
+
+ENDPOINT_FILE = ".cache/chromium_ws_endpoint"
+LOCK_FILE = ".cache/chromium_launcher.lock"
+DEBUG_PORT = int(os.getenv("CHROMIUM_DEBUG_PORT", "9222"))
+
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--disable-site-isolation-trials',
+]
+
+
+def read_endpoint() -> Optional[str]:
+    """Return the shared browser's WebSocket endpoint, or None if none was started."""
+    if CHROMIUM_CDP_ENDPOINT:
+        return CHROMIUM_CDP_ENDPOINT
+    try:
+        with open(ENDPOINT_FILE) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+async def get_browser(p, **launch_kwargs):
+    """
+    Connect to the shared Chromium if one is running, else launch a private one.
+
+    Args:
+        p: The caller's async_playwright() instance
+        launch_kwargs: Passed to chromium.launch() for the fallback launch
+    """
+    endpoint = read_endpoint()
+    if endpoint:
+        try:
+            return await p.chromium.connect_over_cdp(endpoint)
+        except Exception as e:
+            print(f"⚠️ Shared browser at {endpoint} unreachable ({e}) - launching a private one")
+    return await p.chromium.launch(**launch_kwargs)
+
+
+def _fetch_ws_endpoint(timeout: float = 15.0) -> str:
+    """Poll Chromium's /json/version until it reports its WebSocket URL."""
+    url = f"http://127.0.0.1:{DEBUG_PORT}/json/version"
+    end = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                return json.load(resp)["webSocketDebuggerUrl"]
+        except Exception:
+            if time.monotonic() > end:
+                raise
+            time.sleep(0.2)
+
+
+def launch_shared_browser() -> subprocess.Popen:
+    """
+    Start the shared headless Chromium and write its endpoint to ENDPOINT_FILE.
+
+    Only one launcher can hold LOCK_FILE at a time, so two launchers can't
+    start competing browsers on the same port.
+    """
+    from playwright.sync_api import sync_playwright
+
+    os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
+    lock_fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)  # FileExistsError if held
+    os.write(lock_fd, str(os.getpid()).encode())
+    os.close(lock_fd)
+
+    try:
+        executable = CHROMIUM_BIN
+        if not executable:
+            with sync_playwright() as p:
+                executable = p.chromium.executable_path
+
+        proc = subprocess.Popen([
+            executable,
+            "--headless=new",
+            f"--remote-debugging-port={DEBUG_PORT}",
+            "--no-first-run",
+            *BROWSER_ARGS,
+        ])
+        ws_endpoint = _fetch_ws_endpoint()
+    except Exception:
+        os.remove(LOCK_FILE)  # Failed launch - let the next launcher try
+        raise
+    with open(ENDPOINT_FILE, "w") as f:
+        f.write(ws_endpoint)
+    print(f"✅ Shared Chromium running (pid {proc.pid}) → {ws_endpoint}")
+    return proc
+
+
+def main():
+    try:
+        proc = launch_shared_browser()
+    except FileExistsError:
+        print(f"❌ Another launcher holds {LOCK_FILE} (delete it if that launcher is gone)")
+        return
+    try:
+        proc.wait()
+    except KeyboardInterrupt:
+        proc.terminate()
+    finally:
+        for path in (ENDPOINT_FILE, LOCK_FILE):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.workers.api_cache import cache_get, cache_set
 
 # ✅ RapidAPI credentials
 RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY", "0021f31222mshc787216197e8947p13e89bjsn11276befd073")
@@ -10,15 +13,31 @@ HEADERS = {
     "Accept": "application/json"
 }
 
+# ⚡ Keep-alive session with retry/backoff on transient errors and 429 (honors Retry-After)
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+                      allowed_methods=["GET"], raise_on_status=False),
+))
+
 def get_monthly_visits(domain: str) -> dict:
     """
     Fetch monthly visits for a given domain using SimilarWeb v2 Website Analytics.
     Returns only the total visits count (traffic.visitsTotalCount).
+    Successful responses are cached for a day (see api_cache).
     """
+    cache_key = f"similarweb:{domain}"
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return cached
+
     params = {"domain": domain}
 
     try:
-        res = requests.get(BASE_URL, headers=HEADERS, params=params, timeout=15)
+        res = _SESSION.get(BASE_URL, params=params, timeout=15)
         res.raise_for_status()
         data = res.json()
 
@@ -29,6 +48,7 @@ def get_monthly_visits(domain: str) -> dict:
             visits = traffic.get("visitsTotalCount")
 
         result = {"domain": domain, "monthly_visits": visits}
+        cache_set(cache_key, result)
         print(f"✅ {domain} — Monthly Visits: {visits}")
         return result
 
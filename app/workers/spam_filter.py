@@ -0,0 +1,249 @@
+"""
+Spam Filter Module
+
+Term lists used to drop low-quality/irrelevant ads (romance/novel apps,
+app store links, large marketplaces) and the helpers that match them.
+
+When pyahocorasick is installed, all lists are compiled into a single
+Aho-Corasick automaton so each text is scanned once (in C) instead of
+once per term. Otherwise each list is compiled into one alternation regex.
+"""
+
+import re
+from typing import Iterable, List, Optional
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+# Romance/fantasy novel app advertisers
+SPAM_ADVERTISERS = (
+    # Major novel platforms
+    "dreame", "worth reading", "novels lover", "romance stories",
+    "happyday", "myno", "novelread", "webnovel", "goodnovel",
+    "readink", "ficfun", "anystories", "moboreader", "bravonovel",
+    "inkitt", "wattpad", "sofanovel", "novelstar", "star novel",
+    "novelmania", "royalnovel", "webfiction", "novelday", "forfun-100",
+    # Generic story apps
+    "dreamy stories", "my passion", "fiction lover", "storydreams",
+    "storylover", "storyjoy", "readstories", "storyheart",
+    "novelsweet", "dreamnovel", "fantasy lover", "romanceworld",
+    "storytale", "lovenovel",
+    # Alpha/werewolf themed
+    "alpha romance", "luna tales", "wolfmate stories", "alpha's mate",
+    "werewolf queen", "mate of the alpha", "the alpha's secret",
+    "dark alpha series", "eternal alpha", "fated mates", "twin alphas",
+    "alpha protector", "alpha's obsession", "alpha's claim",
+    "soulbound alpha", "queen's alpha", "the alpha prophecy",
+    "alpha's gambit", "alpha dynasty", "alpha's favor", "alpha's heir",
+    "alpha's bond", "alpha's curse", "alpha's revenge", "alpha's betrayal",
+    # Royal/billionaire themed
+    "forbidden romance", "billionaire romance", "mafia romance",
+    "dark romance realm", "royal romance tales", "broken royals",
+    "secret heir romance", "forbidden king", "hidden identity stories",
+    "royal blood romance", "enchanted kingdom", "cursed bloodlines",
+    "mystic romance", "twisted love", "witches & royals", "dark royals",
+    "lost heirs", "heir to the throne", "shattered promises",
+    "forbidden heirs", "hidden legacy", "shadow romance", "phantom love",
+    "royal seduction", "immortal royals", "vampire royals",
+    "royals & wolves", "fated royals", "phantom heir",
+    "forbidden royalty", "royal curse", "eclipse romance",
+    "dynasty romance", "empress of love", "dark prince romance",
+    "crown & alpha", "royal guardian",
+    # Vampire/paranormal themed
+    "vampire romance", "shifter romance", "paranormal royals",
+    "immortal love", "stepmother diaries", "revenge fantasy",
+    # Dating/video chat spam
+    "tp 1014 17",  # Video chat spam app
+)
+
+SPAM_KEYWORDS = (
+    "alpha", "luna", "werewolf", "daddy", "breed", "betrayal",
+    "revenge", "stepmother", "heartbreak", "prescription",
+    "fighter", "survivor", "stolen", "forbidden", "mate",
+    "pack", "omega", "shifter", "billionaire romance", "mafia",
+    "vampire", "alpha male", "stepdad", "stepson", "billionaire",
+    "ceo romance", "bodyguard", "rejected", "romance novel",
+    "story", "chapter", "book one", "episode", "novel app",
+    "wolf", "fantasy", "novel", "dreame", "goodnovel", "webnovel",
+    "royals", "heir", "crown", "throne", "prophecy", "curse",
+    "immortal", "fated", "soulbound", "dark romance", "paranormal",
+    "love stories",  # Romance story ads
+    "reader",  # Novel reader apps (LeReader, MoboReader, etc.)
+)
+
+SPAM_DOMAINS = (
+    "dreame.com", "goodnovel.com", "webnovel.com", "ficfun.com",
+    "moboreader.com", "bravonovel.com", "anystories.com",
+    "play.google.com", "apps.apple.com", "app.google.com",
+    "itunes.apple.com",  # Apple App Store (legacy URLs)
+    "walmart.com", "temu.com",  # Large marketplace filters
+    "app.adjust.com",  # Tracking/spam redirect URLs
+    "apple.com/us/app/",  # Apple App Store URL patterns
+    "/id15",  # Apple app store IDs (e.g., /id1564066347)
+    "/id16",  # Apple app store IDs
+    "mt=8",   # Apple App Store parameter
+)
+
+
+# Landing pages on Facebook itself (local services, fitness classes...)
+FACEBOOK_LANDING_MARKERS = ("facebook.com", "fb.me")
+
+
+# Tag -> term list ("adv" = advertiser names, "kw" = keywords, "dom" = domains/URL patterns,
+# "fb" = Facebook landing markers)
+SPAM_TERM_LISTS = {
+    "adv": SPAM_ADVERTISERS,
+    "kw": SPAM_KEYWORDS,
+    "dom": SPAM_DOMAINS,
+    "fb": FACEBOOK_LANDING_MARKERS,
+}
+
+# Joins fields for the combined scan; never part of a term, so no match spans two fields
+FIELD_DELIMITER = "\x01"
+
+
+def _build_automaton():
+    """Build one automaton over every term; payload is (term, tags it belongs to)."""
+    if ahocorasick is None:
+        return None
+
+    term_tags = {}
+    for tag, terms in SPAM_TERM_LISTS.items():
+        for term in terms:
+            term_tags.setdefault(term, set()).add(tag)  # e.g. "dreame" is in several lists
+
+    automaton = ahocorasick.Automaton()
+    for term, tags in term_tags.items():
+        automaton.add_word(term, (term, frozenset(tags)))
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_regex(terms: Iterable[str]) -> "re.Pattern":
+    """One alternation regex for a term list (longest terms first)."""
+    return re.compile("|".join(sorted(map(re.escape, terms), key=len, reverse=True)))
+
+
+# Built once per process at import
+_AUTOMATON = _build_automaton()
+_SPAM_RES = {tag: _build_regex(terms) for tag, terms in SPAM_TERM_LISTS.items()}
+_ANY_SPAM_RE = _build_regex([term for terms in SPAM_TERM_LISTS.values() for term in terms])
+
+
+def has_any_spam_term(text_lower: str) -> bool:
+    """True if `text_lower` contains a term from any spam list (one scan)."""
+    if _AUTOMATON is not None:
+        return next(_AUTOMATON.iter(text_lower), None) is not None
+    return _ANY_SPAM_RE.search(text_lower) is not None
+
+
+def find_spam_terms(text_lower: str, tag: str) -> List[str]:
+    """
+    Return every term from one spam list found in `text_lower`.
+
+    Args:
+        text_lower: Lowercased text to scan (caption, URL, advertiser name...)
+        tag: Which list to match - "adv", "kw" or "dom"
+    """
+    if not text_lower:
+        return []
+
+    if _AUTOMATON is not None:
+        found = []
+        for _, (term, tags) in _AUTOMATON.iter(text_lower):
+            if tag in tags and term not in found:
+                found.append(term)
+        return found
+
+    return list(dict.fromkeys(_SPAM_RES[tag].findall(text_lower)))
+
+
+def first_spam_term(text_lower: str, tag: str) -> Optional[str]:
+    """Return the first term from one spam list found in `text_lower` (or None)."""
+    if not text_lower:
+        return None
+
+    if _AUTOMATON is not None:
+        for _, (term, tags) in _AUTOMATON.iter(text_lower):
+            if tag in tags:
+                return term
+        return None
+
+    match = _SPAM_RES[tag].search(text_lower)
+    return match.group(0) if match else None
+
+
+def spam_reason(advertiser_lower: str, caption_lower: str, landing_url_lower: str) -> Optional[str]:
+    """
+    Return why an ad is spam/irrelevant (a log message), or None if it's clean.
+
+    Takes already-lowercased fields so callers that need them anyway
+    (e.g. landing_url_lower) compute each one only once.
+    Only uses fields available straight from the Ad Library, so it can run
+    before any enrichment work. The product-name check runs separately,
+    after product extraction (see product_spam_reason).
+    """
+    # ⚡ Fast path: one scan over all fields for all lists - most ads are clean.
+    # Only on a hit do the per-field checks below run, to pick the log message.
+    blob = FIELD_DELIMITER.join((advertiser_lower, caption_lower, landing_url_lower))
+    if not has_any_spam_term(blob):
+        return None
+
+    # FILTER 1: Skip ads with Facebook landing pages (e.g., fitness classes, local services)
+    if first_spam_term(landing_url_lower, "fb"):
+        return "Facebook landing page detected"
+
+    # FILTER 2: Skip romance/fantasy novel ads
+    # Check advertiser name - check both advertiser list AND keywords
+    if first_spam_term(advertiser_lower, "adv"):
+        return "Spam detected (advertiser name)"
+    # Also check if advertiser name contains spam keywords
+    advertiser_keyword = first_spam_term(advertiser_lower, "kw")
+    if advertiser_keyword:
+        return f"Spam keyword in advertiser name: {advertiser_keyword}"
+
+    # Check caption content - checks for ANY spam keyword or advertiser name
+    caption_spam_keywords = find_spam_terms(caption_lower, "kw")
+    if caption_spam_keywords:
+        return f"Spam detected in caption (found: {', '.join(caption_spam_keywords[:3])})"
+    caption_spam_advertiser = first_spam_term(caption_lower, "adv")
+    if caption_spam_advertiser:
+        return f"Spam detected in caption (advertiser name: {caption_spam_advertiser})"
+
+    # Check landing URL domain for spam domains
+    if first_spam_term(landing_url_lower, "dom"):
+        # More descriptive message based on domain type
+        if "apple.com" in landing_url_lower or "google.com" in landing_url_lower:
+            return "App Store link detected"
+        if "walmart.com" in landing_url_lower or "temu.com" in landing_url_lower:
+            return "Large marketplace detected (Walmart/Temu)"
+        return "Spam detected (domain: novel/story platform)"
+
+    # Check full landing URL for spam keywords (chapter, novel, love stories, etc.)
+    url_spam_keywords = find_spam_terms(landing_url_lower, "kw")
+    if url_spam_keywords:
+        return f"Spam detected in URL (found: {', '.join(url_spam_keywords[:3])})"
+
+    return None
+
+
+def product_spam_reason(product_lower: str) -> Optional[str]:
+    """Return why an extracted (lowercased) product name is spam, or None."""
+    keyword = first_spam_term(product_lower, "kw")
+    return f"Spam detected (product keyword: {keyword})" if keyword else None
+
+
+def is_spam(ad: dict) -> bool:
+    """Return True (and print why) if an ad should be skipped as spam/irrelevant."""
+    reason = spam_reason(
+        (ad.get("advertiser_name") or "").lower(),
+        (ad.get("caption") or "").lower(),
+        (ad.get("landing_url") or "").lower(),
+    )
+    if reason:
+        print(f"🚫 {reason} (advertiser: {ad.get('advertiser_name')}) - skipping")
+        return True
+    return False
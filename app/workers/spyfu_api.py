@@ -1,8 +1,13 @@
 import os
-import time
+import asyncio
 import requests
 import base64
-from typing import Dict, Any, List
+from operator import itemgetter
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, List, Optional
+from app.workers.api_cache import cache_get, cache_set
 
 # Load .env file if running locally
 try:
@@ -27,106 +32,198 @@ else:
 
 BASE_URL = "https://api.spyfu.com/apis/domain_stats_api/v2/getAllDomainStats"
 PPC_MULTIPLIER = 1.10
+RETRY_STATUSES = (429, 502, 503, 504)
+_LATEST_MONTH_KEY = itemgetter("searchYear", "searchMonth")
+MAX_RATE_LIMIT_RETRIES = 3  # async path: 429 retries (waits Retry-After between tries)
+
+# ⚡ Keep-alive session: one TLS handshake per pooled connection instead of per call.
+# Transient errors/429s are retried with backoff (urllib3 honors Retry-After).
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=["GET"], raise_on_status=False),
+))
 
 # =========================================================
 # 🧠 Core Function
 # =========================================================
+def _request_headers() -> Dict[str, str]:
+    headers = {
+        "accept": "application/json",
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    }
+
+    if API_ID and SECRET_KEY:
+        credentials = base64.b64encode(f"{API_ID}:{SECRET_KEY}".encode()).decode()
+        headers["Authorization"] = f"Basic {credentials}"
+    return headers
+
+def _parse_stats(domain: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a getAllDomainStats response body into our result dict."""
+    # Handle new response structure with "results" instead of "data"
+    if "results" in data and data["results"]:
+        # Get the latest month (max searchYear, then searchMonth)
+        try:
+            # ⚡ C-level key function - rows normally carry both fields
+            monthly_data = max(data["results"], key=_LATEST_MONTH_KEY)
+        except KeyError:
+            monthly_data = max(
+                data["results"],
+                key=lambda x: (x.get("searchYear", 0), x.get("searchMonth", 0))
+            )
+        seo_clicks = int(float(monthly_data.get("monthlyOrganicClicks", 0)))  # Handle float
+        click_value = monthly_data.get("monthlyOrganicValue", 0)
+        total_volume = monthly_data.get("totalOrganicResults", 0)
+
+        est_total = round(seo_clicks * PPC_MULTIPLIER)
+        return {
+            "domain": domain,
+            "seo_clicks": seo_clicks,
+            "est_total_visits": est_total,
+            "click_value": click_value,
+            "total_volume": total_volume,
+            "status": "ok",
+            "search_month": monthly_data.get("searchMonth"),
+            "search_year": monthly_data.get("searchYear"),
+        }
+    print(f"[Debug] No valid results: {data}")
+    return {
+        "domain": domain,
+        "seo_clicks": None,
+        "status": "failed",
+        "error": f"No results in response: {data.get('message', 'Unknown')}",
+    }
+
+def _http_failure(domain: str, status_code: int, text: str) -> Dict[str, Any]:
+    print(f"[SpyFu HTTP {status_code}] {domain}: Server error")
+    print(f"[Debug] Raw response: {text[:500]}...")
+    return {
+        "domain": domain,
+        "seo_clicks": None,
+        "status": "failed",
+        "error": f"HTTP {status_code}: {text[:200]}",
+    }
+
+def _retry_after_seconds(resp, default: float = 2.0) -> float:
+    """Seconds to wait from a Retry-After header (numeric form), else `default`."""
+    try:
+        return float(resp.headers.get("Retry-After", default))
+    except ValueError:
+        return default
+
+def _error_failure(domain: str, e: Exception) -> Dict[str, Any]:
+    print(f"[SpyFu Error] {domain}: {e}")
+    return {
+        "domain": domain,
+        "seo_clicks": None,
+        "status": "failed",
+        "error": str(e),
+    }
+
+def _cache_key(domain: str, country_code: str) -> str:
+    return f"spyfu:{domain}:{country_code}"
+
 def get_seo_clicks(domain: str, country_code: str = "US") -> Dict[str, Any]:
     """
     Fetch live SEO clicks using SpyFu v2 endpoint.
     Returns monthlyOrganicClicks and related SEO metrics from the latest month.
+    Parsed responses are cached for a day (see api_cache); errors are not.
     """
+    cached = cache_get(_cache_key(domain, country_code))
+    if cached is not None:
+        return cached
+
     params = {
         "domain": domain,
         "format": "json",
     }
-    headers = {
-        "accept": "application/json",
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-    }
-
-    if API_ID and SECRET_KEY:
-        credentials = base64.b64encode(f"{API_ID}:{SECRET_KEY}".encode()).decode()
-        headers["Authorization"] = f"Basic {credentials}"
-        print(f"[Debug] Added Basic Auth header")
 
     try:
-        resp = requests.get(BASE_URL, params=params, headers=headers, timeout=30)
+        resp = _SESSION.get(BASE_URL, params=params, headers=_request_headers(), timeout=30)
         print(f"[Debug] SpyFu API for {domain}: Status {resp.status_code}")
         print(f"[Debug] Raw response: {resp.text[:500]}...")
         resp.raise_for_status()
+        result = _parse_stats(domain, resp.json())
+        cache_set(_cache_key(domain, country_code), result)
+        return result
 
-        data = resp.json()
+    except requests.exceptions.HTTPError as e:
+        return _http_failure(domain, e.response.status_code, e.response.text)
+    except Exception as e:
+        return _error_failure(domain, e)
 
-        # Handle new response structure with "results" instead of "data"
-        if "results" in data and data["results"]:
-            # Get the latest month (max searchYear, then searchMonth)
-            monthly_data = max(
-                data["results"],
-                key=lambda x: (x.get("searchYear", 0), x.get("searchMonth", 0))
-            )
-            seo_clicks = int(float(monthly_data.get("monthlyOrganicClicks", 0)))  # Handle float
-            click_value = monthly_data.get("monthlyOrganicValue", 0)
-            total_volume = monthly_data.get("totalOrganicResults", 0)
-
-            est_total = round(seo_clicks * PPC_MULTIPLIER)
-            return {
-                "domain": domain,
-                "seo_clicks": seo_clicks,
-                "est_total_visits": est_total,
-                "click_value": click_value,
-                "total_volume": total_volume,
-                "status": "ok",
-                "search_month": monthly_data.get("searchMonth"),
-                "search_year": monthly_data.get("searchYear"),
-            }
-        else:
-            print(f"[Debug] No valid results: {data}")
-            return {
-                "domain": domain,
-                "seo_clicks": None,
-                "status": "failed",
-                "error": f"No results in response: {data.get('message', 'Unknown')}",
-            }
+async def get_seo_clicks_async(client, domain: str, country_code: str = "US") -> Dict[str, Any]:
+    """
+    Async version of get_seo_clicks() over a caller-owned httpx.AsyncClient,
+    so concurrent lookups share one pooled (HTTP/2 when available) connection.
+    """
+    cached = cache_get(_cache_key(domain, country_code))
+    if cached is not None:
+        return cached
 
-    except requests.exceptions.HTTPError as e:
-        resp = e.response
-        print(f"[SpyFu HTTP {resp.status_code}] {domain}: Server error")
-        print(f"[Debug] Raw response: {resp.text[:500]}...")
-        return {
-            "domain": domain,
-            "seo_clicks": None,
-            "status": "failed",
-            "error": f"HTTP {resp.status_code}: {resp.text[:200]}",
-        }
+    params = {
+        "domain": domain,
+        "format": "json",
+    }
+
+    try:
+        resp = await client.get(BASE_URL, params=params, headers=_request_headers(), timeout=30)
+        for _ in range(MAX_RATE_LIMIT_RETRIES):
+            if resp.status_code != 429:
+                break
+            # Rate limited - wait as long as the API asks, then retry
+            await asyncio.sleep(_retry_after_seconds(resp))
+            resp = await client.get(BASE_URL, params=params, headers=_request_headers(), timeout=30)
+        print(f"[Debug] SpyFu API for {domain}: Status {resp.status_code}")
+        if resp.status_code >= 400:
+            return _http_failure(domain, resp.status_code, resp.text)
+        result = _parse_stats(domain, resp.json())
+        cache_set(_cache_key(domain, country_code), result)
+        return result
     except Exception as e:
-        print(f"[SpyFu Error] {domain}: {e}")
-        return {
-            "domain": domain,
-            "seo_clicks": None,
-            "status": "failed",
-            "error": str(e),
-        }
+        return _error_failure(domain, e)
 
 # =========================================================
 # 🔁 Batch Helper
 # =========================================================
+async def batch_fetch_seo_clicks_async(
+    domains: List[str], country_code: str = "US", max_retries: int = 2, concurrency: int = 8,
+    client: Optional[httpx.AsyncClient] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fetch SpyFu stats for many domains concurrently (at most `concurrency` in flight)
+    over one pooled client. Results come back in the same order as `domains`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(i: int, domain: str, http: httpx.AsyncClient) -> Dict[str, Any]:
+        async with semaphore:
+            print(f"[{i}/{len(domains)}] Fetching SpyFu SEO stats for {domain}...")
+            result = await get_seo_clicks_async(http, domain, country_code)
+            retries = 0
+            while result["status"] == "failed" and retries < max_retries:
+                print(f"  Retrying {domain} (attempt {retries + 1})...")
+                await asyncio.sleep(2.0)
+                result = await get_seo_clicks_async(http, domain, country_code)
+                retries += 1
+            return result
+
+    if client is not None:
+        return list(await asyncio.gather(*(fetch(i, d, client) for i, d in enumerate(domains, 1))))
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency)) as http:
+        return list(await asyncio.gather(*(fetch(i, d, http) for i, d in enumerate(domains, 1))))
+
 def batch_fetch_seo_clicks(
     domains: List[str], country_code: str = "US", delay: float = 1.0, max_retries: int = 2
 ) -> List[Dict[str, Any]]:
-    results = []
-    for i, domain in enumerate(domains, 1):
-        print(f"[{i}/{len(domains)}] Fetching SpyFu SEO stats for {domain}...")
-        result = get_seo_clicks(domain, country_code)
-        retries = 0
-        while result["status"] == "failed" and retries < max_retries:
-            print(f"  Retrying {domain} (attempt {retries + 1})...")
-            time.sleep(2.0)
-            result = get_seo_clicks(domain, country_code)
-            retries += 1
-        results.append(result)
-        time.sleep(delay)
-    return results
+    """
+    Synchronous wrapper for batch_fetch_seo_clicks_async.
+    `delay` is no longer used - requests run concurrently and 429 responses are
+    retried after the API's Retry-After instead of pacing every call.
+    """
+    return asyncio.run(batch_fetch_seo_clicks_async(domains, country_code, max_retries=max_retries))
 
 # =========================================================
 # 🧪 Local test runner
@@ -2,6 +2,17 @@
 # 🧮 Traffic Calibration Based on Tier Ratios
 # =============================================
 
+# Default multipliers (based on your actual data analysis)
+TIER_MULTIPLIERS = {
+    "high": 66,   # 100M+ sites (Nike, Walmart, Apple, Shein)
+    "mid": 47,    # 1–20M visits (Gymshark, Alo, YoungLA, etc.)
+    "low": 85     # 50K–1M visits (Shecurve, small DTC brands)
+}
+
+# SpyFu SEO clicks thresholds for auto-detected tiers
+HIGH_TIER_MIN_CLICKS = 1_500_000  # 1.5M+ SEO clicks → high tier
+MID_TIER_MIN_CLICKS = 20_000      # 20K+ SEO clicks → mid tier
+
 def estimate_monthly_visits(spyfu_clicks, tier=None):
     """
     Converts SpyFu's estimated SEO clicks into estimated total monthly visits.
@@ -16,25 +27,13 @@ def estimate_monthly_visits(spyfu_clicks, tier=None):
         Estimated total monthly visits (float)
     """
 
-    # Default multipliers (based on your actual data analysis)
-    TIER_MULTIPLIERS = {
-        "high": 66,   # 100M+ sites (Nike, Walmart, Apple, Shein)
-        "mid": 47,    # 1–20M visits (Gymshark, Alo, YoungLA, etc.)
-        "low": 85     # 50K–1M visits (Shecurve, small DTC brands)
-    }
-
     # Handle nulls or missing data
     if spyfu_clicks is None or spyfu_clicks == 0:
         return 0
 
     # Auto-detect tier if not specified based on SpyFu clicks volume
     if tier is None:
-        if spyfu_clicks >= 1_500_000:  # 1.5M+ SEO clicks → high tier
-            tier = "high"
-        elif spyfu_clicks >= 20_000:   # 20K+ SEO clicks → mid tier
-            tier = "mid"
-        else:                           # <20K SEO clicks → low tier
-            tier = "low"
+        tier = get_tier_from_visits(spyfu_clicks)
 
     # Choose tier multiplier
     multiplier = TIER_MULTIPLIERS.get(tier, 47)  # default to mid if unspecified
@@ -50,9 +49,34 @@ def get_tier_from_visits(spyfu_clicks):
     if spyfu_clicks is None or spyfu_clicks == 0:
         return "unknown"
     
-    if spyfu_clicks >= 1_500_000:
+    if spyfu_clicks >= HIGH_TIER_MIN_CLICKS:
         return "high"
-    elif spyfu_clicks >= 20_000:
+    elif spyfu_clicks >= MID_TIER_MIN_CLICKS:
         return "mid"
     else:
         return "low"
+
+
+def estimate_monthly_visits_bulk(spyfu_clicks):
+    """
+    Vectorized estimate_monthly_visits (auto-detected tiers) for many domains at once.
+    
+    Args:
+        spyfu_clicks: Sequence/array of SpyFu SEO clicks (None counts as 0)
+    
+    Returns:
+        numpy int64 array of estimated monthly visits, same order as the input
+    """
+    import numpy as np  # Only needed for bulk scoring
+
+    clicks = np.asarray(spyfu_clicks)
+    if clicks.dtype == object:
+        clicks = np.where(clicks == None, 0, clicks)  # noqa: E711 - elementwise None check
+    clicks = clicks.astype(np.int64, copy=False)
+
+    multipliers = np.select(
+        [clicks >= HIGH_TIER_MIN_CLICKS, clicks >= MID_TIER_MIN_CLICKS],
+        [TIER_MULTIPLIERS["high"], TIER_MULTIPLIERS["mid"]],
+        default=TIER_MULTIPLIERS["low"],
+    )
+    return clicks * multipliers
@@ -4,10 +4,76 @@ Extracts product names directly from URL patterns without loading the page.
 """
 
 import re
+from functools import lru_cache
 from urllib.parse import urlparse
 from typing import Optional
 
+# Patterns compiled once at import (these run for every landing URL)
 
+# Common e-commerce URL patterns - group 1 is the product slug
+PRODUCT_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r'/products?/([^/?#]+)',  # /products/product-name or /product/product-name
+        r'/p/([^/?#]+)',          # /p/product-name
+        r'/items?/([^/?#]+)',     # /item/product-name or /items/product-name
+        r'/shop/([^/?#]+)',       # /shop/product-name
+        r'/buy/([^/?#]+)',        # /buy/product-name
+        r'/([^/?#]+)/dp/',        # Amazon: /Product-Name/dp/... (extract before /dp/)
+        r'/([^/?#]+)/gp/product', # Amazon alternate: /Product-Name/gp/product/...
+    )
+]
+
+# Common tracking parameter patterns (rejected as product names), fused into one match
+TRACKING_RE = re.compile(
+    r'^(?:'
+    r'[a-z0-9]{16,}'  # Long hex/random strings
+    r'|[A-Z0-9_]+'    # All caps with underscores (SESSION_ID style)
+    r'|v\d+'          # Version numbers like "v1", "v2"
+    r'|\d+'           # Pure numbers
+    r')$'
+)
+
+# Slug cleanup uses plain string methods (no regex) for the common case
+SLUG_SEPARATORS = str.maketrans('-_', '  ')
+PAGE_EXTENSIONS = ('.html', '.htm', '.php', '.aspx', '.asp')
+ASCII_SYMBOLS = ''.join(chr(c) for c in range(128) if not chr(c).isalnum())
+EDGE_SYMBOLS_RE = re.compile(r'^[^a-zA-Z0-9]+|[^a-zA-Z0-9]+$')  # Non-ASCII edges only
+
+# Subdomains that name the storefront, not the brand
+DOMAIN_PREFIXES = ('www.', 'shop.', 'store.', 'stores.', 'm.', 'latest.')
+
+# Characters urlparse treats specially beyond scheme/host/path/query/fragment
+URL_SLOW_PATH_CHARS = (';', '[', ']', '\t', '\n', '\r')
+
+# ⚡ Union of PRODUCT_PATTERNS: one scan tells whether any of them can match.
+# Most landing paths match none, so the per-pattern searches below are skipped.
+# (Used only as a gate - the first match of the union can come from a
+# lower-priority pattern, so PRODUCT_PATTERNS still pick the slug.)
+ANY_PRODUCT_PATTERN_RE = re.compile(
+    r'/(?:products?|p|items?|shop|buy)/[^/?#]|/[^/?#]+/(?:dp/|gp/product)', re.IGNORECASE
+)
+
+
+def _split_host_path(url: str) -> tuple[str, str]:
+    """
+    (netloc, path) of a URL, same as urlparse's.
+    
+    ⚡ Plain http(s) URLs are sliced directly - no ParseResult built. Anything
+    else (other schemes, ;params, IPv6 hosts, control chars) goes through urlparse.
+    """
+    if url.startswith(('https://', 'http://')) and not any(c in url for c in URL_SLOW_PATH_CHARS):
+        rest = url[url.index('//') + 2:]
+        rest, _, _ = rest.partition('#')
+        rest, _, _ = rest.partition('?')
+        slash = rest.find('/')
+        if slash < 0:
+            return rest, ''
+        return rest[:slash], rest[slash:]
+    parsed = urlparse(url)
+    return parsed.netloc, parsed.path
+
+
+@lru_cache(maxsize=8192)  # ⚡ Same landing URLs recur across ads and runs
 def extract_product_name_from_url_path(url: str) -> Optional[str]:
     """
     Extract product name from URL path patterns.
@@ -29,23 +95,11 @@ def extract_product_name_from_url_path(url: str) -> Optional[str]:
         return None
     
     try:
-        parsed = urlparse(url)
-        domain = parsed.netloc
-        path = parsed.path
+        domain, path = _split_host_path(url)
         
         # Strategy 1: Extract from common e-commerce URL patterns
-        product_patterns = [
-            r'/products?/([^/?#]+)',  # /products/product-name or /product/product-name
-            r'/p/([^/?#]+)',          # /p/product-name
-            r'/items?/([^/?#]+)',     # /item/product-name or /items/product-name
-            r'/shop/([^/?#]+)',       # /shop/product-name
-            r'/buy/([^/?#]+)',        # /buy/product-name
-            r'/([^/?#]+)/dp/',        # Amazon: /Product-Name/dp/... (extract before /dp/)
-            r'/([^/?#]+)/gp/product', # Amazon alternate: /Product-Name/gp/product/...
-        ]
-        
-        for pattern in product_patterns:
-            match = re.search(pattern, path, re.IGNORECASE)
+        for pattern in (PRODUCT_PATTERNS if ANY_PRODUCT_PATTERN_RE.search(path) else ()):
+            match = pattern.search(path)
             if match:
                 product_slug = match.group(1)
                 # Clean and format the product name
@@ -64,34 +118,41 @@ def extract_product_name_from_url_path(url: str) -> Optional[str]:
                     return product_name
         
         # Strategy 3: Extract brand/store name from domain (ALWAYS succeeds)
-        if domain:
-            # Remove common prefixes and TLDs
-            domain_clean = domain.replace('www.', '').replace('shop.', '').replace('store.', '')
-            domain_clean = domain_clean.replace('stores.', '').replace('m.', '').replace('latest.', '')
-            
-            # Get the main domain name (before first dot)
-            domain_parts = domain_clean.split('.')
-            if domain_parts and domain_parts[0]:
-                brand_name = domain_parts[0]
-                # Clean up common patterns
-                brand_name = brand_name.replace('-', ' ').replace('_', ' ')
-                return brand_name.strip().title()
-        
-        # Absolute fallback: return domain without TLD
-        if domain:
-            # Remove TLD (.com, .net, .org, etc.)
-            domain_without_tld = domain.split('.')[0] if '.' in domain else domain
-            # Clean up
-            domain_without_tld = domain_without_tld.replace('-', ' ').replace('_', ' ')
-            return domain_without_tld.strip().title()
-        
-        return "Product"
+        return _brand_name_from_domain(domain)
         
     except Exception as e:
         print(f"⚠️ URL extraction error: {e}")
         return None
 
 
+@lru_cache(maxsize=4096)
+def _brand_name_from_domain(domain: str) -> str:
+    """Brand/store name from a domain - cached, product URLs share few domains."""
+    if domain:
+        # Remove common subdomain prefixes (only at the start - "gym.com" keeps its "m.")
+        domain_clean = domain
+        while domain_clean.startswith(DOMAIN_PREFIXES):  # "www.shop.brand.com" → "brand.com"
+            domain_clean = domain_clean.partition('.')[2]
+        
+        # Get the main domain name (before first dot)
+        domain_parts = domain_clean.split('.')
+        if domain_parts and domain_parts[0]:
+            brand_name = domain_parts[0]
+            # Clean up common patterns
+            brand_name = brand_name.replace('-', ' ').replace('_', ' ')
+            return brand_name.strip().title()
+    
+    # Absolute fallback: return domain without TLD
+    if domain:
+        # Remove TLD (.com, .net, .org, etc.)
+        domain_without_tld = domain.split('.')[0] if '.' in domain else domain
+        # Clean up
+        domain_without_tld = domain_without_tld.replace('-', ' ').replace('_', ' ')
+        return domain_without_tld.strip().title()
+    
+    return "Product"
+
+
 def _is_valid_product_name(name: str) -> bool:
     """
     Validate if extracted name looks like a real product name, not garbage.
@@ -127,17 +188,13 @@ def _is_valid_product_name(name: str) -> bool:
     if not any(c.isalpha() for c in name):
         return False
     
-    # Reject common tracking parameter patterns
-    tracking_patterns = [
-        r'^[a-z0-9]{16,}$',  # Long hex/random strings
-        r'^[A-Z0-9_]+$',     # All caps with underscores (SESSION_ID style)
-        r'^v\d+$',           # Version numbers like "v1", "v2"
-        r'^\d+$',            # Pure numbers
-    ]
+    # ⚡ Tracking codes never contain spaces - multi-word names are done here
+    if ' ' in name:
+        return True
     
-    for pattern in tracking_patterns:
-        if re.match(pattern, name):
-            return False
+    # Reject common tracking parameter patterns
+    if TRACKING_RE.match(name):
+        return False
     
     return True
 
@@ -154,19 +211,25 @@ def _clean_url_slug(slug: str) -> str:
         return ""
     
     # Replace hyphens and underscores with spaces
-    cleaned = slug.replace('-', ' ').replace('_', ' ')
+    cleaned = slug.translate(SLUG_SEPARATORS)
     
     # Remove common URL artifacts
-    cleaned = re.sub(r'\.(html?|php|aspx?)$', '', cleaned, flags=re.IGNORECASE)
+    lowered = cleaned.lower()
+    for ext in PAGE_EXTENSIONS:
+        if lowered.endswith(ext):
+            cleaned = cleaned[:-len(ext)]
+            break
     
     # Remove query parameters if any slipped through
     cleaned = cleaned.split('?')[0].split('#')[0]
     
     # Remove extra whitespace
-    cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+    cleaned = ' '.join(cleaned.split())
     
     # Remove leading/trailing special characters
-    cleaned = re.sub(r'^[^a-zA-Z0-9]+|[^a-zA-Z0-9]+$', '', cleaned)
+    cleaned = cleaned.strip(ASCII_SYMBOLS)
+    if cleaned and not (cleaned[0].isascii() and cleaned[-1].isascii()):
+        cleaned = EDGE_SYMBOLS_RE.sub('', cleaned)  # Non-ASCII letters/symbols at an edge
     
     # Lowercase everything
     cleaned = cleaned.lower()
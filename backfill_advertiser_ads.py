@@ -25,7 +25,6 @@ import re
 from pathlib import Path
 from typing import List, Dict, Any, Set
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
 # Add project root to path
@@ -48,7 +47,7 @@ from app.scoring.ad_scoring import score_ad
 
 # ========== CONFIGURATION ==========
 MAX_ADVERTISERS = None  # Set to a number (e.g., 50) to limit for testing, None for all
-NUM_PARALLEL_BROWSERS = 50  # Number of browsers to run in parallel (50 optimized for 40GB RAM i7 - backfill is more intensive than distributed scraper)
+NUM_PARALLEL_BROWSERS = 50  # Advertisers scraped in parallel, each in its own context of one shared browser (50 optimized for 40GB RAM i7 - backfill is more intensive than distributed scraper)
 MAX_ADS_PER_ADVERTISER = 200  # Maximum ads to scrape per advertiser (prevents spending too much time on large advertisers)
 VERBOSE = True  # Set to False to reduce output
 
@@ -60,12 +59,98 @@ AD_IMAGE_WAIT = 15000  # 15 seconds to wait for ad images (was 10s)
 SCROLL_WAIT = 4000  # 4 seconds between scrolls (was 3s)
 # ===================================
 
+# Video bytes, fonts and non-ad images (icons, UI sprites) aren't needed. Ad images on
+# scontent CDNs still load: readiness waits on them and extraction reads their width.
+# Stylesheets stay - without CSS, innerText and visibility checks change.
+BLOCKED_RESOURCE_TYPES = {"media", "font"}
+AD_IMAGE_HOST_MARKER = "scontent"
 
-async def scrape_advertiser_with_retries(page_identifier: str, info: Dict[str, Any], browser_id: int) -> tuple[int, int, str]:
+
+async def block_heavy_resources(route):
+    """Route handler that aborts heavy requests the ad extraction doesn't use."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or (
+        request.resource_type == "image" and AD_IMAGE_HOST_MARKER not in request.url
+    ):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+# "associated_page_id":"12345678" in the advertiser page's HTML (quoted, then looser form)
+PAGE_ID_RE = re.compile(r'"associated_page_id"\s*:\s*"(\d+)"')
+PAGE_ID_LOOSE_RE = re.compile(r'associated_page_id["\s:]+(\d+)')
+
+# ⚡ Same search run in the browser, so the full HTML never crosses the CDP connection
+FIND_PAGE_ID_JS = r"""
+() => {
+    const html = document.documentElement.outerHTML;
+    const m = html.match(/"associated_page_id"\s*:\s*"(\d+)"/) || html.match(/associated_page_id["\s:]+(\d+)/);
+    return m ? m[1] : null;
+}
+"""
+
+# Block/empty-state check done in the page, so the body text never crosses CDP.
+# Returns "login", "unavailable", "no_results" or null.
+PAGE_STATUS_JS = """
+() => {
+    const text = document.body?.textContent || '';
+    if (text.includes('Log in to Facebook')) return 'login';
+    if (text.includes("Sorry, this content isn't available")) return 'unavailable';
+    if (text.includes('No results found')) return 'no_results';
+    return null;
+}
+"""
+
+
+def save_advertiser_ads(advertiser_ads: List[Dict[str, Any]], real_page_id: str) -> tuple[int, int]:
+    """Skip already-stored creatives, score and save the rest. Returns (new, duplicates)."""
+    new_count = 0
+    duplicate_count = 0
+    
+    for ad in advertiser_ads:
+        ad["creative_hash"] = creative_fingerprint(ad)
+    
+    # ⚡ One duplicate lookup and one save for the whole advertiser instead of per ad
+    hashes = {ad["creative_hash"] for ad in advertiser_ads if ad["creative_hash"]}
+    known_hashes = set()
+    if hashes:
+        with Session(engine) as session:
+            known_hashes = set(session.exec(
+                select(AdCreative.creative_hash).where(
+                    AdCreative.creative_hash.in_(hashes)  # type: ignore
+                )
+            ).all())
+    
+    to_save = []
+    for ad in advertiser_ads:
+        if ad["creative_hash"]:
+            if ad["creative_hash"] in known_hashes:
+                duplicate_count += 1
+                continue
+            known_hashes.add(ad["creative_hash"])  # Repeats within this advertiser too
+        
+        # Only new ads get date parsing and scoring
+        if ad.get("started_running_on"):
+            start_date, days_running = parse_ad_start_date(ad["started_running_on"])
+            ad["started_running_on"] = start_date
+            ad["days_running"] = days_running
+        ad["page_id"] = real_page_id
+        to_save.append(score_ad(ad))
+    
+    if to_save:
+        save_ads(to_save)
+        new_count += len(to_save)
+    
+    return new_count, duplicate_count
+
+
+async def scrape_advertiser_with_retries(browser, page_identifier: str, info: Dict[str, Any], browser_id: int) -> tuple[int, int, str]:
     """
     Scrape all ads from a single advertiser with enhanced timeouts and debugging.
     
     Args:
+        browser: Shared browser - each advertiser gets its own context
         page_identifier: Either numeric page_id or username/slug from advertiser URL
         info: Dict with advertiser name, URL, search_query, country
         browser_id: Unique browser ID for logging
@@ -76,168 +161,115 @@ async def scrape_advertiser_with_retries(page_identifier: str, info: Dict[str, A
     advertiser_name = info["name"]
     advertiser_url = info["url"]
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            executable_path=CHROMIUM_BIN if CHROMIUM_BIN else None
-        )
-        context = await browser.new_context()
-        page = await context.new_page()
+    context = await browser.new_context()
+    await context.route("**/*", block_heavy_resources)
+    page = await context.new_page()
+    
+    new_count = 0
+    duplicate_count = 0
+    
+    try:
+        print(f"[Browser {browser_id}] 🏢 {advertiser_name}")
+        
+        # Step 1: Go to advertiser's Facebook page to get real page_id
+        print(f"[Browser {browser_id}]   📍 Visiting: {advertiser_url}")
+        await page.goto(advertiser_url, wait_until='domcontentloaded', timeout=PAGE_LOAD_TIMEOUT)
+        await page.wait_for_timeout(INITIAL_WAIT)
         
-        new_count = 0
-        duplicate_count = 0
+        # Accept cookies if present
+        await accept_cookies_if_present(page)
+        await page.wait_for_timeout(COOKIE_WAIT)
         
+        # Step 2: Extract REAL numeric page_id from Facebook page HTML
         try:
-            print(f"[Browser {browser_id}] 🏢 {advertiser_name}")
-            
-            # Step 1: Go to advertiser's Facebook page to get real page_id
-            print(f"[Browser {browser_id}]   📍 Visiting: {advertiser_url}")
-            await page.goto(advertiser_url, wait_until='domcontentloaded', timeout=PAGE_LOAD_TIMEOUT)
-            await page.wait_for_timeout(INITIAL_WAIT)
-            
-            # Accept cookies if present
-            await accept_cookies_if_present(page)
-            await page.wait_for_timeout(COOKIE_WAIT)
-            
-            # Step 2: Extract REAL numeric page_id from Facebook page HTML
+            real_page_id = await page.evaluate(FIND_PAGE_ID_JS)
+        except Exception:
+            # Evaluate failed (e.g. page navigated mid-call) - search the HTML here instead
             page_content = await page.content()
+            page_id_match = PAGE_ID_RE.search(page_content) or PAGE_ID_LOOSE_RE.search(page_content)
+            real_page_id = page_id_match.group(1) if page_id_match else None
+        
+        if not real_page_id:
+            print(f"[Browser {browser_id}]   ❌ Could not extract associated_page_id from {advertiser_url}")
+            return 0, 0, advertiser_name
+        
+        print(f"[Browser {browser_id}]   ✅ Extracted page_id: {real_page_id}")
+        
+        # Step 3: Navigate to Ad Library with REAL numeric page_id
+        ad_library_url = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=US&search_type=page&view_all_page_id={real_page_id}"
+        
+        print(f"[Browser {browser_id}]   🔗 Opening Ad Library...")
+        await page.goto(ad_library_url, wait_until='domcontentloaded', timeout=PAGE_LOAD_TIMEOUT)
+        await page.wait_for_timeout(INITIAL_WAIT)
+        
+        # Check for blocking/errors
+        page_status = await page.evaluate(PAGE_STATUS_JS)
+        page_url = page.url
+        
+        if page_status == "login" or "login" in page_url.lower():
+            print(f"[Browser {browser_id}]   🚫 BLOCKED: Facebook requires login")
+            raise Exception("Facebook login required")
+        elif page_status == "unavailable":
+            print(f"[Browser {browser_id}]   🚫 BLOCKED: Content not available")
+            raise Exception("Content not available")
+        elif page_status == "no_results":
+            print(f"[Browser {browser_id}]   ℹ️ Advertiser has no active ads")
+            return 0, 0, advertiser_name
+        
+        # Wait for ads to appear
+        try:
+            await page.wait_for_selector('img[src*="scontent"]', timeout=AD_IMAGE_WAIT)
+            print(f"[Browser {browser_id}]   ✅ Ads loaded!")
+        except:
+            print(f"[Browser {browser_id}]   ⚠️ No ad images, attempting extraction anyway...")
+        
+        advertiser_ads = []
+        scroll_attempts = 0
+        max_scrolls = 10
+        
+        while scroll_attempts < max_scrolls and len(advertiser_ads) < MAX_ADS_PER_ADVERTISER:
+            # Extract ads from current view
+            batch = await extract_ads_from_page(page)
             
-            # Search for "associated_page_id":"12345678" pattern
-            page_id_match = re.search(r'"associated_page_id"\s*:\s*"(\d+)"', page_content)
-            
-            if not page_id_match:
-                # Try alternate pattern without quotes
-                page_id_match = re.search(r'associated_page_id["\s:]+(\d+)', page_content)
-            
-            if not page_id_match:
-                print(f"[Browser {browser_id}]   ❌ Could not extract associated_page_id from {advertiser_url}")
-                return 0, 0, advertiser_name
-            
-            real_page_id = page_id_match.group(1)
-            print(f"[Browser {browser_id}]   ✅ Extracted page_id: {real_page_id}")
-            
-            # Step 3: Navigate to Ad Library with REAL numeric page_id
-            ad_library_url = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=US&search_type=page&view_all_page_id={real_page_id}"
-            
-            print(f"[Browser {browser_id}]   🔗 Opening Ad Library...")
-            await page.goto(ad_library_url, wait_until='domcontentloaded', timeout=PAGE_LOAD_TIMEOUT)
-            await page.wait_for_timeout(INITIAL_WAIT)
-            
-            # Check for blocking/errors
-            page_text = await page.text_content('body') or ""
-            page_url = page.url
-            
-            if "Log in to Facebook" in page_text or "login" in page_url.lower():
-                print(f"[Browser {browser_id}]   🚫 BLOCKED: Facebook requires login")
-                raise Exception("Facebook login required")
-            elif "Sorry, this content isn't available" in page_text:
-                print(f"[Browser {browser_id}]   🚫 BLOCKED: Content not available")
-                raise Exception("Content not available")
-            elif "No results found" in page_text:
-                print(f"[Browser {browser_id}]   ℹ️ Advertiser has no active ads")
-                return 0, 0, advertiser_name
+            if not batch:
+                if scroll_attempts == 0:
+                    if VERBOSE:
+                        print(f"[Browser {browser_id}]   ⏭️ No ads found on first try")
+                break
             
-            # Wait for ads to appear
-            try:
-                await page.wait_for_selector('img[src*="scontent"]', timeout=AD_IMAGE_WAIT)
-                print(f"[Browser {browser_id}]   ✅ Ads loaded!")
-            except:
-                print(f"[Browser {browser_id}]   ⚠️ No ad images, attempting extraction anyway...")
+            # Add metadata
+            for ad in batch:
+                ad["search_query"] = info.get("search_query", "backfill")
+                ad["country"] = info.get("country", "US")
+                ad["from_advertiser_scrape"] = True
             
-            advertiser_ads = []
-            scroll_attempts = 0
-            max_scrolls = 10
+            advertiser_ads.extend(batch)
+            print(f"[Browser {browser_id}]   📥 Found {len(batch)} ads (total: {len(advertiser_ads)})")
             
-            while scroll_attempts < max_scrolls and len(advertiser_ads) < MAX_ADS_PER_ADVERTISER:
-                # Extract ads from current view
-                batch = await extract_ads_from_page(page)
-                
-                if not batch:
-                    if scroll_attempts == 0:
-                        if VERBOSE:
-                            print(f"[Browser {browser_id}]   ⏭️ No ads found on first try")
-                    break
-                
-                # Add metadata
-                for ad in batch:
-                    ad["search_query"] = info.get("search_query", "backfill")
-                    ad["country"] = info.get("country", "US")
-                    ad["from_advertiser_scrape"] = True
-                
-                advertiser_ads.extend(batch)
-                print(f"[Browser {browser_id}]   📥 Found {len(batch)} ads (total: {len(advertiser_ads)})")
-                
-                # Check if we hit the limit
-                if len(advertiser_ads) >= MAX_ADS_PER_ADVERTISER:
-                    print(f"[Browser {browser_id}]   ⚠️ Reached {MAX_ADS_PER_ADVERTISER} ad limit for {advertiser_name}")
-                    advertiser_ads = advertiser_ads[:MAX_ADS_PER_ADVERTISER]  # Trim to exactly MAX_ADS_PER_ADVERTISER
-                    break
-                
-                # Scroll for more with increased wait time
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await page.wait_for_timeout(SCROLL_WAIT)
-                scroll_attempts += 1
+            # Check if we hit the limit
+            if len(advertiser_ads) >= MAX_ADS_PER_ADVERTISER:
+                print(f"[Browser {browser_id}]   ⚠️ Reached {MAX_ADS_PER_ADVERTISER} ad limit for {advertiser_name}")
+                advertiser_ads = advertiser_ads[:MAX_ADS_PER_ADVERTISER]  # Trim to exactly MAX_ADS_PER_ADVERTISER
+                break
             
-            # Process and save ads
-            for ad in advertiser_ads:
-                # Add date parsing and hash
-                if ad.get("started_running_on"):
-                    start_date, days_running = parse_ad_start_date(ad["started_running_on"])
-                    ad["started_running_on"] = start_date
-                    ad["days_running"] = days_running
-                
-                ad["creative_hash"] = creative_fingerprint(ad)
-                ad["page_id"] = real_page_id
-                
-                # Score the ad
-                ad_scored = score_ad(ad)
-                
-                # Check if it's a duplicate
-                if ad_scored.get("creative_hash"):
-                    with Session(engine) as session:
-                        existing = session.exec(
-                            select(AdCreative).where(
-                                AdCreative.creative_hash == ad_scored["creative_hash"]
-                            )
-                        ).first()
-                        
-                        if existing:
-                            duplicate_count += 1
-                            continue
-                
-                # Save new ad
-                save_ads([ad_scored])
-                new_count += 1
-            
-            if new_count > 0 or duplicate_count > 0:
-                print(f"[Browser {browser_id}]   ✅ {advertiser_name}: {new_count} new, {duplicate_count} duplicates")
-            
-        except Exception as e:
-            print(f"[Browser {browser_id}]   ❌ Error: {str(e)[:100]}")
+            # Scroll for more with increased wait time
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            await page.wait_for_timeout(SCROLL_WAIT)
+            scroll_attempts += 1
         
-        finally:
-            await browser.close()
+        # Dedupe, score and save (DB work in a thread so other advertisers keep scraping)
+        new_count, duplicate_count = await asyncio.to_thread(save_advertiser_ads, advertiser_ads, real_page_id)
         
-        return new_count, duplicate_count, advertiser_name
-
-
-def process_advertiser_batch(advertisers_batch: List[tuple], browser_id: int) -> Dict[str, int]:
-    """Process a batch of advertisers synchronously in one thread."""
-    total_new = 0
-    total_duplicates = 0
+        if new_count > 0 or duplicate_count > 0:
+            print(f"[Browser {browser_id}]   ✅ {advertiser_name}: {new_count} new, {duplicate_count} duplicates")
+        
+    except Exception as e:
+        print(f"[Browser {browser_id}]   ❌ Error: {str(e)[:100]}")
     
-    for page_id, info in advertisers_batch:
-        try:
-            new_count, dup_count, name = asyncio.run(
-                scrape_advertiser_with_retries(page_id, info, browser_id)
-            )
-            total_new += new_count
-            total_duplicates += dup_count
-        except Exception as e:
-            print(f"[Browser {browser_id}] ❌ Fatal error: {e}")
-            continue
+    finally:
+        await context.close()
     
-    return {"new": total_new, "duplicates": total_duplicates}
+    return new_count, duplicate_count, advertiser_name
 
 
 async def main():
@@ -261,30 +293,34 @@ async def main():
     
     with Session(engine) as session:
         # Query all ads with advertiser URLs in raw JSON
-        stmt = select(AdCreative)
-        all_ads = session.exec(stmt).all()
-        
-        print(f"   Found {len(all_ads)} total ads in database")
+        # ⚡ Only the columns used below, streamed in chunks instead of loading every full row
+        stmt = select(
+            AdCreative.raw, AdCreative.account_name, AdCreative.search_query, AdCreative.country
+        ).execution_options(yield_per=1000)
         
         # Extract unique (page_id, advertiser_name, advertiser_url) tuples
         advertiser_map = {}  # page_id -> (name, url, search_query, country)
+        seen_urls = set()  # Advertiser URLs already resolved to a page_id
+        total_ads = 0
         
-        for ad in all_ads:
-            if ad.raw and isinstance(ad.raw, dict):
-                advertiser_url = ad.raw.get("advertiser_url")
-                advertiser_name = ad.account_name or ad.raw.get("advertiser_name", "Unknown")
+        for raw, account_name, search_query, country in session.exec(stmt):
+            total_ads += 1
+            if raw and isinstance(raw, dict):
+                advertiser_url = raw.get("advertiser_url")
                 
-                if advertiser_url:
+                if advertiser_url and advertiser_url not in seen_urls:
+                    seen_urls.add(advertiser_url)
                     page_id = extract_page_id_from_url(advertiser_url)
                     
                     if page_id and page_id not in advertiser_map:
                         advertiser_map[page_id] = {
-                            "name": advertiser_name,
+                            "name": account_name or raw.get("advertiser_name", "Unknown"),
                             "url": advertiser_url,
-                            "search_query": ad.search_query or "backfill",
-                            "country": ad.country or "US"
+                            "search_query": search_query or "backfill",
+                            "country": country or "US"
                         }
         
+        print(f"   Found {total_ads} total ads in database")
         print(f"   ✅ Found {len(advertiser_map)} unique advertisers")
         print()
     
@@ -307,30 +343,35 @@ async def main():
     
     start_time = time.time()
     
-    # Split advertisers into batches for parallel processing
-    batch_size = max(1, len(advertisers_to_scrape) // NUM_PARALLEL_BROWSERS)
-    batches = [
-        advertisers_to_scrape[i:i + batch_size]
-        for i in range(0, len(advertisers_to_scrape), batch_size)
-    ]
+    # ⚡ One browser for the whole run; advertisers share it through separate contexts.
+    # The slot queue caps concurrency and gives each running scrape a stable log id.
+    slots: asyncio.Queue = asyncio.Queue()
+    for slot in range(1, NUM_PARALLEL_BROWSERS + 1):
+        slots.put_nowait(slot)
     
-    total_new_ads = 0
-    total_duplicate_ads = 0
-    
-    # Process batches in parallel using ThreadPoolExecutor
-    with ThreadPoolExecutor(max_workers=NUM_PARALLEL_BROWSERS) as executor:
-        futures = {
-            executor.submit(process_advertiser_batch, batch, i + 1): i
-            for i, batch in enumerate(batches)
-        }
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(
+            headless=True,
+            executable_path=CHROMIUM_BIN if CHROMIUM_BIN else None
+        )
         
-        for future in as_completed(futures):
+        async def scrape_in_slot(page_id, info):
+            slot = await slots.get()
             try:
-                result = future.result()
-                total_new_ads += result["new"]
-                total_duplicate_ads += result["duplicates"]
+                return await scrape_advertiser_with_retries(browser, page_id, info, slot)
             except Exception as e:
-                print(f"❌ Batch error: {e}")
+                print(f"[Browser {slot}] ❌ Fatal error: {e}")
+                return 0, 0, info["name"]
+            finally:
+                slots.put_nowait(slot)
+        
+        results = await asyncio.gather(*(
+            scrape_in_slot(page_id, info) for page_id, info in advertisers_to_scrape
+        ))
+        await browser.close()
+    
+    total_new_ads = sum(new_count for new_count, _, _ in results)
+    total_duplicate_ads = sum(dup_count for _, dup_count, _ in results)
     
     elapsed = time.time() - start_time
     
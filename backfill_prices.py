@@ -7,7 +7,8 @@ Reuses the same price extraction logic from the main scraper.
 import os
 import sys
 import asyncio
-import re
+from collections import defaultdict
+from sqlalchemy import update
 from sqlmodel import Session, select
 from app.db.models import AdCreative
 from app.db.repo import engine
@@ -15,144 +16,150 @@ from playwright.async_api import async_playwright, Page
 from concurrent.futures import ThreadPoolExecutor
 from threading import Lock
 
+DEFAULT_CONCURRENCY = 5  # Batches (browser contexts) processed at once
+
+# Price extraction constants, built once at import (same selectors as main scraper)
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "CAD": "$", "AUD": "$", "JPY": "¥"}
+PRICE_META_SELECTORS = ("meta[property='og:price:amount']", "meta[property='product:price:amount']")
+PRICE_SELECTORS = (
+    ".product-price",
+    ".price",
+    "[class*='price']",
+    "[data-price]",
+    *PRICE_META_SELECTORS,
+    "span[class*='Price']",
+    "div[class*='price']",
+)
+
+# Price lookup run in the page, in order: meta tags (most reliable), JSON-LD product
+# data, Shopify's JavaScript, then DOM selectors. Returns [kind, value, currency] or
+# null - currency is og:price:currency, or priceCurrency for JSON-LD.
+FIND_PRICE_JS = r"""
+({metaSelectors, selectors}) => {
+    const currency = document.querySelector("meta[property='og:price:currency']")?.getAttribute('content') ?? null;
+
+    // Try meta tags first
+    for (const sel of metaSelectors) {
+        const amount = document.querySelector(sel)?.getAttribute('content');
+        if (amount) return ['meta', amount, currency];
+    }
+
+    // Try JSON-LD product data ("price" and "priceCurrency" in the same offer)
+    const jsonLdRe = /"price"\s*:\s*"?(\d+(?:\.\d+)?)"?[^{}]{0,200}?"priceCurrency"\s*:\s*"([A-Z]{3})"|"priceCurrency"\s*:\s*"([A-Z]{3})"[^{}]{0,200}?"price"\s*:\s*"?(\d+(?:\.\d+)?)"?/;
+    for (const script of document.querySelectorAll('script[type="application/ld+json"]')) {
+        const m = jsonLdRe.exec(script.textContent || '');
+        if (m) return ['jsonld', m[1] || m[4], m[2] || m[3]];
+    }
+
+    // Try Shopify-specific JavaScript
+    const price = window.ShopifyAnalytics?.meta?.product?.price;
+    if (price) {
+        const shopifyCurrency = window.Shopify?.currency?.active || 'USD';
+        const symbols = {USD: '$', EUR: '€', GBP: '£', CAD: '$', AUD: '$', JPY: '¥'};
+        const symbol = symbols[shopifyCurrency] || '$';
+        return ['shopify', `${symbol}${(price / 100).toFixed(2)}`, currency];
+    }
+
+    // Try DOM selectors
+    const priceRe = /([$€£¥]\s*[\d,.]+|\d[\d,.]+\s*[$€£¥])/;
+    for (const sel of selectors) {
+        const el = document.querySelector(sel);
+        if (!el) continue;
+        if (sel.includes('data-price')) {
+            const cents = el.getAttribute('data-price');
+            if (cents && /^\d+$/.test(cents)) return ['cents', cents, currency];
+        } else {
+            const m = (el.textContent || '').trim().match(priceRe);
+            if (m) return ['text', m[1], currency];
+        }
+    }
+    return null;
+}
+"""
+
+async def block_heavy_resources(route):
+    """Skip images, fonts, media and CSS - prices are in the HTML/JS."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
 async def extract_price_from_page(page: Page, url: str, timeout: int = 10) -> str:
     """
-    Extract product price from a landing page.
+    Extract product price from a landing page, navigating `page` to it.
     Reuses the same logic from run_test_scraper.py
     """
     if not url or "facebook.com" in url:
         return None
     
-    new_page = None
     try:
-        # Create new page
-        new_page = await page.context.new_page()
-        
-        # Block resources for faster loading
-        await new_page.route("**/*", lambda route: (
-            route.abort() if route.request.resource_type in ["image", "font", "media", "stylesheet"]
-            else route.continue_()
-        ))
-        
         # Navigate to page
-        await new_page.goto(url, wait_until="domcontentloaded", timeout=timeout * 1000)
+        await page.goto(url, wait_until="domcontentloaded", timeout=timeout * 1000)
         await asyncio.sleep(0.5)  # Brief wait for JS to render prices
         
-        # Currency symbol detection
-        currency_symbol = "$"
-        try:
-            meta_currency = await new_page.query_selector("meta[property='og:price:currency']")
-            if meta_currency:
-                curr = await meta_currency.get_attribute("content")
-                symbols = {"USD": "$", "EUR": "€", "GBP": "£", "CAD": "$", "AUD": "$", "JPY": "¥"}
-                currency_symbol = symbols.get(curr, "$")
-        except:
-            pass
-        
-        # Price selectors (same as main scraper)
-        price_selectors = [
-            ".product-price",
-            ".price",
-            "[class*='price']",
-            "[data-price]",
-            "meta[property='og:price:amount']",
-            "meta[property='product:price:amount']",
-            "span[class*='Price']",
-            "div[class*='price']",
-        ]
-        
+        # ⚡ Every lookup below in one round trip instead of a query per selector
+        found = await page.evaluate(FIND_PRICE_JS, {
+            "metaSelectors": list(PRICE_META_SELECTORS),
+            "selectors": list(PRICE_SELECTORS),
+        })
         product_price = None
-        
-        # Try meta tags first (most reliable)
-        for meta_sel in ["meta[property='og:price:amount']", "meta[property='product:price:amount']"]:
-            try:
-                el = await new_page.query_selector(meta_sel)
-                if el:
-                    amount = await el.get_attribute("content")
-                    if amount:
-                        product_price = f"{currency_symbol}{amount}"
-                        break
-            except:
-                continue
-        
-        # Try Shopify-specific JavaScript
-        if not product_price:
-            try:
-                product_price = await new_page.evaluate(
-                    """() => {
-                        const price = window.ShopifyAnalytics?.meta?.product?.price;
-                        const currency = window.Shopify?.currency?.active || 'USD';
-                        const symbols = {USD: '$', EUR: '€', GBP: '£', CAD: '$', AUD: '$', JPY: '¥'};
-                        const symbol = symbols[currency] || '$';
-                        return price ? `${symbol}${(price / 100).toFixed(2)}` : null;
-                    }"""
-                )
-            except:
-                pass
-        
-        # Try DOM selectors
-        if not product_price:
-            for sel in price_selectors:
-                try:
-                    el = await new_page.query_selector(sel)
-                    if el:
-                        if "data-price" in sel:
-                            price_data = await el.get_attribute("data-price")
-                            if price_data and re.match(r'^\d+$', price_data):
-                                price_cents = int(price_data)
-                                product_price = f"{currency_symbol}{price_cents / 100:.2f}"
-                                break
-                        else:
-                            text = (await el.text_content() or "").strip()
-                            price_match = re.search(r'([$€£¥]\s*[\d,.]+|\d[\d,.]+\s*[$€£¥])', text)
-                            if price_match:
-                                product_price = price_match.group(1).strip()
-                                break
-                except:
-                    continue
+        if found:
+            kind, value, currency = found
+            currency_symbol = CURRENCY_SYMBOLS.get(currency, "$")
+            if kind in ("meta", "jsonld"):
+                product_price = f"{currency_symbol}{value}"
+            elif kind == "cents":
+                product_price = f"{currency_symbol}{int(value) / 100:.2f}"
+            else:  # "shopify" is already formatted, "text" is the matched price
+                product_price = value.strip()
         
         return product_price
         
     except Exception as e:
         return None
-    finally:
-        if new_page:
-            await new_page.close()
 
 
 async def process_batch(ads_batch, browser, batch_num, total_batches):
-    """Process a batch of ads to extract prices."""
+    """Process a batch of (ad_ids, landing_url) pairs - one page load per URL, one result per ad."""
     results = []
-    page = await browser.new_page()
+    # ⚡ One context (and resource-blocking route) per batch, one page reused for every URL
+    context = await browser.new_context()
+    await context.route("**/*", block_heavy_resources)
+    page = await context.new_page()
     
-    for i, (ad_id, landing_url) in enumerate(ads_batch, 1):
+    for i, (ad_ids, landing_url) in enumerate(ads_batch, 1):
         try:
             print(f"[Batch {batch_num}/{total_batches}] [{i}/{len(ads_batch)}] Extracting price from: {landing_url[:60]}...")
             
+            if page.is_closed():  # Landing page closed itself or crashed - start a fresh one
+                page = await context.new_page()
             price = await extract_price_from_page(page, landing_url)
             
             if price:
                 print(f"  ✅ Found price: {price}")
-                results.append({"ad_id": ad_id, "price": price, "status": "success"})
+                results.extend({"ad_id": ad_id, "price": price, "status": "success"} for ad_id in ad_ids)
             else:
                 print(f"  ⚠️  No price found")
-                results.append({"ad_id": ad_id, "price": None, "status": "no_price"})
+                results.extend({"ad_id": ad_id, "price": None, "status": "no_price"} for ad_id in ad_ids)
                 
         except Exception as e:
             print(f"  ❌ Error: {e}")
-            results.append({"ad_id": ad_id, "price": None, "status": "error"})
+            results.extend({"ad_id": ad_id, "price": None, "status": "error"} for ad_id in ad_ids)
     
-    await page.close()
+    await context.close()
     return results
 
 
-async def backfill_prices_async(limit: int = None, batch_size: int = 50):
+async def backfill_prices_async(limit: int = None, batch_size: int = 50, concurrency: int = DEFAULT_CONCURRENCY):
     """
     Backfill product_price for ads with missing prices.
     
     Args:
         limit: Max number of ads to process (None = all)
-        batch_size: Number of ads per batch
+        batch_size: Number of landing URLs per batch
+        concurrency: Batches processed at once (each in its own browser context)
     """
     
     print("=" * 80)
@@ -183,8 +190,14 @@ async def backfill_prices_async(limit: int = None, batch_size: int = 50):
             print("✅ No ads need price backfill!")
             return
         
-        print(f"📊 Found {len(ads)} ads with missing prices")
-        print(f"📦 Batch size: {batch_size}")
+        # ⚡ Ads often share a landing URL - load each URL once, fan its price out to every ad
+        ad_ids_by_url = defaultdict(list)
+        for ad_id, landing_url in ads:
+            ad_ids_by_url[landing_url].append(ad_id)
+        urls = [(ad_ids, landing_url) for landing_url, ad_ids in ad_ids_by_url.items()]
+        
+        print(f"📊 Found {len(ads)} ads with missing prices ({len(urls)} unique landing URLs)")
+        print(f"📦 Batch size: {batch_size} ({concurrency} batches at a time)")
         print()
         
         # Launch Playwright
@@ -192,27 +205,34 @@ async def backfill_prices_async(limit: int = None, batch_size: int = 50):
             browser = await p.chromium.launch(headless=True)
             
             # Process in batches
-            batches = [ads[i:i+batch_size] for i in range(0, len(ads), batch_size)]
+            batches = [urls[i:i+batch_size] for i in range(0, len(urls), batch_size)]
             total_batches = len(batches)
-            all_results = []
             
-            for batch_num, batch in enumerate(batches, 1):
-                results = await process_batch(batch, browser, batch_num, total_batches)
-                all_results.extend(results)
+            # ⚡ Landing pages are I/O-bound - run several batches at once
+            sem = asyncio.Semaphore(concurrency)
+            
+            async def run_batch(batch_num, batch):
+                async with sem:
+                    return await process_batch(batch, browser, batch_num, total_batches)
+            
+            batch_results = await asyncio.gather(*(
+                run_batch(batch_num, batch) for batch_num, batch in enumerate(batches, 1)
+            ))
+            all_results = [result for results in batch_results for result in results]
             
             await browser.close()
         
         # Update database
         print("\n💾 Saving results to database...")
-        updated_count = 0
-        
-        for result in all_results:
-            if result["status"] == "success" and result["price"]:
-                ad = session.get(AdCreative, result["ad_id"])
-                if ad:
-                    ad.product_price = result["price"]
-                    session.add(ad)
-                    updated_count += 1
+        # ⚡ One executemany UPDATE by primary key instead of loading each row
+        mappings = [
+            {"id": result["ad_id"], "product_price": result["price"]}
+            for result in all_results
+            if result["status"] == "success" and result["price"]
+        ]
+        if mappings:
+            session.execute(update(AdCreative), mappings)
+        updated_count = len(mappings)
         
         session.commit()
         
@@ -231,9 +251,9 @@ async def backfill_prices_async(limit: int = None, batch_size: int = 50):
         print("=" * 80)
 
 
-def backfill_prices(limit: int = None, batch_size: int = 50):
+def backfill_prices(limit: int = None, batch_size: int = 50, concurrency: int = DEFAULT_CONCURRENCY):
     """Synchronous wrapper for async backfill."""
-    asyncio.run(backfill_prices_async(limit, batch_size))
+    asyncio.run(backfill_prices_async(limit, batch_size, concurrency))
 
 
 if __name__ == "__main__":
@@ -241,8 +261,10 @@ if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description="Backfill product prices for ads")
     parser.add_argument("--limit", type=int, default=None, help="Max ads to process (default: all)")
-    parser.add_argument("--batch-size", type=int, default=50, help="Ads per batch (default: 50)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Landing URLs per batch (default: 50)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Batches processed at once (default: {DEFAULT_CONCURRENCY})")
     
     args = parser.parse_args()
     
-    backfill_prices(limit=args.limit, batch_size=args.batch_size)
+    backfill_prices(limit=args.limit, batch_size=args.batch_size, concurrency=args.concurrency)
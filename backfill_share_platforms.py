@@ -14,26 +14,73 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
+from sqlalchemy import func, update
 from sqlmodel import Session, select
 from app.db.repo import engine
 from app.db.models import AdCreative
 from urllib.parse import urlparse
-from collections import Counter
+from collections import Counter, defaultdict
+from functools import lru_cache
+import re
 import time
 
 # Configuration
 BATCH_SIZE = 500  # Process 500 ads per batch (adjust based on your RAM)
+STREAM_CHUNK = 5000  # Rows fetched at a time when scanning the whole table
 SOCIAL_PLATFORMS = ['instagram', 'facebook', 'tiktok', 'twitter', 'snapchat']
 PLATFORM_PRIORITY = ['shopify', 'wix', 'woocommerce', 'squarespace', 'bigcommerce', 'magento', 'prestashop', 'webflow', 'wordpress']
+PLATFORM_RANK = {platform: rank for rank, platform in enumerate(PLATFORM_PRIORITY)}  # lower = preferred
 
+# ⚡ Host of a plain http(s) URL in one regex match. URLs with characters
+# urlparse treats specially ([, ], tab, CR/LF) don't match and go through urlparse.
+URL_HOST_RE = re.compile(r'https?://([^/?#\[\]\t\n\r]*)(?=[^\[\]\t\n\r]*\Z)', re.IGNORECASE)
+
+@lru_cache(maxsize=200_000)
 def extract_domain(url: str) -> str | None:
-    """Extract root domain from URL."""
+    """Extract root domain from URL (⚡ cached - the same URLs come up in every pass)."""
+    match = URL_HOST_RE.match(url) if url else None
+    if match:
+        return match.group(1).replace("www.", "") or None
     try:
         domain = urlparse(url).netloc.replace("www.", "")
         return domain if domain else None
     except:
         return None
 
+def iter_batches(session: Session, stmt, batch_size: int = BATCH_SIZE):
+    """
+    Yield `stmt`'s rows (which must include AdCreative.id) in batches of `batch_size`, in id order.
+    
+    ⚡ Keyset pagination (id > last seen id) instead of OFFSET: each batch starts
+    straight at its first row instead of rescanning every earlier one, and rows
+    updated out of the WHERE clause by the caller don't shift later batches.
+    """
+    last_id = 0
+    while True:
+        batch = session.exec(
+            stmt.where(AdCreative.id > last_id).order_by(AdCreative.id).limit(batch_size)
+        ).all()
+        if not batch:
+            return
+        last_id = batch[-1].id
+        yield batch
+
+def share_platforms(session: Session, platform_by_id: dict) -> None:
+    """
+    ⚡ Write platform_type for many ads with one UPDATE ... WHERE id IN (...)
+    per distinct platform, instead of one UPDATE per ad.
+    """
+    ids_by_platform = defaultdict(list)
+    for ad_id, platform in platform_by_id.items():
+        ids_by_platform[platform].append(ad_id)
+    for platform, ids in ids_by_platform.items():
+        session.execute(
+            update(AdCreative)
+            .where(AdCreative.id.in_(ids))
+            .values(platform_type=platform)
+            .execution_options(synchronize_session=False)
+        )
+
 def main():
     print("=" * 80)
     print("🛒 PLATFORM SHARING BACKFILL")
@@ -52,42 +99,42 @@ def main():
         
         # Build domain -> platform mapping
         print("\n🔍 Building domain → platform mapping...")
-        stmt = select(AdCreative.landing_url, AdCreative.platform_type).where(
+        # ⚡ One row per distinct (landing_url, platform) with its ad count, not one per ad
+        stmt = select(AdCreative.landing_url, AdCreative.platform_type, func.count()).where(
             AdCreative.platform_type.is_not(None),
             AdCreative.platform_type != '',
             AdCreative.platform_type != 'custom',
             AdCreative.landing_url.is_not(None),
             AdCreative.landing_url != ''
-        )
-        
-        rows = session.exec(stmt).all()
-        print(f"   Found {len(rows)} ads with detected platforms")
+        ).group_by(
+            AdCreative.landing_url, AdCreative.platform_type
+        ).execution_options(yield_per=STREAM_CHUNK)  # ⚡ Stream - never hold every row at once
         
         domain_platform_map = {}
-        for url, platform in rows:
+        row_domain_counts = Counter()  # Ads per domain, for the top-10 below
+        row_count = 0
+        for url, platform, ad_count in session.exec(stmt):
+            row_count += ad_count
+            domain = extract_domain(url)
+            row_domain_counts[domain] += ad_count
             if platform in SOCIAL_PLATFORMS:
                 continue  # Skip social platforms (Instagram, Facebook, etc.)
             
-            domain = extract_domain(url)
             if domain:
                 # Prioritize specific platforms (e.g., Shopify > WordPress)
                 if domain not in domain_platform_map:
                     domain_platform_map[domain] = platform
-                elif platform in PLATFORM_PRIORITY:
-                    current_priority = PLATFORM_PRIORITY.index(domain_platform_map[domain]) if domain_platform_map[domain] in PLATFORM_PRIORITY else 999
-                    new_priority = PLATFORM_PRIORITY.index(platform)
-                    if new_priority < current_priority:
+                elif platform in PLATFORM_RANK:
+                    # ⚡ Dict lookups instead of two list.index() scans per row
+                    if PLATFORM_RANK[platform] < PLATFORM_RANK.get(domain_platform_map[domain], 999):
                         domain_platform_map[domain] = platform
         
+        print(f"   Found {row_count} ads with detected platforms")
         print(f"   ✅ Mapped {len(domain_platform_map)} unique domains to platforms")
         
         # Show top domains
         print("\n   🏆 Top 10 domains:")
-        domain_counts = Counter()
-        for url, _ in rows:
-            domain = extract_domain(url)
-            if domain and domain in domain_platform_map:
-                domain_counts[domain] += 1
+        domain_counts = Counter({d: n for d, n in row_domain_counts.items() if d and d in domain_platform_map})
         
         for domain, count in domain_counts.most_common(10):
             print(f"      • {domain}: {count} ads → {domain_platform_map[domain]}")
@@ -95,7 +142,7 @@ def main():
         # Share platforms by domain (batched processing)
         print(f"\n🔄 Sharing platforms across same domains (batches of {BATCH_SIZE})...")
         
-        stmt = select(AdCreative).where(
+        stmt = select(AdCreative.id, AdCreative.landing_url).where(
             AdCreative.landing_url.is_not(None),
             AdCreative.landing_url != ''
         ).where(
@@ -105,28 +152,23 @@ def main():
         )
         
         domain_shared_count = 0
-        offset = 0
+        processed = 0
         
-        while True:
-            batch_stmt = stmt.offset(offset).limit(BATCH_SIZE)
-            batch = session.exec(batch_stmt).all()
-            
-            if not batch:
-                break
-            
-            batch_updates = 0
-            for ad in batch:
-                domain = extract_domain(ad.landing_url)
+        for batch in iter_batches(session, stmt):
+            platform_by_id = {}
+            for ad_id, landing_url in batch:
+                domain = extract_domain(landing_url)
                 if domain and domain in domain_platform_map:
-                    ad.platform_type = domain_platform_map[domain]
-                    session.add(ad)
-                    batch_updates += 1
-                    domain_shared_count += 1
+                    platform_by_id[ad_id] = domain_platform_map[domain]
             
-            session.commit()
-            offset += len(batch)
-            print(f"   Processed {offset} ads | Updated {domain_shared_count} so far...")
+            share_platforms(session, platform_by_id)
+            domain_shared_count += len(platform_by_id)
+            processed += len(batch)
+            print(f"   Processed {processed} ads | Updated {domain_shared_count} so far...")
         
+        # ⚡ One commit per layer - the batches share a transaction (an error
+        # rolls the whole layer back when the session closes)
+        session.commit()
         print(f"\n   ✅ Domain-level: Shared platforms to {domain_shared_count} ads from {len(domain_platform_map)} domains")
         
         # ========================================
@@ -138,32 +180,31 @@ def main():
         
         # Build advertiser -> platforms mapping
         print("\n🔍 Building advertiser → platform mapping...")
-        stmt = select(AdCreative.page_id, AdCreative.platform_type).where(
+        stmt = select(AdCreative.page_id, AdCreative.platform_type, func.count()).where(
             AdCreative.platform_type.is_not(None),
             AdCreative.platform_type != '',
             AdCreative.platform_type != 'custom',
             AdCreative.page_id.is_not(None),
             AdCreative.page_id != ''
-        )
-        
-        rows = session.exec(stmt).all()
-        print(f"   Found {len(rows)} ads with page_id and platforms")
+        ).group_by(
+            AdCreative.page_id, AdCreative.platform_type
+        ).execution_options(yield_per=STREAM_CHUNK)
         
-        advertiser_platforms = {}
-        for page_id, platform in rows:
+        advertiser_platforms = defaultdict(Counter)  # page_id -> platform counts
+        row_count = 0
+        for page_id, platform, ad_count in session.exec(stmt):
+            row_count += ad_count
             if platform in SOCIAL_PLATFORMS:
                 continue  # Skip social platforms
             
-            if page_id not in advertiser_platforms:
-                advertiser_platforms[page_id] = []
-            advertiser_platforms[page_id].append(platform)
+            advertiser_platforms[page_id][platform] += ad_count
+        print(f"   Found {row_count} ads with page_id and platforms")
         
         # Only share if advertiser has 80%+ consensus
         advertiser_platform_map = {}
-        for page_id, platforms in advertiser_platforms.items():
-            counter = Counter(platforms)
+        for page_id, counter in advertiser_platforms.items():
             most_common_platform, count = counter.most_common(1)[0]
-            consensus_pct = (count / len(platforms)) * 100
+            consensus_pct = (count / counter.total()) * 100
             
             if consensus_pct >= 80:  # Require 80% consensus
                 advertiser_platform_map[page_id] = most_common_platform
@@ -174,7 +215,7 @@ def main():
         print("\n   🏆 Sample advertisers with consensus:")
         sample_count = 0
         for page_id, platform in list(advertiser_platform_map.items())[:5]:
-            ad_count = len(advertiser_platforms[page_id])
+            ad_count = advertiser_platforms[page_id].total()
             print(f"      • page_id {page_id}: {ad_count} ads → {platform}")
             sample_count += 1
         
@@ -184,7 +225,7 @@ def main():
         # Share platforms by advertiser (batched processing)
         print(f"\n🔄 Sharing platforms across same advertisers (batches of {BATCH_SIZE})...")
         
-        stmt = select(AdCreative).where(
+        stmt = select(AdCreative.id, AdCreative.page_id).where(
             AdCreative.page_id.is_not(None),
             AdCreative.page_id != ''
         ).where(
@@ -194,27 +235,21 @@ def main():
         )
         
         advertiser_shared_count = 0
-        offset = 0
+        processed = 0
         
-        while True:
-            batch_stmt = stmt.offset(offset).limit(BATCH_SIZE)
-            batch = session.exec(batch_stmt).all()
-            
-            if not batch:
-                break
-            
-            batch_updates = 0
-            for ad in batch:
-                if ad.page_id and ad.page_id in advertiser_platform_map:
-                    ad.platform_type = advertiser_platform_map[ad.page_id]
-                    session.add(ad)
-                    batch_updates += 1
-                    advertiser_shared_count += 1
+        for batch in iter_batches(session, stmt):
+            platform_by_id = {
+                ad_id: advertiser_platform_map[page_id]
+                for ad_id, page_id in batch
+                if page_id and page_id in advertiser_platform_map
+            }
             
-            session.commit()
-            offset += len(batch)
-            print(f"   Processed {offset} ads | Updated {advertiser_shared_count} so far...")
+            share_platforms(session, platform_by_id)
+            advertiser_shared_count += len(platform_by_id)
+            processed += len(batch)
+            print(f"   Processed {processed} ads | Updated {advertiser_shared_count} so far...")
         
+        session.commit()
         print(f"\n   ✅ Advertiser-level: Shared platforms to {advertiser_shared_count} ads from {len(advertiser_platform_map)} advertisers")
         
         # ========================================
@@ -224,11 +259,12 @@ def main():
         print("📊 FINAL PLATFORM DISTRIBUTION")
         print("=" * 80)
         
-        stmt = select(AdCreative.platform_type)
-        all_platforms = session.exec(stmt).all()
-        total_ads = len(all_platforms)
+        # ⚡ Counted by the database - one row per platform comes back
+        stmt = select(AdCreative.platform_type, func.count()).group_by(AdCreative.platform_type)
+        all_platforms = dict(session.exec(stmt).all())
+        total_ads = sum(all_platforms.values())
         
-        platform_counts = Counter([p for p in all_platforms if p])
+        platform_counts = {p: n for p, n in all_platforms.items() if p}
         total_with_platform = sum(platform_counts.values())
         
         print(f"\n🎯 Coverage: {total_with_platform}/{total_ads} ads ({(total_with_platform/total_ads)*100:.1f}%) have platform types\n")
@@ -4,17 +4,64 @@ Extracts root domain from landing_url and fetches SpyFu data
 """
 
 import os
+import re
 import sys
+import asyncio
 from urllib.parse import urlparse
+import httpx
+from sqlalchemy import insert, update
 from sqlmodel import Session, select
-from app.db.models import AdCreative
+from app.db.models import AdCreative, DomainTraffic
 from app.db.repo import engine
-from app.workers.spyfu_api import get_seo_clicks
+from app.workers.spyfu_api import get_seo_clicks_async
 from app.workers.traffic_estimator import estimate_monthly_visits
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
-import requests
+from functools import lru_cache
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# uvloop if installed
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+UPDATE_BATCH_SIZE = 500  # monthly_visits rows written per bulk UPDATE
+DEFAULT_CONCURRENCY = 50  # Domains/redirect URLs in flight at once (redirect HEAD + SpyFu lookup)
+DOMAIN_TRAFFIC_TTL = timedelta(days=30)  # Saved DomainTraffic rows younger than this skip SpyFu
+
+# ⚡ Host of a plain http(s) URL in one regex match. URLs with characters
+# urlparse treats specially ([, ], tab, CR/LF) don't match and go through urlparse.
+URL_HOST_RE = re.compile(r'https?://([^/?#\[\]\t\n\r]*)(?=[^\[\]\t\n\r]*\Z)', re.IGNORECASE)
+
+# Shortener/redirect domains whose final destination has to be looked up per URL
+REDIRECT_DOMAINS = frozenset([
+    'reploedge.com',
+    'l.facebook.com',
+    'fb.me',
+    'bit.ly',
+    'bitly.com',
+    'tinyurl.com',
+    'ow.ly',
+    'short.link',
+    'rebrand.ly'
+])
+
+# Major platform domains (these are not product websites)
+PLATFORM_DOMAINS = frozenset([
+    'youtube.com', 'youtu.be',
+    'facebook.com', 'fb.com', 'fb.me',
+    'instagram.com',
+    'amazon.com', 'amzn.to',
+    'google.com', 'maps.app.goo.gl', 'goo.gl', 'docs.google.com',
+    'tiktok.com',
+    'twitter.com', 'x.com',
+    'linkedin.com',
+    'pinterest.com',
+    'snapchat.com',
+    'apple.com', 'apps.apple.com', 'itunes.apple.com',
+    'play.google.com'
+])
 
 def get_tier_from_visits(seo_clicks: int) -> str:
     """Determine traffic tier based on SEO clicks."""
@@ -25,34 +72,20 @@ def get_tier_from_visits(seo_clicks: int) -> str:
     else:
         return "low"
 
-def follow_redirects(url: str, timeout: int = 5) -> str:
+async def follow_redirects(client: httpx.AsyncClient, url: str, timeout: int = 5) -> str:
     """
     Follow redirects to get the final destination URL.
     Returns the final URL after all redirects, or original URL if it fails.
     """
-    # List of redirect domains to follow
-    redirect_domains = [
-        'reploedge.com',
-        'l.facebook.com',
-        'fb.me',
-        'bit.ly',
-        'bitly.com',
-        'tinyurl.com',
-        'ow.ly',
-        'short.link',
-        'rebrand.ly'
-    ]
-    
     try:
         # Check if this is a redirect URL we should follow
         parsed = urlparse(url)
         domain = parsed.netloc.replace("www.", "")
         
-        if any(redirect in domain for redirect in redirect_domains):
+        if is_redirect_domain(domain):
             # Follow redirects
-            response = requests.head(url, allow_redirects=True, timeout=timeout)
-            final_url = response.url
-            return final_url
+            response = await client.head(url, follow_redirects=True, timeout=timeout)
+            return str(response.url)
         else:
             # Not a redirect URL, return as-is
             return url
@@ -60,8 +93,31 @@ def follow_redirects(url: str, timeout: int = 5) -> str:
         # If redirect following fails, return original URL
         return url
 
+def in_domain_set(domain: str, domains: frozenset) -> bool:
+    """
+    True if `domain` or one of its parent domains is in `domains`
+    (m.youtube.com matches youtube.com; netflix.com doesn't match x.com).
+    
+    ⚡ A few set lookups instead of a substring scan per listed domain.
+    """
+    domain = domain.partition(":")[0].lower()  # Drop any :port
+    while True:
+        if domain in domains:
+            return True
+        _, dot, domain = domain.partition(".")
+        if not dot:
+            return False
+
+def is_redirect_domain(domain: str) -> bool:
+    """True for shortener/redirect domains whose URLs must be followed to find the real site."""
+    return in_domain_set(domain, REDIRECT_DOMAINS)
+
+@lru_cache(maxsize=200_000)
 def extract_root_domain(url: str) -> str:
     """Extract root domain from URL (e.g., https://mutha.com/pages/product -> mutha.com)"""
+    match = URL_HOST_RE.match(url) if url else None
+    if match:
+        return match.group(1).replace("www.", "") or None
     try:
         parsed = urlparse(url)
         domain = parsed.netloc.replace("www.", "")
@@ -69,99 +125,106 @@ def extract_root_domain(url: str) -> str:
     except:
         return None
 
-def process_ad(ad_data, domain_cache, cache_lock, total_ads):
-    """Process a single ad - fetch traffic data and return result."""
-    ad_id, landing_url, index = ad_data
-    
-    # Follow redirects to get final destination URL
-    final_url = follow_redirects(landing_url)
-    
-    # Extract domain from final URL
-    domain = extract_root_domain(final_url)
-    
-    if not domain:
-        print(f"[{index}/{total_ads}] ⚠️  No domain extractable from: {landing_url[:50]}...")
-        return {"status": "skipped", "ad_id": ad_id, "reason": "no_domain"}
+async def lookup_monthly_visits(client: httpx.AsyncClient, domain: str) -> dict:
+    """Fetch SpyFu SEO clicks for `domain` and turn them into a monthly_visits estimate."""
+    try:
+        spyfu_data = await get_seo_clicks_async(client, domain)
+        
+        if spyfu_data.get("status") == "ok" and spyfu_data.get("seo_clicks"):
+            seo_clicks = spyfu_data["seo_clicks"]
+            tier = get_tier_from_visits(seo_clicks)
+            monthly_visits = int(estimate_monthly_visits(seo_clicks, tier))
+            print(f"🔍 {domain}: ✅ {seo_clicks:,} SEO clicks ({tier}) → {monthly_visits:,} visits")
+            return {"status": "updated", "monthly_visits": monthly_visits}
+        
+        print(f"🔍 {domain}: ⚠️  No SpyFu data")
+        return {"status": "skipped", "reason": "no_spyfu_data"}
+    except Exception as e:
+        print(f"🔍 {domain}: ❌ Error: {e}")
+        return {"status": "failed", "error": str(e)}
+
+def traffic_result(monthly_visits) -> dict:
+    """The lookup result for a domain's saved monthly_visits (None = SpyFu had no data)."""
+    if monthly_visits:
+        return {"status": "updated", "monthly_visits": monthly_visits}
+    return {"status": "skipped", "reason": "no_spyfu_data"}
+
+def save_domain_traffic(session: Session, domain_lookups: dict, saved_domains: set) -> int:
+    """
+    Store every domain looked up this run in DomainTraffic (errors are left out
+    so they're retried next time). Returns the number of domains saved.
+    """
+    now = datetime.utcnow()
+    new_rows, stale_rows = [], []
+    for domain, lookup in domain_lookups.items():
+        result = lookup.result()
+        if result.get("saved") or result["status"] == "failed":
+            continue
+        row = {"domain": domain, "monthly_visits": result.get("monthly_visits"), "fetched_at": now}
+        (stale_rows if domain in saved_domains else new_rows).append(row)
+    if new_rows:
+        session.execute(insert(DomainTraffic), new_rows)
+    if stale_rows:
+        session.execute(update(DomainTraffic), stale_rows)
+    return len(new_rows) + len(stale_rows)
+
+async def process_ad(ad_data, client, domain_lookups, semaphore, total_ads):
+    """
+    Process one group of ads sharing a domain (or a redirect URL) - fetch
+    traffic data once and return the result for all of their ids.
+    """
+    ad_ids, landing_url, index = ad_data
     
-    # Show redirect info if URL changed
-    if final_url != landing_url:
-        original_domain = extract_root_domain(landing_url)
-        print(f"[{index}/{total_ads}] 🔄 Redirect: {original_domain} → {domain}")
+    async with semaphore:
+        # Follow redirects to get final destination URL
+        final_url = await follow_redirects(client, landing_url)
     
-    # Skip major platform domains (these are not product websites)
-    platform_domains = [
-        'youtube.com', 'youtu.be',
-        'facebook.com', 'fb.com', 'fb.me',
-        'instagram.com',
-        'amazon.com', 'amzn.to',
-        'google.com', 'maps.app.goo.gl', 'goo.gl', 'docs.google.com',
-        'tiktok.com',
-        'twitter.com', 'x.com',
-        'linkedin.com',
-        'pinterest.com',
-        'snapchat.com',
-        'apple.com', 'apps.apple.com', 'itunes.apple.com',
-        'play.google.com'
-    ]
+        # Extract domain from final URL
+        domain = extract_root_domain(final_url)
     
-    if any(platform in domain for platform in platform_domains):
-        print(f"[{index}/{total_ads}] ⏭️  Skipping platform domain: {domain}")
-        return {"status": "skipped", "ad_id": ad_id, "reason": "platform_domain"}
+        if not domain:
+            print(f"[{index}/{total_ads}] ⚠️  No domain extractable from: {landing_url[:50]}...")
+            return {"status": "skipped", "ad_ids": ad_ids, "reason": "no_domain"}
     
-    # Check cache first (thread-safe)
-    with cache_lock:
-        if domain in domain_cache:
-            if domain_cache[domain] is not None:
-                print(f"[{index}/{total_ads}] 💾 {domain} → {domain_cache[domain]:,} visits (cached)")
-                return {"status": "updated", "ad_id": ad_id, "monthly_visits": domain_cache[domain], "cached": True}
-            else:
-                print(f"[{index}/{total_ads}] ⏭️  {domain} → No data (cached)")
-                return {"status": "skipped", "ad_id": ad_id, "reason": "no_data_cached"}
+        # Show redirect info if URL changed
+        if final_url != landing_url:
+            original_domain = extract_root_domain(landing_url)
+            print(f"[{index}/{total_ads}] 🔄 Redirect: {original_domain} → {domain}")
     
-    # Fetch from SpyFu API
-    try:
-        print(f"[{index}/{total_ads}] 🔍 Fetching: {domain}...", end=" ", flush=True)
-        spyfu_data = get_seo_clicks(domain)
+        # Skip major platform domains (these are not product websites)
+        if in_domain_set(domain, PLATFORM_DOMAINS):
+            print(f"[{index}/{total_ads}] ⏭️  Skipping platform domain: {domain}")
+            return {"status": "skipped", "ad_ids": ad_ids, "reason": "platform_domain"}
         
-        if spyfu_data.get("status") == "ok" and spyfu_data.get("seo_clicks"):
-            seo_clicks = spyfu_data["seo_clicks"]
-            tier = get_tier_from_visits(seo_clicks)
-            estimated_visits = estimate_monthly_visits(seo_clicks, tier)
-            monthly_visits = int(estimated_visits)
-            
-            # Update cache (thread-safe)
-            with cache_lock:
-                domain_cache[domain] = monthly_visits
-            
-            print(f"✅ {seo_clicks:,} SEO clicks ({tier}) → {monthly_visits:,} visits")
-            return {"status": "updated", "ad_id": ad_id, "monthly_visits": monthly_visits, "cached": False}
+        # ⚡ One SpyFu lookup per domain - ads on a domain already being fetched
+        # wait for that same lookup instead of calling the API again
+        lookup = domain_lookups.get(domain)
+        cached = lookup is not None
+        if not cached:
+            lookup = domain_lookups[domain] = asyncio.ensure_future(lookup_monthly_visits(client, domain))
+            result = await lookup
+    
+    if cached:
+        result = await lookup  # Outside the semaphore - waiting on another ad's lookup holds no slot
+        if result["status"] == "updated":
+            print(f"[{index}/{total_ads}] 💾 {domain} → {result['monthly_visits']:,} visits (cached)")
         else:
-            # Update cache (thread-safe)
-            with cache_lock:
-                domain_cache[domain] = None
-            
-            print(f"⚠️  No SpyFu data")
-            return {"status": "skipped", "ad_id": ad_id, "reason": "no_spyfu_data"}
-            
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        # Update cache (thread-safe)
-        with cache_lock:
-            domain_cache[domain] = None
-        return {"status": "failed", "ad_id": ad_id, "error": str(e)}
+            print(f"[{index}/{total_ads}] ⏭️  {domain} → No data (cached)")
+            return {"status": "skipped", "ad_ids": ad_ids, "reason": "no_data_cached"}
+    return {**result, "ad_ids": ad_ids, "cached": cached}
 
-def backfill_traffic_data(limit: int = None, delay: float = 1.0, workers: int = 10):
+async def backfill_traffic_data(limit: int = None, delay: float = 1.0, concurrency: int = DEFAULT_CONCURRENCY):
     """
-    Backfill monthly_visits for ads with missing traffic data using parallel processing.
+    Backfill monthly_visits for ads with missing traffic data, many ads at a time.
     
     Args:
         limit: Max number of ads to process (None = all)
-        delay: Delay between SpyFu API calls in seconds (not used in parallel mode)
-        workers: Number of parallel workers (default: 10)
+        delay: Delay between SpyFu API calls in seconds (not used - 429s are retried by spyfu_api)
+        concurrency: Ads processed at once (default: 50)
     """
     
     print("=" * 80)
-    print("🚀 TRAFFIC DATA BACKFILL - Starting (Parallel Mode)")
+    print("🚀 TRAFFIC DATA BACKFILL - Starting (Async Mode)")
     print("=" * 80)
     
     with Session(engine) as session:
@@ -182,44 +245,81 @@ def backfill_traffic_data(limit: int = None, delay: float = 1.0, workers: int =
             print("✅ No ads need traffic backfill!")
             return
         
-        print(f"📊 Found {len(ads)} ads with missing traffic data")
-        print(f"⚙️  Using {workers} parallel workers")
+        # ⚡ Group ads before dispatching: one HEAD + lookup per domain, not per ad.
+        # Redirect URLs can land on different sites, so each is its own group.
+        ad_ids_by_key = defaultdict(list)
+        landing_url_by_key = {}
+        for ad in ads:
+            domain = extract_root_domain(ad.landing_url)
+            key = ad.landing_url if not domain or is_redirect_domain(domain) else domain
+            ad_ids_by_key[key].append(ad.id)
+            landing_url_by_key.setdefault(key, ad.landing_url)
+        
+        print(f"📊 Found {len(ads)} ads with missing traffic data ({len(ad_ids_by_key)} unique domains/redirect URLs)")
+        print(f"⚙️  Processing {concurrency} at a time")
         print()
         
+        # ⚡ Domains fetched on earlier runs (within DOMAIN_TRAFFIC_TTL) start out as
+        # finished lookups, so their ads are served from the table without an API call
+        DomainTraffic.__table__.create(engine, checkfirst=True)
+        saved_domains = set()
+        saved_after = datetime.utcnow() - DOMAIN_TRAFFIC_TTL
+        
         # Track stats
-        domain_cache = {}  # Cache to avoid duplicate API calls
-        cache_lock = Lock()  # Thread-safe cache access
+        domain_lookups = {}  # domain -> SpyFu lookup task, shared by every ad on that domain
+        loop = asyncio.get_running_loop()
+        for domain, monthly_visits, fetched_at in session.exec(
+            select(DomainTraffic.domain, DomainTraffic.monthly_visits, DomainTraffic.fetched_at)
+        ):
+            saved_domains.add(domain)
+            if fetched_at >= saved_after:
+                lookup = domain_lookups[domain] = loop.create_future()
+                lookup.set_result({**traffic_result(monthly_visits), "saved": True})
+        print(f"💾 {len(domain_lookups)} domains already have traffic saved from earlier runs")
+        semaphore = asyncio.Semaphore(concurrency)
         updated_count = 0
         skipped_count = 0
         failed_count = 0
+        pending_updates = []  # {"id", "monthly_visits"} mappings not yet written
         
-        # Prepare data for parallel processing
-        ad_data_list = [(ad.id, ad.landing_url, i+1) for i, ad in enumerate(ads)]
+        # Prepare data for concurrent processing
+        ad_data_list = [
+            (ad_ids, landing_url_by_key[key], i+1)
+            for i, (key, ad_ids) in enumerate(ad_ids_by_key.items())
+        ]
         
-        # Process ads in parallel
-        with ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = {
-                executor.submit(process_ad, ad_data, domain_cache, cache_lock, len(ads)): ad_data 
+        # ⚡ Coroutines on one pooled client instead of a thread per request
+        async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency)) as client:
+            tasks = [
+                process_ad(ad_data, client, domain_lookups, semaphore, len(ad_data_list))
                 for ad_data in ad_data_list
-            }
+            ]
             
-            for future in as_completed(futures):
-                result = future.result()
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
                 
+                ad_count = len(result["ad_ids"])
                 if result["status"] == "updated":
-                    # Update ad in database
-                    ad = session.get(AdCreative, result["ad_id"])
-                    if ad:
-                        ad.monthly_visits = result["monthly_visits"]
-                        session.add(ad)
-                    updated_count += 1
+                    # ⚡ Bulk UPDATE by primary key - no per-ad SELECT
+                    pending_updates.extend(
+                        {"id": ad_id, "monthly_visits": result["monthly_visits"]} for ad_id in result["ad_ids"]
+                    )
+                    if len(pending_updates) >= UPDATE_BATCH_SIZE:
+                        # ⚡ Written from a worker thread so in-flight lookups keep
+                        # running; the session is still only used by one thread at a time
+                        await asyncio.to_thread(session.execute, update(AdCreative), pending_updates)
+                        pending_updates = []
+                    updated_count += ad_count
                 elif result["status"] == "skipped":
-                    skipped_count += 1
+                    skipped_count += ad_count
                 elif result["status"] == "failed":
-                    failed_count += 1
+                    failed_count += ad_count
         
         # Commit all changes
         print("\n💾 Saving changes to database...")
+        if pending_updates:
+            session.execute(update(AdCreative), pending_updates)
+        fetched_count = save_domain_traffic(session, domain_lookups, saved_domains)
         session.commit()
         
         print("\n" + "=" * 80)
@@ -228,17 +328,20 @@ def backfill_traffic_data(limit: int = None, delay: float = 1.0, workers: int =
         print(f"✅ Updated: {updated_count} ads")
         print(f"⏭️  Skipped: {skipped_count} ads (no data)")
         print(f"❌ Failed: {failed_count} ads (errors)")
-        print(f"📊 Unique domains processed: {len(domain_cache)}")
+        print(f"📊 Unique domains processed: {len(domain_lookups)} ({fetched_count} fetched from SpyFu and saved)")
         print("=" * 80)
 
 if __name__ == "__main__":
     import argparse
     
-    parser = argparse.ArgumentParser(description="Backfill traffic data for existing ads (parallel mode)")
+    parser = argparse.ArgumentParser(description="Backfill traffic data for existing ads (async mode)")
     parser.add_argument("--limit", type=int, default=None, help="Max ads to process (default: all)")
-    parser.add_argument("--delay", type=float, default=1.0, help="Delay between API calls (not used in parallel mode)")
-    parser.add_argument("--workers", type=int, default=10, help="Number of parallel workers (default: 10)")
+    parser.add_argument("--delay", type=float, default=1.0, help="Delay between API calls (not used in async mode)")
+    parser.add_argument("--concurrency", "--workers", dest="concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Ads processed at once (default: {DEFAULT_CONCURRENCY})")
     
     args = parser.parse_args()
     
-    backfill_traffic_data(limit=args.limit, delay=args.delay, workers=args.workers)
+    (uvloop.run if uvloop else asyncio.run)(
+        backfill_traffic_data(limit=args.limit, delay=args.delay, concurrency=args.concurrency)
+    )
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Share platform_type across ads by domain and advertiser entirely in SQL (Postgres).
+
+Same rules as backfill_share_platforms.py, but each layer is a single UPDATE -
+no rows are loaded into Python.
+"""
+
+import os
+import psycopg2
+
+from backfill_share_platforms import PLATFORM_PRIORITY, SOCIAL_PLATFORMS
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    raise ValueError("DATABASE_URL environment variable not set")
+
+# Host part of landing_url without "www." - matches extract_domain()
+DOMAIN_SQL = "replace(substring({col} from '://([^/?#]+)'), 'www.', '')"
+
+print("🔄 Sharing platform types across ads using SQL...\n")
+
+conn = psycopg2.connect(DATABASE_URL)
+cur = conn.cursor()
+
+# LAYER 1: every ad without a platform takes its domain's platform
+# (highest PLATFORM_PRIORITY entry when a domain has several)
+print("📊 Layer 1: Sharing platforms by domain...")
+cur.execute(f"""
+    WITH domain_platform AS (
+        SELECT DISTINCT ON (domain) domain, platform_type
+        FROM (
+            SELECT {DOMAIN_SQL.format(col='landing_url')} AS domain, platform_type
+            FROM adcreative
+            WHERE platform_type IS NOT NULL
+              AND platform_type NOT IN ('', 'custom')
+              AND platform_type <> ALL(%(social)s)
+              AND landing_url IS NOT NULL AND landing_url != ''
+        ) detected
+        WHERE domain IS NOT NULL AND domain != ''
+        ORDER BY domain, array_position(%(priority)s::text[], platform_type::text) NULLS LAST
+    )
+    UPDATE adcreative a
+    SET platform_type = d.platform_type
+    FROM domain_platform d
+    WHERE (a.platform_type IS NULL OR a.platform_type IN ('', 'custom'))
+      AND a.landing_url IS NOT NULL AND a.landing_url != ''
+      AND {DOMAIN_SQL.format(col='a.landing_url')} = d.domain
+""", {"social": SOCIAL_PLATFORMS, "priority": PLATFORM_PRIORITY})
+domain_shared = cur.rowcount
+print(f"✅ Domain-level: {domain_shared} ads updated\n")
+
+# LAYER 2: advertisers whose detected ads agree 80%+ on one platform share it
+print("📊 Layer 2: Sharing platforms by advertiser (80% consensus)...")
+cur.execute("""
+    WITH platform_counts AS (
+        SELECT page_id, platform_type,
+               COUNT(*) AS n,
+               SUM(COUNT(*)) OVER (PARTITION BY page_id) AS total,
+               ROW_NUMBER() OVER (PARTITION BY page_id ORDER BY COUNT(*) DESC) AS platform_rank
+        FROM adcreative
+        WHERE platform_type IS NOT NULL
+          AND platform_type NOT IN ('', 'custom')
+          AND platform_type <> ALL(%(social)s)
+          AND page_id IS NOT NULL AND page_id != ''
+        GROUP BY page_id, platform_type
+    )
+    UPDATE adcreative a
+    SET platform_type = c.platform_type
+    FROM platform_counts c
+    WHERE c.platform_rank = 1
+      AND c.n * 100.0 / c.total >= 80
+      AND a.page_id = c.page_id
+      AND (a.platform_type IS NULL OR a.platform_type IN ('', 'custom'))
+""", {"social": SOCIAL_PLATFORMS})
+advertiser_shared = cur.rowcount
+print(f"✅ Advertiser-level: {advertiser_shared} ads updated\n")
+
+conn.commit()
+
+# Final stats
+cur.execute("SELECT COUNT(*) FROM adcreative WHERE platform_type IS NOT NULL AND platform_type != ''")
+total_with_platform = cur.fetchone()[0]
+
+print(f"✅ Updated {domain_shared + advertiser_shared} ads with shared platform types!")
+print(f"📊 Final: {total_with_platform:,} ads now have a platform type")
+
+cur.close()
+conn.close()
@@ -9,6 +9,7 @@ This script:
 """
 
 import os
+from functools import lru_cache
 from urllib.parse import urlparse
 from sqlmodel import Session, create_engine, select
 from app.db.models import AdCreative
@@ -21,6 +22,7 @@ if not DATABASE_URL:
 engine = create_engine(DATABASE_URL)
 
 
+@lru_cache(maxsize=200_000)
 def extract_domain(url):
     """Extract root domain from URL."""
     if not url: